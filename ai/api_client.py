@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 import asyncio
 import json
@@ -6,9 +7,14 @@ import httpx
 from cerebras.cloud.sdk import Cerebras
 from groq import AsyncGroq
 from openai import OpenAIError
+from modules import metrics
+from modules import tracing
 
 logger = logging.getLogger(__name__)
 
+# Search runs alongside the memory lookup; a slow search engine must not hold up the reply
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", 3))
+
 class APIClient:
     def __init__(self):
         # Load keys
@@ -17,6 +23,41 @@ class APIClient:
         self.chatanywhere_key = os.environ.get('CHATANYWHERE_API_KEY')
         self.typegpt_key = os.environ.get('TYPEGPT_FAST_API_KEY')
         self.brave_key = os.environ.get('BRAVE_API_KEY')
+        self._http = None
+        self._cerebras = None
+        self._groq = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Pooled client for the plain-HTTP providers, created on first use inside the event loop."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=30)
+        return self._http
+
+    @property
+    def cerebras(self) -> Cerebras:
+        """Cerebras SDK client, kept for the client's lifetime so its connection pool is reused."""
+        if self._cerebras is None:
+            self._cerebras = Cerebras(api_key=self.cerebras_key)
+        return self._cerebras
+
+    @property
+    def groq(self) -> AsyncGroq:
+        """Groq SDK client, created on first use inside the event loop like `http`."""
+        if self._groq is None:
+            self._groq = AsyncGroq(api_key=self.groq_key)
+        return self._groq
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._groq is not None:
+            await self._groq.close()
+            self._groq = None
+        if self._cerebras is not None:
+            self._cerebras.close()
+            self._cerebras = None
 
     async def get_text_response(self, messages) -> str | None:
         """
@@ -26,27 +67,46 @@ class APIClient:
 
         # 1. Primary: Cerebras
         if self.cerebras_key:
-            response = await self._call_cerebras(messages)
+            response = await self._attempt("cerebras", self._call_cerebras, messages)
             if response: return response
         
         # 2. Fallback: Groq
         if self.groq_key:
             logger.warning("Cerebras failed. Trying Groq.")
-            response = await self._call_groq(messages)
+            response = await self._attempt("groq", self._call_groq, messages)
             if response: return response
 
         # 3. Fallback: ChatAnywhere
         if self.chatanywhere_key:
             logger.warning("Groq failed. Trying ChatAnywhere.")
-            response = await self._call_chatanywhere(messages)
+            response = await self._attempt("chatanywhere", self._call_chatanywhere, messages)
             if response: return response
 
         logger.error("All AI providers failed.")
         return None
 
+    async def _attempt(self, provider, call, messages):
+        """Runs one provider call and records its latency and outcome."""
+        start = time.perf_counter()
+        metrics.LLM_IN_FLIGHT.inc(1)
+        try:
+            with tracing.span(f"llm.{provider}"):
+                response = await call(messages)
+        finally:
+            metrics.LLM_IN_FLIGHT.inc(-1)
+        metrics.LLM_LATENCY.observe(time.perf_counter() - start, (provider,))
+        metrics.LLM_REQUESTS.inc(1, (provider, "ok" if response else "error"))
+        return response
+
+    def _record_usage(self, provider, prompt_tokens, completion_tokens):
+        if prompt_tokens:
+            metrics.LLM_TOKENS.inc(prompt_tokens, (provider, "prompt"))
+        if completion_tokens:
+            metrics.LLM_TOKENS.inc(completion_tokens, (provider, "completion"))
+
     async def _call_cerebras(self, messages):
         try:
-            client = Cerebras(api_key=self.cerebras_key)
+            client = self.cerebras
             # Cerebras SDK is sync, run in thread
             def run_sync():
                 return client.chat.completions.create(
@@ -55,6 +115,9 @@ class APIClient:
                     stream=False
                 )
             completion = await asyncio.to_thread(run_sync)
+            usage = getattr(completion, "usage", None)
+            if usage:
+                self._record_usage("cerebras", usage.prompt_tokens, usage.completion_tokens)
             return completion.choices[0].message.content
         except Exception as e:
             logger.warning(f"Cerebras Error: {e}")
@@ -62,12 +125,14 @@ class APIClient:
 
     async def _call_groq(self, messages):
         try:
-            client = AsyncGroq(api_key=self.groq_key)
-            completion = await client.chat.completions.create(
+            completion = await self.groq.chat.completions.create(
                 messages=messages,
                 model="llama3-70b-8192", # Updated model name
                 temperature=0.7
             )
+            usage = getattr(completion, "usage", None)
+            if usage:
+                self._record_usage("groq", usage.prompt_tokens, usage.completion_tokens)
             return completion.choices[0].message.content
         except Exception as e:
             logger.warning(f"Groq Error: {e}")
@@ -78,24 +143,30 @@ class APIClient:
             url = "https://api.chatanywhere.tech/v1/chat/completions"
             headers = {"Authorization": f"Bearer {self.chatanywhere_key}"}
             payload = {"model": "gpt-3.5-turbo", "messages": messages}
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(url, headers=headers, json=payload, timeout=30)
-                if resp.status_code == 200:
-                    return resp.json()['choices'][0]['message']['content']
+            resp = await self.http.post(url, headers=headers, json=payload, timeout=30)
+            if resp.status_code == 200:
+                data = resp.json()
+                usage = data.get('usage') or {}
+                self._record_usage("chatanywhere", usage.get('prompt_tokens'), usage.get('completion_tokens'))
+                return data['choices'][0]['message']['content']
         except Exception as e:
             logger.warning(f"ChatAnywhere Error: {e}")
             return None
 
-    async def web_search(self, query):
-        if not self.brave_key: return "Web search disabled."
+    async def web_search(self, query, count=5) -> list[dict] | None:
+        """Brave results as [{"title", "description", "url"}]; None if search is disabled or failed."""
+        if not self.brave_key: return None
         try:
             url = "https://api.search.brave.com/res/v1/web/search"
             headers = {"X-Subscription-Token": self.brave_key}
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(url, headers=headers, params={"q": query})
-                if resp.status_code == 200:
-                    results = resp.json().get('web', {}).get('results', [])
-                    return "\n".join([f"- {r['title']}: {r['description']}" for r in results[:3]])
+            resp = await self.http.get(url, headers=headers, params={"q": query, "count": count}, timeout=SEARCH_TIMEOUT)
+            if resp.status_code == 200:
+                results = resp.json().get('web', {}).get('results', [])
+                return [
+                    {"title": r.get('title', ''), "description": r.get('description', ''), "url": r.get('url', '')}
+                    for r in results[:count]
+                ]
+            logger.warning(f"Search error: HTTP {resp.status_code}")
         except Exception as e:
             logger.error(f"Search error: {e}")
-        return "Search failed."
+        return None
@@ -4,15 +4,20 @@ import re
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PERSONA = "a witty, friendly, and slightly sassy group member"
+
 class DecisionEngine:
-    def __init__(self, bot_name="AI618"):
+    def __init__(self, bot_name="AI618", persona=None):
         self.bot_name = bot_name
+        self.persona = persona or DEFAULT_PERSONA
 
-    def get_decision_prompt(self, current_message, recent_history):
+    def get_decision_prompt(self, current_message, recent_history, summary=""):
         """
         Constructs the prompt for the AI to decide if it should speak.
+        `summary` is the chat's rolling summary of everything older.
         """
         history_text = "\n".join(recent_history[-5:]) # Last 5 messages
+        summary_section = f"**Earlier in this chat:** {summary}\n\n" if summary else ""
         
         return (
             f"You are {self.bot_name}, a cool, witty group chat member (NOT an assistant). "
@@ -21,30 +26,43 @@ class DecisionEngine:
             f"1. SPEAK IF: You are directly mentioned, asked a question, someone says '{self.bot_name}', or you have a burning witty comment.\n"
             "2. QUIET IF: The conversation is private between others, boring, or you spoke recently.\n"
             "3. DO NOT speak just to say 'lol' or 'ok' constantly.\n\n"
+            f"{summary_section}"
             f"**Recent Chat:**\n{history_text}\n\n"
             f"**Current Message:** {current_message}\n\n"
             "Reply with JSON ONLY: {\"should_reply\": true/false, \"reason\": \"...\"}"
         )
 
-    def get_response_prompt(self, user_name, message, memories, history):
+    def get_response_prompt(self, user_name, message, memories, history, search_results="", summary="",
+                            others_memories=""):
         """
         Constructs the final prompt for generating the response.
+        `search_results` are compressed web snippets for factual questions;
+        with a rolling `summary` fewer raw history lines are needed.
+        `others_memories` are facts about the other people in the conversation.
         """
-        history_text = "\n".join(history[-10:])
+        history_text = "\n".join(history[-5:] if summary else history[-10:])
+        summary_section = f"**Earlier in this chat:** {summary}\n\n" if summary else ""
         
         memory_section = ""
         if memories:
             memory_section = f"\n\n🧠 **Things you remember about {user_name}:**\n{memories}\n(Use these naturally if relevant)"
+        if others_memories:
+            memory_section += f"\n\n👥 **Things you remember about others in this chat:**\n{others_memories}"
+
+        search_section = ""
+        if search_results:
+            search_section = f"\n\n🔎 **Fresh from a web search:**\n{search_results}\n(Answer from these if they cover the question, in your own words; no links)"
 
         return (
-            f"You are {self.bot_name}, a witty, friendly, and slightly sassy group member. "
+            f"You are {self.bot_name}, {self.persona}. "
             "You are NOT a helpful AI assistant. You are a friend.\n\n"
             "**Style Guide:**\n"
             "- Keep it short (1-2 sentences usually).\n"
             "- Use casual English/Hinglish (yaar, lol, actually).\n"
             "- Be funny but not cringe.\n"
             "- If they insult you, roast them back gently.\n"
-            f"{memory_section}\n\n"
+            f"{memory_section}{search_section}\n\n"
+            f"{summary_section}"
             f"**Conversation History:**\n{history_text}\n\n"
             f"**{user_name} just said:** {message}\n\n"
             "Your Reply:"
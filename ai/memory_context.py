@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+from modules import metrics
+
+# How long a chat reuses the memories it fetched: about one back-and-forth on a topic
+MEMORY_CONTEXT_TTL = int(os.environ.get("MEMORY_CONTEXT_TTL", 300))
+# Recent speakers per chat whose memories are fetched together
+MAX_SPEAKERS = 5
+
+
+class ChatMemoryContext:
+    """
+    Per-chat memory context. The first reply in a conversation fetches the
+    memories of every recent speaker with one batched query. Replies within
+    MEMORY_CONTEXT_TTL reuse them, so people talking back and forth cost no
+    further lookups, and a reply can use what the bot knows about the others
+    in the chat. Entries are dropped as soon as a speaker's memories are
+    added or forgotten; changes for anyone else leave the chat's cache alone.
+    """
+
+    def __init__(self, memory, ttl: float = MEMORY_CONTEXT_TTL, max_speakers: int = MAX_SPEAKERS):
+        self.memory = memory
+        self.ttl = ttl
+        self.max_speakers = max_speakers
+        self.speakers = {}  # chat_id -> {user id: first name}, most recent last
+        self._entries = {}  # chat_id -> (expires, {user id: facts})
+        # user id -> [fetches in flight that include them, invalidations seen since the first started];
+        # a fetch is only stored if none of its speakers changed while it ran
+        self._inflight = {}
+        self._lock = threading.Lock()
+        memory.on_change(self.invalidate_user)
+
+    def observe(self, chat_id: str, user_id, name: str):
+        """Records a message from `user_id`, making them a recent speaker in the chat."""
+        speakers = self.speakers.setdefault(chat_id, {})
+        speakers.pop(str(user_id), None)
+        speakers[str(user_id)] = name
+        if len(speakers) > self.max_speakers:
+            del speakers[next(iter(speakers))]
+
+    def get(self, chat_id: str, user_id, query_text: str) -> tuple[str, str]:
+        """
+        (memories about `user_id`, memories about the other recent speakers),
+        formatted for the response prompt. Runs the query off the loop
+        (asyncio.to_thread) on a miss.
+        """
+        user = str(user_id)
+        facts = self._facts(chat_id, user, query_text)
+        own = "\n".join(f"- {fact}" for fact in facts.get(user, []))
+        names = self.speakers.get(chat_id, {})
+        others = "\n".join(
+            f"- {names.get(other, 'Someone')}: {fact}"
+            for other, items in facts.items() if other != user
+            for fact in items
+        )
+        return own, others
+
+    def _facts(self, chat_id: str, user: str, query_text: str) -> dict:
+        entry = self._entries.get(chat_id)
+        now = time.monotonic()
+        if entry and entry[0] > now and user in entry[1]:
+            metrics.CACHE_REQUESTS.inc(1, ("memory_context", "hit"))
+            return entry[1]
+        metrics.CACHE_REQUESTS.inc(1, ("memory_context", "miss"))
+
+        speakers = list(self.speakers.get(chat_id, {}))
+        if user not in speakers:
+            speakers.append(user)
+        with self._lock:
+            seen = {}
+            for speaker in speakers:
+                record = self._inflight.setdefault(speaker, [0, 0])
+                record[0] += 1
+                seen[speaker] = record[1]
+        facts = None
+        try:
+            facts = self.memory.get_memories_for_users(speakers, query_text)
+        finally:
+            with self._lock:
+                fresh = facts is not None
+                for speaker in speakers:
+                    record = self._inflight[speaker]
+                    fresh = fresh and record[1] == seen[speaker]
+                    record[0] -= 1
+                    if not record[0]:
+                        del self._inflight[speaker]
+                if fresh:
+                    self._entries[chat_id] = (now + self.ttl, facts)
+        return facts or {}
+
+    def invalidate_user(self, user_id):
+        """Drops every cached chat context that includes `user_id`."""
+        user = str(user_id)
+        with self._lock:
+            if user in self._inflight:
+                self._inflight[user][1] += 1
+            for chat_id, (_, facts) in list(self._entries.items()):
+                if user in facts:
+                    del self._entries[chat_id]
@@ -1,25 +1,124 @@
 import os
+import re
 import logging
 import hashlib
+import threading
+from urllib.parse import urlparse
+import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
+from modules import tracing
 
 logger = logging.getLogger(__name__)
 
+# ":memory:" keeps the store in-process (benchmarks, tests); "hash" selects the
+# deterministic offline embeddings below instead of the local model.
+MEMORY_DB_PATH = os.environ.get("MEMORY_DB_PATH", "data/memory_db")
+MEMORY_EMBEDDINGS = os.environ.get("MEMORY_EMBEDDINGS", "default")
+COLLECTION_NAME = "user_personalities"
+
+
+class HashEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """
+    Feature-hashed bag of words. No model download and identical vectors on
+    every machine, so it stands in for real embeddings in benchmarks.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dim, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(word.encode()).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                vector[index] += 1.0 if digest[4] & 1 else -1.0
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "hash"
+
+    def get_config(self):
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config):
+        return HashEmbeddingFunction(config.get("dim", 256))
+
+
 class MemoryManager:
-    def __init__(self, openai_api_key=None):
-        # Setup storage path
-        self.db_path = "data/memory_db"
-        os.makedirs(self.db_path, exist_ok=True)
-        
+    def __init__(self, openai_api_key=None, db_path=None, embeddings=None, collection_config=None,
+                 collection_name=COLLECTION_NAME):
+        # Setup storage path: a directory, ":memory:", or a Chroma server URL
+        # (http://host:port), which shard workers need to share one store
+        self.db_path = db_path or MEMORY_DB_PATH
+        self.openai_api_key = openai_api_key
+        self.embeddings = embeddings or MEMORY_EMBEDDINGS
+        self.collection_config = collection_config
+        self.collection_name = collection_name
+        self._parent = None
+        self._collection = None
+        self._lock = threading.Lock()
+        self._listeners = []  # called with a user id whenever that user's memories change
+
+    def for_bot(self, bot_key: str) -> "MemoryManager":
+        """
+        Memories of another bot hosted in this process: its own collection in
+        the same store, opened through this manager's client and embedding
+        function, so the embedding model is loaded only once.
+        """
+        view = MemoryManager(self.openai_api_key, self.db_path, self.embeddings, self.collection_config,
+                             collection_name=f"{self.collection_name}-{bot_key}")
+        view._parent = self
+        return view
+
+    def on_change(self, callback):
+        """Registers `callback(user_id)`, run after memories are added for or forgotten about a user."""
+        self._listeners.append(callback)
+
+    def _changed(self, user_id):
+        for callback in self._listeners:
+            callback(user_id)
+
+    @property
+    def collection(self):
+        """Opened on first use, so importing the bot (or a shard front process) never touches the store."""
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = self._open()
+        return self._collection
+
+    def _open(self):
+        if self._parent is not None:
+            self._parent.collection  # opens the shared client and embedding function
+            self.client = self._parent.client
+            self.embedding_fn = self._parent.embedding_fn
+            return self._get_collection()
+
         # Initialize ChromaDB Client
-        self.client = chromadb.PersistentClient(path=self.db_path)
+        if self.db_path == ":memory:":
+            client = chromadb.EphemeralClient()
+        elif self.db_path.startswith(("http://", "https://")):
+            url = urlparse(self.db_path)
+            client = chromadb.HttpClient(host=url.hostname, port=url.port or 8000, ssl=url.scheme == "https")
+        else:
+            os.makedirs(self.db_path, exist_ok=True)
+            client = chromadb.PersistentClient(path=self.db_path)
         
         # Setup Embeddings: Use OpenAI if available, else default to local (free)
         # This ensures it works even without paid keys
-        if openai_api_key:
+        if self.embeddings == "hash":
+            self.embedding_fn = HashEmbeddingFunction()
+            logger.info("Memory Manager: Using Hash Embeddings (offline)")
+        elif self.openai_api_key:
             self.embedding_fn = embedding_functions.OpenAIEmbeddingFunction(
-                api_key=openai_api_key,
+                api_key=self.openai_api_key,
                 model_name="text-embedding-3-small"
             )
             logger.info("Memory Manager: Using OpenAI Embeddings")
@@ -27,14 +126,25 @@ class MemoryManager:
             # Default uses all-MiniLM-L6-v2 (runs locally, no API key needed)
             self.embedding_fn = embedding_functions.DefaultEmbeddingFunction()
             logger.info("Memory Manager: Using Local Default Embeddings (Free)")
-        
+        self.client = client
+        return self._get_collection()
+
+    def _get_collection(self):
         # Get or create the collection for user memories
-        self.collection = self.client.get_or_create_collection(
-            name="user_personalities",
+        # collection_config tunes the HNSW index (see bench_memory.py); None keeps Chroma's defaults
+        collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            configuration=self.collection_config,
             embedding_function=self.embedding_fn
         )
         
-        logger.info(f"Memory Manager initialized. Collection count: {self.collection.count()}")
+        logger.info(f"Memory Manager initialized ({self.collection_name}). Collection count: {collection.count()}")
+        return collection
+
+    @staticmethod
+    def fact_id(user_id: int, fact: str) -> str:
+        # Hashing the fact ensures we don't store "I like cats" twice for the same user
+        return f"{user_id}_{hashlib.md5(fact.encode()).hexdigest()}"
 
     def add_memory(self, user_id: int, username: str, fact: str):
         """Save a new fact about a user."""
@@ -42,34 +152,36 @@ class MemoryManager:
             return
 
         try:
-            # Create a unique ID for this memory to prevent duplicates
-            # Hashing the fact ensures we don't store "I like cats" twice for the same user
-            fact_id = f"{user_id}_{hashlib.md5(fact.encode()).hexdigest()}"
+            fact_id = self.fact_id(user_id, fact)
             
             # Check if already exists
-            existing = self.collection.get(ids=[fact_id])
-            if existing and existing['ids']:
-                return
-
-            self.collection.add(
-                documents=[fact],
-                metadatas=[{"user_id": str(user_id), "username": str(username)}],
-                ids=[fact_id]
-            )
+            with tracing.span("memory.add"):
+                existing = self.collection.get(ids=[fact_id])
+                if existing and existing['ids']:
+                    return
+
+                self.collection.add(
+                    documents=[fact],
+                    metadatas=[{"user_id": str(user_id), "username": str(username)}],
+                    ids=[fact_id]
+                )
             logger.info(f"🧠 Memory added for {username}: {fact[:30]}...")
         except Exception as e:
             logger.error(f"Failed to add memory: {e}")
+            return
+        self._changed(user_id)
 
     def get_relevant_memories(self, user_id: int, query_text: str, limit: int = 3) -> str:
         """
         Find past memories relevant to the current topic (RAG).
         """
         try:
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=limit,
-                where={"user_id": str(user_id)}  # Filter by this user
-            )
+            with tracing.span("memory.query"):
+                results = self.collection.query(
+                    query_texts=[query_text],
+                    n_results=limit,
+                    where={"user_id": str(user_id)}  # Filter by this user
+                )
             
             if not results['documents'] or not results['documents'][0]:
                 return ""
@@ -83,11 +195,42 @@ class MemoryManager:
             logger.error(f"Failed to retrieve memories: {e}")
             return ""
 
+    def get_memories_for_users(self, user_ids, query_text: str, limit: int = 3) -> dict[str, list[str]] | None:
+        """
+        Memories of several users relevant to one topic, from a single query:
+        {user id: up to `limit` facts, most relevant first}, None on failure.
+        The nearest facts overall are split by user, so a user whose facts
+        are all far from the topic may get fewer than `limit`.
+        """
+        users = [str(user_id) for user_id in user_ids]
+        found = {user: [] for user in users}
+        if not users:
+            return found
+        try:
+            where = {"user_id": users[0]} if len(users) == 1 else {"user_id": {"$in": users}}
+            with tracing.span("memory.query", users=len(users)):
+                results = self.collection.query(
+                    query_texts=[query_text],
+                    n_results=limit * len(users) * 2,
+                    where=where
+                )
+            if results['documents'] and results['documents'][0]:
+                for fact, metadata in zip(results['documents'][0], results['metadatas'][0]):
+                    facts = found.get(metadata.get("user_id"))
+                    if facts is not None and len(facts) < limit:
+                        facts.append(fact)
+            return found
+        except Exception as e:
+            logger.error(f"Failed to retrieve memories: {e}")
+            return None
+
     def forget_user(self, user_id: int):
         """Delete all memories for a user."""
         try:
-            self.collection.delete(where={"user_id": str(user_id)})
-            return True
+            with tracing.span("memory.forget"):
+                self.collection.delete(where={"user_id": str(user_id)})
         except Exception as e:
             logger.error(f"Failed to clear memories: {e}")
             return False
+        self._changed(user_id)
+        return True
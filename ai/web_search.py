@@ -0,0 +1,159 @@
+import os
+import re
+import html
+import asyncio
+import logging
+import tiktoken
+from modules import metrics
+from modules import tracing
+from modules.cache import PersistentCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Search results go stale slowly; scores and news within a few hours
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 6 * 3600))
+# Snippet tokens allowed into the response prompt
+SEARCH_TOKEN_BUDGET = int(os.environ.get("SEARCH_TOKEN_BUDGET", 300))
+
+_WORD = re.compile(r"\w+")
+_TAG = re.compile(r"<[^>]+>")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+
+_QUESTION_WORDS = frozenset("who what whats when where which how is are was were did does do can will".split())
+_FACTUAL_CUES = frozenset((
+    "latest news today yesterday tonight current currently price cost score result results won win winner "
+    "weather release released launch launched population capital ceo president minister pm election stock "
+    "rate died born founded invented discovered record final schedule"
+).split())
+_ABOUT_THE_CHAT = frozenset("you your yourself u ur i me my mine we our".split())
+# Chat filler that only adds noise to a search query (and to its cache key)
+_FILLER = frozenset("hey hi hello yo bot bro yaar pls please plz lol tell me can you do know".split())
+
+_encoding = None  # tiktoken encoding; False once it turned out to be unavailable
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # The encoding is downloaded on first use, which fails offline
+            logger.warning(f"tiktoken encoding unavailable ({e}); estimating tokens from length")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    return len(encoding.encode(text)) if encoding else (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    encoding = _get_encoding()
+    if not encoding:
+        return text[:budget * 4]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
+
+
+def needs_search(text: str, ignore=frozenset()) -> bool:
+    """
+    Local, rule-based guess at whether a message asks a factual question the
+    web can answer ("who won the final yesterday?", "what is Rust?") rather
+    than chat directed at the group or the bot ("how are you?").
+    """
+    tokens = _WORD.findall(text)
+    words = [token.lower() for token in tokens]
+    if len(words) < 3:
+        return False
+    # Question word near the start, allowing for a greeting or mention first
+    asked = next((i for i, word in enumerate(words[:3]) if word in _QUESTION_WORDS), None)
+    if asked is None and "?" not in text:
+        return False
+    if _YEAR.search(text) or not _FACTUAL_CUES.isdisjoint(words):
+        return True
+    if not _ABOUT_THE_CHAT.isdisjoint(words):
+        return False
+    # "who is Elon Musk", "what is Python": a named thing after the question word
+    named = tokens[(asked or 0) + 1:]
+    return any(token[0].isupper() and token.lower() not in ignore for token in named)
+
+
+def normalize_query(text: str, ignore=frozenset()) -> str:
+    """Lowercased words without chat filler; doubles as the cache key."""
+    return " ".join(word for word in _WORD.findall(text.lower()) if word not in _FILLER and word not in ignore)
+
+
+def _clean(text: str) -> str:
+    return " ".join(html.unescape(_TAG.sub("", text)).split())
+
+
+def compress(results: list[dict], query: str, budget: int = SEARCH_TOKEN_BUDGET) -> str:
+    """
+    Packs search results into at most `budget` tokens: markup stripped,
+    repeated sentences dropped and each snippet cut to the two sentences that
+    share the most words with the query.
+    """
+    terms = set(_WORD.findall(query.lower()))
+    seen = set()
+    lines = []
+    used = 0
+    for result in results:
+        sentences = [s for s in _SENTENCE_END.split(_clean(result.get("description", ""))) if s.lower() not in seen]
+        best = sorted(sentences, key=lambda s: -len(terms.intersection(_WORD.findall(s.lower()))))[:2]
+        keep = [s for s in sentences if s in best]  # original order reads better
+        if not keep:
+            continue
+        seen.update(s.lower() for s in keep)
+        title = _clean(result.get("title", ""))
+        line = f"- {title}: {' '.join(keep)}" if title else f"- {' '.join(keep)}"
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            if not lines:
+                lines.append(truncate_tokens(line, budget))
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+class WebSearch:
+    """
+    Search-augmented answering: decides locally whether a message needs a web
+    search and returns compressed snippets for the response prompt. Results
+    are cached by normalized query, and concurrent identical queries share
+    one request.
+    """
+
+    def __init__(self, api_client, ignore=(), cache: PersistentCache | None = None):
+        self.api_client = api_client
+        self.ignore = frozenset(word.lower() for word in ignore)
+        self.cache = cache or PersistentCache("web_search", ttl=SEARCH_CACHE_TTL)
+        self.flights = SingleFlight()
+
+    async def context_for(self, text: str) -> str:
+        """Snippets for `text`, or "" when it doesn't need (or couldn't get) a search."""
+        if not self.api_client.brave_key or not needs_search(text, self.ignore):
+            return ""
+        query = normalize_query(text, self.ignore)
+        if not query:
+            return ""
+        cached = self.cache.get(query)
+        if cached is not None:
+            metrics.SEARCH_REQUESTS.inc(1, ("cached",))
+            return cached
+        return await self.flights.do(query, lambda: self._fetch(query))
+
+    async def _fetch(self, query: str) -> str:
+        with tracing.span("search", query=query):
+            results = await self.api_client.web_search(query)
+        if results is None:
+            metrics.SEARCH_REQUESTS.inc(1, ("failed",))
+            return ""
+        metrics.SEARCH_REQUESTS.inc(1, ("fetched",))
+        # Off the loop: the first call may have to load the tokenizer
+        snippets = await asyncio.to_thread(compress, results, query)
+        self.cache.set(query, snippets)
+        return snippets
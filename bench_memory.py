@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for MemoryManager.
+
+Grows a memory store through checkpoints (e.g. 10k, 100k, 1M facts) across
+many synthetic users and, at each checkpoint, measures:
+- add_memory throughput (the bot's real one-fact-at-a-time path)
+- get_relevant_memories latency distribution and recall@k against exact search
+- on-disk size of the store and process RSS
+
+Embeddings come from the deterministic HashEmbeddingFunction and all data is
+seeded, so runs are comparable. Each storage configuration runs in its own
+process so RSS numbers don't bleed into each other.
+
+    python bench_memory.py --facts 10000 100000 --users 2000
+    python bench_memory.py --configs default fast-build high-recall ephemeral --json memory.json
+"""
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import logging
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ai.memory_manager import MemoryManager, HashEmbeddingFunction
+
+# name: (on-disk?, Chroma collection configuration)
+CONFIGS = {
+    "default": (True, None),
+    "ephemeral": (False, None),
+    "fast-build": (True, {"hnsw": {"ef_construction": 64, "max_neighbors": 8, "ef_search": 32}}),
+    "high-recall": (True, {"hnsw": {"ef_construction": 200, "max_neighbors": 32, "ef_search": 200}}),
+    "large-sync": (True, {"hnsw": {"batch_size": 1000, "sync_threshold": 10000}}),
+}
+
+SUBJECTS = ["Lives in", "Works in", "Studies in", "Grew up in", "Travels often to", "Wants to move to"]
+PLACES = ["Delhi", "Pune", "Mumbai", "Kolkata", "Chennai", "Jaipur", "Goa", "Shimla", "Indore", "Surat"]
+LIKES = ["cricket", "chess", "biryani", "anime", "guitar", "chemistry", "trekking", "poetry", "football", "coding"]
+QUERIES = ["where do you live", "what food do you like", "do you play any sport", "what are you studying",
+           "any travel plans", "what music do you play"]
+
+PRELOAD_BATCH = 2000
+
+
+def synthetic_fact(rng, n):
+    # The trailing counter keeps facts (and their ids) unique at any scale
+    return f"{rng.choice(SUBJECTS)} {rng.choice(PLACES)} and likes {rng.choice(LIKES)} and {rng.choice(LIKES)} #{n}"
+
+
+def zipf_user(rng, users):
+    """A few chatty users hold most facts, like a real group."""
+    return min(users, int(rng.paretovariate(1.2))) - 1
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def dir_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total / 2**20
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda pct: values[min(len(values) - 1, int(pct / 100 * len(values)))] * 1000
+    return {"p50": round(pick(50), 3), "p95": round(pick(95), 3), "p99": round(pick(99), 3), "max": round(values[-1] * 1000, 3)}
+
+
+class Workload:
+    """Seeded stream of (user_id, fact) plus a per-user index used for exact recall."""
+
+    def __init__(self, users, seed):
+        self.users = users
+        self.rng = random.Random(seed)
+        self.count = 0
+        self.facts_by_user = {}
+
+    def take(self, n):
+        batch = []
+        for _ in range(n):
+            user_id = zipf_user(self.rng, self.users)
+            fact = synthetic_fact(self.rng, self.count)
+            self.count += 1
+            self.facts_by_user.setdefault(user_id, []).append(fact)
+            batch.append((user_id, fact))
+        return batch
+
+
+def preload(manager, batch):
+    """Bulk-loads facts with the same ids and metadata add_memory would write."""
+    for i in range(0, len(batch), PRELOAD_BATCH):
+        chunk = batch[i:i + PRELOAD_BATCH]
+        manager.collection.add(
+            documents=[fact for _, fact in chunk],
+            metadatas=[{"user_id": str(user_id), "username": f"user{user_id}"} for user_id, _ in chunk],
+            ids=[manager.fact_id(user_id, fact) for user_id, fact in chunk],
+        )
+
+
+def recall_hits(embed, query, facts, found, k):
+    """How many returned facts are within the exact k-th nearest distance (ties count as hits)."""
+    distances = dict(zip(facts, ((np.array(embed(facts)) - np.array(embed([query])[0])) ** 2).sum(axis=1)))
+    threshold = sorted(distances.values())[min(k, len(facts)) - 1] + 1e-6
+    return sum(1 for fact in found if distances.get(fact, np.inf) <= threshold)
+
+
+def run_config(name, checkpoints, users, inserts, queries, k, seed, path):
+    logging.disable(logging.INFO)
+    on_disk, collection_config = CONFIGS[name]
+    store = tempfile.mkdtemp(prefix=f"memory-{name}-", dir=path) if on_disk else ":memory:"
+    manager = MemoryManager(db_path=store, embeddings="hash", collection_config=collection_config)
+    embed = HashEmbeddingFunction()
+    workload = Workload(users, seed)
+    rng = random.Random(seed + 1)
+    baseline_rss = rss_mb()
+    results = []
+
+    try:
+        for target in checkpoints:
+            started = time.perf_counter()
+            preload(manager, workload.take(max(0, target - workload.count - inserts)))
+            preload_s = time.perf_counter() - started
+
+            # The bot's path: one add_memory (get + add) per extracted fact
+            started = time.perf_counter()
+            for user_id, fact in workload.take(inserts):
+                manager.add_memory(user_id, f"user{user_id}", fact)
+            insert_s = time.perf_counter() - started
+
+            hot_users = [u for u, facts in workload.facts_by_user.items() if len(facts) >= k]
+            latencies, hits = [], 0
+            for _ in range(queries):
+                user_id = rng.choice(hot_users)
+                query = rng.choice(QUERIES)
+                started = time.perf_counter()
+                found = manager.get_relevant_memories(user_id, query, limit=k)
+                latencies.append(time.perf_counter() - started)
+                got = [line[2:] for line in found.splitlines()]
+                hits += recall_hits(embed, query, workload.facts_by_user[user_id], got, k)
+
+            results.append({
+                "facts": workload.count,
+                "users_with_facts": len(workload.facts_by_user),
+                "preload_facts_per_s": round((target - inserts) / preload_s, 1) if preload_s and target > inserts else None,
+                "add_memory_per_s": round(inserts / insert_s, 1) if inserts else None,
+                "query_ms": percentiles(latencies),
+                f"recall_at_{k}": round(hits / (queries * k), 3),
+                "disk_mb": round(dir_size_mb(store), 1) if on_disk else 0.0,
+                "rss_mb": round(rss_mb(), 1),
+                "rss_growth_mb": round(rss_mb() - baseline_rss, 1),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            })
+    finally:
+        if on_disk:
+            shutil.rmtree(store, ignore_errors=True)
+    return results
+
+
+def print_table(name, rows, k):
+    print(f"\n== {name} ==")
+    print(f"{'facts':>9} {'users':>7} {'preload/s':>10} {'add/s':>8} {'q p50':>8} {'q p95':>8} {'q p99':>8} "
+          f"{'recall':>7} {'disk MB':>8} {'RSS MB':>8}")
+    for row in rows:
+        q = row["query_ms"]
+        print(f"{row['facts']:>9} {row['users_with_facts']:>7} {row['preload_facts_per_s'] or '-':>10} "
+              f"{row['add_memory_per_s'] or '-':>8} {q['p50']:>8} {q['p95']:>8} {q['p99']:>8} "
+              f"{row[f'recall_at_{k}']:>7} {row['disk_mb']:>8} {row['rss_mb']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facts", type=int, nargs="+", default=[10_000, 100_000], help="checkpoint sizes")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--inserts", type=int, default=500, help="add_memory calls measured per checkpoint")
+    parser.add_argument("--queries", type=int, default=300, help="queries measured per checkpoint")
+    parser.add_argument("--k", type=int, default=3, help="memories per query (the bot uses 3)")
+    parser.add_argument("--configs", nargs="+", choices=sorted(CONFIGS), default=["default"])
+    parser.add_argument("--path", default=None, help="where on-disk stores are created (default: temp dir)")
+    parser.add_argument("--seed", type=int, default=618)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    checkpoints = sorted(args.facts)
+    results = {}
+    for name in args.configs:
+        # A fresh process per configuration keeps RSS measurements independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            rows = pool.submit(run_config, name, checkpoints, args.users, args.inserts,
+                               args.queries, args.k, args.seed, args.path).result()
+        results[name] = rows
+        print_table(name, rows, args.k)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark for master_text_handler.
+
+Drives synthetic group-chat updates through the real Application (handlers,
+job queue, memory) with a stand-in LLM provider and a fake Bot API, then
+reports latency percentiles, throughput and calls per message. Everything is
+seeded, so call counts are identical between runs and latency figures are
+comparable on the same machine.
+
+    python bench_pipeline.py --chats 20 --messages 50 --profile typical
+    python bench_pipeline.py --json results.json
+    python bench_pipeline.py --baseline results.json --max-regression 0.2
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+
+# Offline, in-process stores; must be set before main is imported
+os.environ.setdefault("MEMORY_DB_PATH", ":memory:")
+os.environ.setdefault("MEMORY_EMBEDDINGS", "hash")
+os.environ.setdefault("CACHE_DB_PATH", ":memory:")
+os.environ.setdefault("TRIVIA_DB_PATH", ":memory:")
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("CEREBRAS_API_KEY", "bench")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("BRAVE_API_KEY", "bench")
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+import main
+from modules import metrics
+
+BOT_TOKEN = "123456:bench"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "AI618", "username": "ai618_bot"}
+
+# name: (mean latency seconds, lognormal sigma, error rate)
+LLM_PROFILES = {
+    "fast": (0.05, 0.3, 0.0),
+    "typical": (0.4, 0.5, 0.02),
+    "degraded": (1.5, 0.8, 0.2),
+}
+
+NAMES = ["Aarav", "Diya", "Kabir", "Meera", "Rohan", "Sara", "Vivaan", "Zoya"]
+FACTS = [
+    "I live in Pune and work as a data analyst",
+    "I have been learning the guitar for two years now",
+    "my favourite food is definitely paneer tikka",
+    "I am studying organic chemistry for my exams",
+    "I just moved to Bangalore for a new job",
+]
+CHATTER = ["lol", "same", "what happened", "no way", "send the notes pls", "who is coming tonight", "ok done"]
+QUESTIONS = ["ai618 what do you think", "ai618 settle this argument", "ai618 tell me a joke about exams",
+             "ai618 who won the cricket world cup final in 2011?"]
+
+
+class StubLLM:
+    """Stand-in provider: seeded latency and failures, plausible replies per prompt kind."""
+
+    def __init__(self, latency, sigma, error_rate, seed):
+        self.latency = latency
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = Counter()
+        self.searches = 0
+
+    @staticmethod
+    def kind(messages):
+        prompt = messages[-1]["content"]
+        if messages[0]["role"] == "system" and "emoji" in messages[0]["content"]:
+            return "reaction"
+        if "Reply with JSON ONLY" in prompt:
+            return "decision"
+        if prompt.startswith("Analyze this message"):
+            return "fact"
+        if "Chat Log:" in prompt:
+            return "random_chat"
+        if prompt.startswith("You keep a running summary"):
+            return "summary"
+        return "response"
+
+    def provider(self, name):
+        async def call(messages):
+            kind = self.kind(messages)
+            # Seed from the prompt itself so outcomes don't depend on interleaving
+            rng = random.Random(f"{self.seed}:{name}:{messages[-1]['content']}")
+            await asyncio.sleep(self.latency * rng.lognormvariate(0, self.sigma))
+            self.calls[kind] += 1
+            if rng.random() < self.error_rate:
+                return None
+            if kind == "reaction":
+                return "😂"
+            if kind == "decision":
+                return json.dumps({"should_reply": rng.random() < 0.2, "reason": "bench"})
+            if kind == "fact":
+                return "Lives in Pune" if rng.random() < 0.3 else "None"
+            if kind == "summary":
+                return "Everyone is cramming for exams; Rohan owes Diya notes."
+            return "haha yaar that's actually true"
+        return call
+
+    async def search(self, query, count=5):
+        """Stand-in for APIClient.web_search, at a quarter of the LLM latency."""
+        rng = random.Random(f"{self.seed}:search:{query}")
+        await asyncio.sleep(self.latency / 4 * rng.lognormvariate(0, self.sigma))
+        self.searches += 1
+        if rng.random() < self.error_rate:
+            return None
+        return [{"title": f"Result {i} for {query}", "description": f"<strong>{query}</strong> happened. More text here.",
+                 "url": f"https://example.com/{i}"} for i in range(count)]
+
+
+class FakeBotAPI(BaseRequest):
+    """Answers Bot API calls locally after a fixed delay and counts them by method."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 10_000
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data else {}
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in ("sendMessage", "sendVoice", "sendAudio", "sendPhoto"):
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "supergroup"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def synthetic_chat(chat_index, messages, seed):
+    """Deterministic message payloads for one simulated group chat."""
+    rng = random.Random(f"{seed}:chat:{chat_index}")
+    chat = {"id": -1000000000000 - chat_index, "type": "supergroup", "title": f"Bench {chat_index}"}
+    members = rng.sample(NAMES, rng.randint(3, 6))
+    payloads = []
+    for n in range(messages):
+        name = rng.choice(members)
+        roll = rng.random()
+        if roll < 0.15:
+            text = rng.choice(QUESTIONS)
+        elif roll < 0.5:
+            text = rng.choice(FACTS)
+        else:
+            text = rng.choice(CHATTER)
+        payloads.append({
+            "update_id": chat_index * messages + n + 1,
+            "message": {
+                "message_id": n + 1,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": {"id": 1000 + NAMES.index(name), "is_bot": False, "first_name": name},
+                "text": text,
+            },
+        })
+    return payloads
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run(args):
+    latency, sigma, error_rate = LLM_PROFILES[args.profile]
+    if args.llm_latency is not None:
+        latency = args.llm_latency
+    if args.error_rate is not None:
+        error_rate = args.error_rate
+
+    llm = StubLLM(latency, sigma, error_rate, args.seed)
+    main.api_client._call_cerebras = llm.provider("cerebras")
+    main.api_client._call_groq = llm.provider("groq")
+    main.api_client.chatanywhere_key = None
+    main.api_client.web_search = llm.search
+
+    bot_api = FakeBotAPI(args.api_latency)
+    # Telegram's flood limits would dominate the numbers; the bench measures the pipeline
+    app = main.build_application(BOT_TOKEN, polling=False, request=bot_api, rate_limit=False)
+    latencies = []
+
+    async def drive(payloads):
+        for payload in payloads:
+            update = Update.de_json(payload, app.bot)
+            # Reactions roll the module-level RNG before the handler first
+            # suspends, so reseeding per update makes them order-independent
+            random.seed(f"{args.seed}:{payload['update_id']}")
+            start = time.perf_counter()
+            await app.process_update(update)
+            latencies.append(time.perf_counter() - start)
+
+    chats = [synthetic_chat(i, args.messages, args.seed) for i in range(args.chats)]
+    async with app:
+        await app.start()
+        bot_api.calls.clear()  # Don't count getMe from initialize
+        started = time.perf_counter()
+        await asyncio.gather(*(drive(payloads) for payloads in chats))
+        elapsed = time.perf_counter() - started
+        await app.stop()
+
+    latencies.sort()
+    total = len(latencies)
+    stages = {
+        labels[0]: round(series[-2] / series[-1] * 1000, 2)
+        for labels, series in metrics.STAGE_LATENCY.series.items() if series[-1]
+    }
+    return {
+        "config": {
+            "chats": args.chats, "messages_per_chat": args.messages, "seed": args.seed,
+            "profile": args.profile, "llm_latency": latency, "error_rate": error_rate,
+            "api_latency": args.api_latency,
+        },
+        "messages": total,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(total / elapsed, 2),
+        "latency_ms": {
+            name: round(percentile(latencies, pct) * 1000, 2)
+            for name, pct in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "llm_calls_per_message": round(sum(llm.calls.values()) / total, 3),
+        "llm_calls": dict(sorted(llm.calls.items())),
+        "web_searches": llm.searches,
+        "api_calls_per_message": round(sum(bot_api.calls.values()) / total, 3),
+        "api_calls": dict(sorted(bot_api.calls.items())),
+        "stage_mean_ms": dict(sorted(stages.items())),
+    }
+
+
+def print_report(result):
+    config = result["config"]
+    print(f"{result['messages']} messages across {config['chats']} chats "
+          f"(profile={config['profile']}, llm={config['llm_latency']}s, errors={config['error_rate']:.0%}, seed={config['seed']})")
+    print(f"Throughput: {result['messages_per_s']} msg/s over {result['elapsed_s']}s")
+    print("Latency:    " + "  ".join(f"{k}={v}ms" for k, v in result["latency_ms"].items()))
+    print(f"LLM calls/message: {result['llm_calls_per_message']}  {result['llm_calls']}  web searches: {result['web_searches']}")
+    print(f"Bot API calls/message: {result['api_calls_per_message']}  {result['api_calls']}")
+    print("Stage means: " + "  ".join(f"{k}={v}ms" for k, v in result["stage_mean_ms"].items()))
+
+
+def compare(result, baseline, max_regression):
+    """Prints deltas against a saved run; returns False if anything regressed past the limit."""
+    ok = True
+    checks = [
+        ("p95 latency", result["latency_ms"]["p95"], baseline["latency_ms"]["p95"], False),
+        ("throughput", result["messages_per_s"], baseline["messages_per_s"], True),
+        ("LLM calls/message", result["llm_calls_per_message"], baseline["llm_calls_per_message"], False),
+        ("API calls/message", result["api_calls_per_message"], baseline["api_calls_per_message"], False),
+    ]
+    for name, now, before, higher_is_better in checks:
+        change = (now - before) / before if before else 0.0
+        regressed = -change > max_regression if higher_is_better else change > max_regression
+        ok = ok and not regressed
+        print(f"{'REGRESSED' if regressed else 'ok':>9}  {name}: {before} -> {now} ({change:+.1%})")
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=30, help="messages per chat")
+    parser.add_argument("--profile", choices=sorted(LLM_PROFILES), default="fast")
+    parser.add_argument("--llm-latency", type=float, help="override the profile's mean LLM latency (s)")
+    parser.add_argument("--error-rate", type=float, help="override the profile's provider error rate")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="fake Bot API latency (s)")
+    parser.add_argument("--seed", type=int, default=618)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json result")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if not compare(result, json.load(f), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for natural-language trigger routing in master_text_handler.
+
+Compares the old chained substring checks with TriggerRouter, then registers
+extra synthetic triggers to show that routing cost per message stays flat as
+features are added, while chained checks grow with every phrase.
+
+    python bench_triggers.py --messages 20000 --extra 0 100 1000
+"""
+import random
+import argparse
+import statistics
+import time
+
+from modules import triggers
+from modules import media  # noqa: F401  (registers the media triggers)
+
+WORDS = ["hey", "what", "is", "this", "lol", "the", "exam", "tomorrow", "robot", "bots", "image", "video",
+         "generate", "create", "explain", "cat", "in", "space", "yaar", "actually", "chemistry", "notes"]
+
+
+def legacy_route(text):
+    """The chained checks master_text_handler used before the router."""
+    text_lower = text.lower()
+    if "generate image" in text_lower or "create image" in text_lower:
+        prompt = text_lower.replace("generate image", "").replace("create image", "").split()
+        if prompt:
+            return "image"
+    if "generate video" in text_lower or "create video" in text_lower:
+        prompt = text_lower.replace("generate video", "").replace("create video", "").strip()
+        if prompt:
+            return "video"
+    if "explain this" in text_lower or "what is this" in text_lower:
+        return "vision"
+    if "ai618" in text_lower or "bot" in text_lower:
+        return "mention"
+    return None
+
+
+def chained_checks(phrases):
+    """The old approach extended to more phrases: one substring test per phrase."""
+    def route(text):
+        text_lower = text.lower()
+        for phrase in phrases:
+            if phrase in text_lower:
+                return phrase
+        return None
+    return route
+
+
+def make_corpus(count, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(2, 40))]
+        if rng.random() < 0.05:
+            words[rng.randrange(len(words))] = rng.choice(["generate image", "create video", "ai618"])
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def ns_per_message(fn, corpus, repeats):
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        runs.append((time.perf_counter() - start) / len(corpus) * 1e9)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--extra", type=int, nargs="+", default=[0, 100, 1000], help="synthetic triggers to add")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=618)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages, args.seed)
+    triggers.router.register("mention", ["ai618", "bot"])
+    print(f"{args.messages} messages, {statistics.mean(len(t) for t in corpus):.0f} chars on average")
+    print(f"{'legacy substring checks':<32} {ns_per_message(legacy_route, corpus, args.repeats):>8.0f} ns/message")
+
+    rng = random.Random(args.seed)
+    phrases = ["generate image", "create image", "generate video", "create video", "explain this", "what is this",
+               "ai618", "bot"]
+    registered = 0
+    for extra in sorted(args.extra):
+        for n in range(registered, extra):
+            added = [f"{rng.choice(WORDS)} feature{n}", f"do thing{n}"]
+            triggers.router.register(f"feature{n}", added)
+            phrases += added
+        registered = max(registered, extra)
+        cost = ns_per_message(triggers.router.match, corpus, args.repeats)
+        chained = ns_per_message(chained_checks(phrases), corpus, args.repeats)
+        print(f"{f'router (+{extra} triggers)':<32} {cost:>8.0f} ns/message")
+        print(f"{f'chained checks (+{extra} triggers)':<32} {chained:>8.0f} ns/message")
+
+
+if __name__ == "__main__":
+    main()
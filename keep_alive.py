@@ -1,24 +1,62 @@
 import os
-from flask import Flask
-from threading import Thread
+import hmac
+import json
+import logging
+from aiohttp import web
+from telegram import Update
+from modules import metrics
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-@app.route('/')
-def home():
-    return "Bot is running!", 200
+PORT = int(os.environ.get('PORT', 8080))
+WEBHOOK_PATH = "/telegram"
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
 
-@app.route('/health')
-def health():
-    return "OK", 200
+async def home(request):
+    return web.Response(text="Bot is running!")
 
-def run():
-    port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port)
+async def health(request):
+    return web.Response(text="OK")
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+async def metrics_endpoint(request):
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+def webhook_handler(application, secret_token):
+    """Feeds Telegram webhook POSTs into the application's update queue."""
+    async def handle(request):
+        if secret_token and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return web.Response()
+    return handle
+
+def create_web_app(application=None, secret_token=None, webhooks=None) -> web.Application:
+    """
+    Health endpoints, plus the webhook endpoint when an application is given.
+    `webhooks` ({path: application}) serves several bots from one server.
+    """
+    web_app = web.Application()
+    web_app.router.add_get('/', home)
+    web_app.router.add_get('/health', health)
+    web_app.router.add_get('/metrics', metrics_endpoint)
+    webhooks = dict(webhooks or {})
+    if application is not None:
+        webhooks[WEBHOOK_PATH] = application
+    for path, app in webhooks.items():
+        web_app.router.add_post(path, webhook_handler(app, secret_token))
+    return web_app
+
+async def start_server(web_app: web.Application, port: int = PORT) -> web.AppRunner:
+    """Serves the app on the running event loop (no extra thread)."""
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    logger.info(f"Web server listening on port {port}")
+    return runner
 
 if __name__ == '__main__':
-    run()
+    web.run_app(create_web_app(), port=PORT)
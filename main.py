@@ -3,39 +3,71 @@ import os
 import asyncio
 import json
 import random
+import signal
+import secrets
 from collections import deque
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, PollAnswerHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, MessageHandler, PollAnswerHandler, ChatMemberHandler, TypeHandler, filters, ContextTypes
 
 # --- Internal Modules ---
-from keep_alive import keep_alive
+import keep_alive
 from ai.memory_manager import MemoryManager
-from ai.decision_logic import DecisionEngine
 from ai.api_client import APIClient
-from modules.trivia import TriviaManager
+from ai.web_search import WebSearch
+from modules.leaderboard import Leaderboard, GLOBAL_SCOPE
+from modules.question_bank import QuestionBank
 from modules import tools
 from modules import admin
 from modules import media
-from modules.features import FeatureManager
+from modules.personas import Persona, parse_bots
+from modules.render import start_render_pool
+from modules import metrics
+from modules import tracing
+from modules import profiler
+from modules import sharding
+from modules import state
+from modules import triggers
+from modules import tts
+from modules.governor import governor
+from modules.sender import RateLimitedSender, BOT_API_POOL_SIZE, GLOBAL_RATE
 
 # --- Config ---
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
+# Several bots in one process: BOTS="AI618=token1,Sage=token2" (the first is the primary bot)
+BOTS = parse_bots(os.environ.get('BOTS'), BOT_TOKEN)
+
+# Webhook mode: set WEBHOOK_URL to the public base URL (e.g. https://my-bot.onrender.com).
+# Without it the bot falls back to long polling.
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
 
 # --- Initialization ---
 api_client = APIClient()
 memory_manager = MemoryManager(os.environ.get('OPENAI_API_KEY'))
-decision_engine = DecisionEngine(bot_name="AI618")
-trivia_manager = TriviaManager(api_client)
-feature_manager = FeatureManager(api_client)
+# With shard workers, every process adds to the global board, so it is read from SQLite
+leaderboard = Leaderboard(shared_scopes=[GLOBAL_SCOPE] if sharding.SHARD_WORKERS > 1 else [])
+question_bank = QuestionBank()
+# Per-bot persona and state (trivia games and feature toggles included);
+# pools, caches, the memory store, question bank and leaderboard are shared
+personas = [Persona(name, token, api_client, memory_manager, primary=i == 0,
+                    question_bank=question_bank, leaderboard=leaderboard)
+            for i, (name, token) in enumerate(BOTS)]
+primary = personas[0]
+triggers.router.register("mention", ["bot"])
+web_search = WebSearch(api_client, ignore=[persona.name for persona in personas])
+
+# Applications built in this process, one per hosted bot
+applications = []
 
-# Chat History (In-memory for context window)
-chat_histories = {}
+metrics.Gauge("bot_active_chats", "Chats with recent history in memory", ("bot",),
+              fn=lambda: {(persona.name,): len(persona.chat_histories) for persona in personas})
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("I am AI618 (The Chosen One). Ready to serve.")
+    persona = context.bot_data["persona"]
+    await update.message.reply_text(f"I am {persona.name} (The Chosen One). Ready to serve.")
 
 async def master_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text: return
@@ -43,151 +75,180 @@ async def master_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     chat_id = str(update.effective_chat.id)
     user = update.effective_user
     text = update.message.text
-    text_lower = text.lower()
+    # The bot this update arrived for (several can share the process)
+    persona = context.bot_data["persona"]
+    chat_histories = persona.chat_histories
     
-    # 1. Update History
+    # 1. Update History (older messages live on in the rolling summary)
+    line = f"[{user.first_name}]: {text}"
     if chat_id not in chat_histories: chat_histories[chat_id] = deque(maxlen=15)
-    chat_histories[chat_id].append(f"[{user.first_name}]: {text}")
+    chat_histories[chat_id].append(line)
+    persona.memory_context.observe(chat_id, user.id, user.first_name)
+    persona.summaries.observe(chat_id, line)
 
     # 2. Handle Trivia Registration (if active)
-    if await trivia_manager.handle_registration(update, context):
-        return
+    with metrics.stage("trivia_registration"), tracing.span("trivia_registration"):
+        if await persona.trivia.handle_registration(update, context):
+            return
 
-    # 3. Proactive Reactions (The "Vibe" Check)
-    await feature_manager.handle_reaction(update, context)
+    # 3. Proactive Reactions (The "Vibe" Check), scaled back under load
+    with metrics.stage("reaction"), tracing.span("reaction"):
+        if governor.allows("reaction"):
+            await persona.features.handle_reaction(update, context)
 
     # 4. Random Chat Scheduling
     # Every message resets the timer for a potential "random" comment from the bot
     # We use `run_once` to debounce it.
-    if context.job_queue:  # Only if job_queue is available
-        job_name = f"random_chat_{chat_id}"
-        current_jobs = context.job_queue.get_jobs_by_name(job_name)
-        for job in current_jobs: job.schedule_removal() # Cancel previous timer
-        
-        # Schedule new random chat in 10-30 minutes (simulating a lurker)
-        # Only if enabled
-        if feature_manager.random_chat_enabled:
-            context.job_queue.run_once(
-                feature_manager.random_chat_job, 
-                when=random.randint(600, 1800), 
-                data={'chat_id': chat_id, 'history': list(chat_histories[chat_id])},
-                name=job_name
-            )
-
-    # 5. Natural Language Feature Triggers
-    
-    # Image Generation
-    if "generate image" in text_lower or "create image" in text_lower:
-        prompt = text_lower.replace("generate image", "").replace("create image", "").strip()
-        if prompt:
-            status_msg = await update.message.reply_text("🎨 Painting your imagination...")
-            try:
-                image_url = await media.generate_image_url(prompt)
-                if image_url:
-                    await update.message.reply_photo(photo=image_url, caption=f"🎨 {prompt}")
-                    await status_msg.delete()
-                else:
-                    await status_msg.edit_text("❌ Image generation failed.")
-            except Exception as e:
-                logger.error(f"Image generation error: {e}")
-                await status_msg.edit_text(f"❌ Error: {str(e)}")
-            return
+    with metrics.stage("scheduling"), tracing.span("scheduling"):
+        if context.job_queue:  # Only if job_queue is available
+            job_name = f"random_chat_{chat_id}"
+            current_jobs = context.job_queue.get_jobs_by_name(job_name)
+            for job in current_jobs: job.schedule_removal() # Cancel previous timer
+            
+            # Schedule new random chat in 10-30 minutes (simulating a lurker)
+            # Only if enabled
+            if persona.features.random_chat_enabled:
+                context.job_queue.run_once(
+                    persona.features.random_chat_job, 
+                    when=random.randint(600, 1800), 
+                    data={'chat_id': chat_id, 'history': list(chat_histories[chat_id])},
+                    name=job_name
+                )
 
-    # Video Generation
-    if "generate video" in text_lower or "create video" in text_lower:
-        prompt = text_lower.replace("generate video", "").replace("create video", "").strip()
-        if prompt:
-            status_msg = await update.message.reply_text("🎬 Directing scene (this may take a while)...")
-            try:
-                video_url = await media.generate_video_url(prompt)
-                if video_url:
-                    await update.message.reply_video(video=video_url, caption=f"🎬 {prompt}")
-                    await status_msg.delete()
-                else:
-                    await status_msg.edit_text("❌ Video generation failed.")
-            except Exception as e:
-                logger.error(f"Video generation error: {e}")
-                await status_msg.edit_text(f"❌ Error: {str(e)}")
+    # 5. Natural Language Feature Triggers (one pass over the message for every trigger)
+    with metrics.stage("triggers"), tracing.span("triggers"):
+        matches = triggers.router.match(text)
+        if await triggers.router.dispatch(update, context, text, matches):
             return
 
-    # Vision (Explain this)
-    if ("explain this" in text_lower or "what is this" in text_lower) and update.message.reply_to_message and update.message.reply_to_message.photo:
-        status_msg = await update.message.reply_text("👀 Analyzing image...")
-        try:
-            photo = update.message.reply_to_message.photo[-1]
-            file = await context.bot.get_file(photo.file_id)
-            image_url = file.file_path
-            caption = await media.analyze_image_url(image_url)
-            if caption:
-                await update.message.reply_text(f"👀 I see: {caption}")
-                await status_msg.delete()
-            else:
-                 await status_msg.edit_text("❌ Could not analyze image.")
-        except Exception as e:
-            logger.error(f"Vision error: {e}")
-            await status_msg.edit_text(f"❌ Error: {str(e)}")
-        return
-
     # 6. "Should I Speak?" Logic
-    should_reply = False
-    is_mention = f"@{context.bot.username}" in text or (update.message.reply_to_message and update.message.reply_to_message.from_user.id == context.bot.id)
-    
-    # Smart Mention: Check for name or "bot"
-    if "ai618" in text_lower or "bot" in text_lower:
-        is_mention = True
-
-    if is_mention:
-        should_reply = True
-    else:
-        # Ask AI decision engine
-        decision_prompt = decision_engine.get_decision_prompt(text, list(chat_histories[chat_id]))
-        decision_json = await api_client.get_text_response([{"role": "user", "content": decision_prompt}])
-        try:
-            decision = json.loads(decision_json)
-            should_reply = decision.get("should_reply", False)
-        except:
-            should_reply = False 
+    with metrics.stage("decision"), tracing.span("decision"):
+        should_reply = False
+        is_mention = f"@{context.bot.username}" in text or (update.message.reply_to_message and update.message.reply_to_message.from_user.id == context.bot.id)
+        
+        # Smart Mention: this bot's name or the word "bot" (whole words only)
+        if any(match.name in ("mention", persona.mention_trigger) for match in matches):
+            is_mention = True
+
+        if is_mention:
+            should_reply = True
+        elif governor.allows("decision"):
+            # Ask AI decision engine
+            decision_prompt = persona.decision_engine.get_decision_prompt(
+                text, list(chat_histories[chat_id]), summary=persona.summaries.get(chat_id)
+            )
+            decision_json = await api_client.get_text_response([{"role": "user", "content": decision_prompt}])
+            try:
+                decision = json.loads(decision_json)
+                should_reply = decision.get("should_reply", False)
+            except:
+                should_reply = False 
 
     # 7. Generate Response
     if should_reply:
         await context.bot.send_chat_action(chat_id=chat_id, action="typing")
         
-        memories = memory_manager.get_relevant_memories(user.id, text)
-        
-        system_prompt = decision_engine.get_response_prompt(
-            user_name=user.first_name,
-            message=text,
-            memories=memories,
-            history=list(chat_histories[chat_id])
-        )
+        # Memory lookup and web search overlap, so searching adds no serial latency.
+        # Memories of everyone recently talking are fetched together and reused by the chat.
+        with metrics.stage("context"), tracing.span("context"):
+            (memories, others_memories), search_results = await asyncio.gather(
+                asyncio.to_thread(persona.memory_context.get, chat_id, user.id, text),
+                web_search.context_for(text),
+            )
         
-        response = await api_client.get_text_response([{"role": "user", "content": system_prompt}])
-        if response:
-            if feature_manager.is_speak_mode_enabled(user.id):
-                await media.send_audio_response(response, update, context)
-            else:
-                await update.message.reply_text(response)
+        with metrics.stage("response"), tracing.span("response"):
+            system_prompt = persona.decision_engine.get_response_prompt(
+                user_name=user.first_name,
+                message=text,
+                memories=memories,
+                history=list(chat_histories[chat_id]),
+                search_results=search_results,
+                summary=persona.summaries.get(chat_id),
+                others_memories=others_memories
+            )
+            
+            response = await api_client.get_text_response([{"role": "user", "content": system_prompt}])
+            if response:
+                if persona.features.is_speak_mode_enabled(user.id):
+                    await media.send_audio_response(response, update, context)
+                else:
+                    await update.message.reply_text(response)
 
     # 8. Learn Facts
-    if len(text.split()) > 4:
-        fact_prompt = decision_engine.extract_fact_prompt(user.first_name, text)
-        fact = await api_client.get_text_response([{"role": "user", "content": fact_prompt}])
-        if fact and "None" not in fact:
-            memory_manager.add_memory(user.id, user.first_name, fact)
+    if len(text.split()) > 4 and governor.allows("fact_extraction"):
+        with metrics.stage("fact_extraction"), tracing.span("fact_extraction"):
+            fact_prompt = persona.decision_engine.extract_fact_prompt(user.first_name, text)
+            fact = await api_client.get_text_response([{"role": "user", "content": fact_prompt}])
+            if fact and "None" not in fact:
+                persona.memory.add_memory(user.id, user.first_name, fact)
 
 # --- Commands ---
 async def trivia_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await trivia_manager.start_trivia(update, context, "General", 5)
+    await context.bot_data["persona"].trivia.start_trivia(update, context, "General", 5)
 
-def main():
-    if not BOT_TOKEN:
-        print("Error: BOT_TOKEN not found.")
-        return
-    
-    if not os.environ.get('OPENAI_API_KEY'):
-        print("Warning: OPENAI_API_KEY not found. Memory and some features may not work.")
+async def on_startup(app: Application):
+    app.bot_data["loop_monitor"] = asyncio.create_task(metrics.monitor_event_loop())
+    app.bot_data["state_flusher"] = asyncio.create_task(state.run_flusher())
+    app.bot_data["load_governor"] = asyncio.create_task(governor.run())
+    metrics.Gauge("bot_scheduled_jobs", "Jobs waiting in the PTB job queues", fn=lambda: {
+        (): sum(len(a.job_queue.jobs()) for a in applications if a.job_queue)
+    })
+
+async def on_shutdown(app: Application):
+    for name in ("loop_monitor", "state_flusher", "load_governor"):
+        task = app.bot_data.pop(name, None)
+        if task:
+            task.cancel()
+    # Let in-flight summary updates land before the final flush
+    try:
+        await asyncio.wait_for(asyncio.gather(*(persona.summaries.wait() for persona in personas)), 10)
+    except asyncio.TimeoutError:
+        logger.warning("Summary updates still running at shutdown; dropping them")
+    # Persist settings changed since the last write-behind flush
+    await asyncio.to_thread(state.flush)
+    await api_client.aclose()
+    await tts.orchestrator.aclose()
+
+async def start_health_server(app: Application):
+    await on_startup(app)
+    app.bot_data["web_runner"] = await keep_alive.start_server(keep_alive.create_web_app())
+
+async def stop_health_server(app: Application):
+    runner = app.bot_data.pop("web_runner", None)
+    if runner:
+        await runner.cleanup()
+    await on_shutdown(app)
 
-    app = Application.builder().token(BOT_TOKEN).build()
+def _builder(token: str, polling: bool, request=None, rate_limit: bool = True, hooks: bool = True,
+             global_rate: float = GLOBAL_RATE):
+    builder = (
+        Application.builder().token(token)
+        .application_class(tracing.TracedApplication)
+        .request(request or tracing.TracedRequest(connection_pool_size=BOT_API_POOL_SIZE))
+    )
+    if rate_limit:
+        # Every Bot API call goes through a flood-limit aware sender; Telegram's limits
+        # are per bot, so each Application (one per hosted bot) gets its own
+        builder = builder.rate_limiter(RateLimitedSender(global_rate=global_rate))
+    if not polling:
+        builder = builder.updater(None)
+    elif hooks:
+        # Health endpoints share the bot's event loop while polling
+        builder = builder.post_init(start_health_server).post_shutdown(stop_health_server)
+    return builder
+
+def build_application(token: str, polling: bool = True, request=None, background_jobs: bool = True,
+                      rate_limit: bool = True, persona: Persona = None, hooks: bool = True,
+                      global_rate: float = GLOBAL_RATE) -> Application:
+    """
+    The full bot for `persona` (the primary bot by default). `hooks=False`
+    leaves process-wide startup and shutdown to the caller (see run_bots).
+    `global_rate` is this Application's share of the bot's Bot API budget.
+    """
+    persona = persona or primary
+    app = _builder(token, polling, request, rate_limit, hooks, global_rate).build()
+    app.bot_data["persona"] = persona
+    applications.append(app)
 
     # Core
     app.add_handler(CommandHandler("start", start_command))
@@ -203,28 +264,172 @@ def main():
     app.add_handler(CommandHandler("image", media.handle_image))
     app.add_handler(CommandHandler("askit", media.handle_askit))
     app.add_handler(CommandHandler("video", media.handle_video))
+    app.add_handler(CommandHandler("cancel", media.handle_cancel))
     
     # Features & Memory
-    app.add_handler(CommandHandler("forget", lambda u, c: memory_manager.forget_user(u.effective_user.id)))
-    app.add_handler(CommandHandler("random", feature_manager.toggle_random))
-    app.add_handler(CommandHandler("speak", feature_manager.toggle_speak))
+    app.add_handler(CommandHandler("forget", lambda u, c: persona.memory.forget_user(u.effective_user.id)))
+    app.add_handler(CommandHandler("random", persona.features.toggle_random))
+    app.add_handler(CommandHandler("speak", persona.features.toggle_speak))
     app.add_handler(CommandHandler("ai", trivia_command)) # Alias for now
+    app.add_handler(CommandHandler("leaderboard", persona.trivia.show_leaderboard))
+    app.add_handler(CommandHandler(["summary", "summarize"], persona.summaries.handle_summary))
     
     # Admin / Moderation
     app.add_handler(CommandHandler("ban", admin.ban_user))
     app.add_handler(CommandHandler("mute", admin.mute_user))
     app.add_handler(CommandHandler("unmute", admin.unmute_user))
     app.add_handler(CommandHandler("delete", admin.delete_message))
+    app.add_handler(CommandHandler("purge", admin.purge_messages))
+    app.add_handler(CommandHandler("profile", profiler.handle_profile))
+    app.add_handler(CommandHandler("loadstatus", governor.handle_status))
+    app.add_handler(ChatMemberHandler(admin.handle_chat_member, ChatMemberHandler.ANY_CHAT_MEMBER))
 
     # Trivia Poll Handler
-    app.add_handler(PollAnswerHandler(trivia_manager.handle_poll_answer))
+    app.add_handler(PollAnswerHandler(persona.trivia.handle_poll_answer))
+
+    # Keep popular trivia topics stocked in the question bank
+    job_queue = app.job_queue
+    if job_queue and background_jobs:
+        job_queue.run_repeating(persona.trivia.refill_popular_topics, interval=3600, first=300, name="trivia_refill")
     
     # Master Text Handler
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, master_text_handler))
 
-    keep_alive()
+    return app
+
+def build_front_application(token: str, router: sharding.ShardRouter, polling: bool = True) -> Application:
+    """Receives updates (polling or webhook) and only forwards them to shard workers."""
+    app = _builder(token, polling).build()
+    app.add_handler(TypeHandler(Update, router.dispatch))
+    return app
+
+def run_worker(index: int, updates):
+    """Entry point of shard worker `index`: a full bot fed by the front process."""
+    start_render_pool()
+    # Flood and media limits hold for the bot as a whole, so each worker only gets its share
+    workers = sharding.SHARD_WORKERS
+    media.media_jobs.max_global = sharding.worker_share(media.media_jobs.max_global, workers)
+    media.media_jobs.max_per_user = sharding.worker_share(media.media_jobs.max_per_user, workers)
+    # Only one worker runs bot-wide jobs such as the trivia refill
+    app = build_application(primary.token, polling=False, background_jobs=index == 0,
+                            global_rate=GLOBAL_RATE / workers)
+    logger.info(f"Shard worker {index} ready")
+    asyncio.run(sharding.serve_shard(app, updates, on_startup, on_shutdown))
+
+def run_sharded():
+    services = sharding.prepare_shared_services()
+    router = sharding.ShardRouter(sharding.SHARD_WORKERS, run_worker)
+    router.start()
+    try:
+        if WEBHOOK_URL:
+            asyncio.run(run_webhook(build_front_application(primary.token, router, polling=False)))
+        else:
+            print(f"Bot is running with {sharding.SHARD_WORKERS} shard workers...")
+            build_front_application(primary.token, router).run_polling(allowed_updates=Update.ALL_TYPES)
+    finally:
+        router.stop()
+        sharding.stop_shared_services(services)
+        # Workers may have written settings after the front app shut down
+        state.flush()
+
+async def run_webhook(app: Application):
+    """Serves webhook updates and health checks from one aiohttp server on PORT."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with app:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + keep_alive.WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await app.start()
+        await on_startup(app)
+        runner = await keep_alive.start_server(keep_alive.create_web_app(app, WEBHOOK_SECRET))
+        print("Bot is running (webhook)...")
+        try:
+            await stop.wait()
+        finally:
+            await runner.cleanup()
+            await on_shutdown(app)
+            await app.stop()
+
+async def run_bots(bots: list[Persona]):
+    """
+    Hosts several bots on one event loop. They share the API client pools,
+    caches and memory store, plus one aiohttp server for health checks and
+    every bot's webhook (the primary on WEBHOOK_PATH, others below it).
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    apps = [build_application(bot.token, polling=not WEBHOOK_URL, persona=bot, background_jobs=bot.primary, hooks=False)
+            for bot in bots]
+    webhooks = {}
+    for bot, app in zip(bots, apps):
+        await app.initialize()
+        if WEBHOOK_URL:
+            path = keep_alive.WEBHOOK_PATH if bot.primary else f"{keep_alive.WEBHOOK_PATH}/{bot.key}"
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + path,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+            webhooks[path] = app
+        else:
+            # chat_member updates are opt-in; the admin roster cache depends on them
+            await app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        await app.start()
+    await on_startup(apps[0])
+    runner = await keep_alive.start_server(keep_alive.create_web_app(webhooks=webhooks, secret_token=WEBHOOK_SECRET))
+    print(f"Running {len(apps)} bots ({', '.join(bot.name for bot in bots)})...")
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        for app in apps:
+            if app.updater and app.updater.running:
+                await app.updater.stop()
+            await app.stop()
+        await on_shutdown(apps[0])
+        for app in apps:
+            await app.shutdown()
+
+def main():
+    if not all(persona.token for persona in personas):
+        print("Error: BOT_TOKEN not found.")
+        return
+    
+    if not os.environ.get('OPENAI_API_KEY'):
+        print("Warning: OPENAI_API_KEY not found. Memory and some features may not work.")
+
+    if len(personas) > 1:
+        if sharding.SHARD_WORKERS > 1:
+            print("Error: BOTS and SHARD_WORKERS > 1 can't be combined; run one sharded process per bot.")
+            return
+        start_render_pool()
+        asyncio.run(run_bots(personas))
+        return
+
+    if sharding.SHARD_WORKERS > 1:
+        run_sharded()
+        return
+
+    # Fork the /chem render workers before any server threads exist
+    start_render_pool()
+
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(build_application(primary.token, polling=False)))
+        return
+
+    app = build_application(primary.token)
     print("Bot is running...")
-    app.run_polling()
+    # chat_member updates are opt-in; the admin roster cache depends on them
+    app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
@@ -1,53 +1,176 @@
+import os
+import time
+import asyncio
 import logging
-from telegram import Update, ChatPermissions
+from telegram import Update, ChatPermissions, ChatMember, MessageEntity
 from telegram.ext import ContextTypes
-from telegram.error import BadRequest
+from telegram.error import BadRequest, TelegramError
+from modules.cache import SingleFlight
+from modules import metrics
 
 logger = logging.getLogger(__name__)
 
+ADMIN_CACHE_TTL = int(os.environ.get("ADMIN_CACHE_TTL", 600))
+ADMIN_STATUSES = (ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+# Telegram user ids of the people running this deployment; only they may use process-wide tools like /profile
+BOT_OWNER_IDS = {int(user_id) for user_id in os.environ.get("BOT_OWNER_IDS", "").replace(",", " ").split()}
+
+PURGE_MAX = 1000
+DELETE_CHUNK = 100
+
+class AdminRoster:
+    """
+    Per-chat cache of admin user ids.
+
+    Filled from get_chat_administrators and kept current by chat member
+    updates, so role checks are local lookups. Entries still expire after
+    `ttl` seconds in case an update was missed.
+    """
+
+    def __init__(self, ttl=ADMIN_CACHE_TTL):
+        self.ttl = ttl
+        self._rosters = {}  # chat_id -> (admin_ids, fetched_at)
+        self._flights = SingleFlight()
+
+    async def get_admins(self, bot, chat_id: int) -> set[int]:
+        entry = self._rosters.get(chat_id)
+        if entry and time.time() - entry[1] < self.ttl:
+            metrics.CACHE_REQUESTS.inc(1, ("admin_roster", "hit"))
+            return entry[0]
+        metrics.CACHE_REQUESTS.inc(1, ("admin_roster", "miss"))
+
+        async def fetch():
+            members = await bot.get_chat_administrators(chat_id)
+            admin_ids = {member.user.id for member in members}
+            self._rosters[chat_id] = (admin_ids, time.time())
+            return admin_ids
+
+        return await self._flights.do(chat_id, fetch)
+
+    async def is_admin(self, bot, chat_id: int, user_id: int) -> bool:
+        return user_id in await self.get_admins(bot, chat_id)
+
+    def invalidate(self, chat_id: int):
+        self._rosters.pop(chat_id, None)
+
+    def apply_member_update(self, change):
+        """Patches a cached roster from a ChatMemberUpdated instead of refetching it."""
+        entry = self._rosters.get(change.chat.id)
+        if not entry:
+            return
+        user_id = change.new_chat_member.user.id
+        if change.new_chat_member.status in ADMIN_STATUSES:
+            entry[0].add(user_id)
+        else:
+            entry[0].discard(user_id)
+
+# Shared by every feature that needs role checks
+admin_roster = AdminRoster()
+
 async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if the user is an admin."""
     if update.effective_chat.type == "private":
         return False
     try:
-        member = await context.bot.get_chat_member(update.effective_chat.id, update.effective_user.id)
-        return member.status in ["administrator", "creator"]
+        return await admin_roster.is_admin(context.bot, update.effective_chat.id, update.effective_user.id)
     except Exception as e:
         logger.error(f"Admin check error: {e}")
         return False
 
+def is_owner(update: Update) -> bool:
+    """Check if the user operates the bot (BOT_OWNER_IDS), whatever chat they are in."""
+    return update.effective_user is not None and update.effective_user.id in BOT_OWNER_IDS
+
+async def handle_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Keeps the admin roster in sync with promotions, demotions and departures."""
+    change = update.chat_member or update.my_chat_member
+    if change:
+        admin_roster.apply_member_update(change)
+
+def collect_targets(update: Update, context: ContextTypes.DEFAULT_TYPE) -> tuple[dict[int, str], list[str]]:
+    """
+    Gathers every user a moderation command points at: the replied-to user,
+    users picked with text mentions, and numeric user ids in the arguments.
+    Also returns the plain @username arguments, which the Bot API can't
+    resolve to user ids.
+    """
+    targets = {}
+    usernames = []
+    reply = update.message.reply_to_message
+    if reply and reply.from_user:
+        targets[reply.from_user.id] = reply.from_user.first_name
+    for entity, _ in update.message.parse_entities([MessageEntity.TEXT_MENTION]).items():
+        targets[entity.user.id] = entity.user.first_name
+    for arg in context.args or []:
+        if arg.lstrip("-").isdigit():
+            targets.setdefault(int(arg), arg)
+        elif arg.startswith("@"):
+            usernames.append(arg)
+    return targets, usernames
+
+def _skipped_usernames(usernames: list[str]) -> str:
+    if not usernames:
+        return ""
+    return (f"\nSkipped {', '.join(usernames)}: bots can't look users up by @username. "
+            "Reply to them, pick them with a text mention, or pass their user id.")
+
+async def _moderate_many(targets: dict[int, str], action) -> tuple[list[str], list[str]]:
+    """Applies `action(user_id)` to every target; the bot's rate limiter paces the calls."""
+    async def run(user_id, name):
+        try:
+            await action(user_id)
+            return name, None
+        except TelegramError as e:
+            # Forbidden, BadRequest, ...: report it and carry on with the other targets
+            return name, e.message
+
+    results = await asyncio.gather(*[run(user_id, name) for user_id, name in targets.items()])
+    done = [name for name, error in results if not error]
+    failed = [f"{name} ({error})" for name, error in results if error]
+    return done, failed
+
 async def ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await is_admin(update, context):
         await update.message.reply_text("🚫 Admins only.")
         return
     
-    if not update.message.reply_to_message:
-        await update.message.reply_text("Reply to a user to ban them.")
+    targets, usernames = collect_targets(update, context)
+    if not targets:
+        await update.message.reply_text(
+            f"Reply to a user, mention users, or pass user ids to ban them.{_skipped_usernames(usernames)}"
+        )
         return
 
-    user_to_ban = update.message.reply_to_message.from_user
-    try:
-        await context.bot.ban_chat_member(update.effective_chat.id, user_to_ban.id)
-        await update.message.reply_text(f"🔨 Banned {user_to_ban.first_name}.")
-    except BadRequest as e:
-        await update.message.reply_text(f"Failed to ban: {e.message}")
+    chat_id = update.effective_chat.id
+    banned, failed = await _moderate_many(targets, lambda user_id: context.bot.ban_chat_member(chat_id, user_id))
+    text = f"🔨 Banned {', '.join(banned)}." if banned else ""
+    if failed:
+        text += f"\nFailed to ban: {', '.join(failed)}"
+    text += _skipped_usernames(usernames)
+    await update.message.reply_text(text.strip())
 
 async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await is_admin(update, context):
         await update.message.reply_text("🚫 Admins only.")
         return
     
-    if not update.message.reply_to_message:
-        await update.message.reply_text("Reply to a user to mute them.")
+    targets, usernames = collect_targets(update, context)
+    if not targets:
+        await update.message.reply_text(
+            f"Reply to a user, mention users, or pass user ids to mute them.{_skipped_usernames(usernames)}"
+        )
         return
 
-    user_to_mute = update.message.reply_to_message.from_user
-    try:
-        permissions = ChatPermissions(can_send_messages=False)
-        await context.bot.restrict_chat_member(update.effective_chat.id, user_to_mute.id, permissions)
-        await update.message.reply_text(f"😶 Muted {user_to_mute.first_name}.")
-    except BadRequest as e:
-        await update.message.reply_text(f"Failed to mute: {e.message}")
+    chat_id = update.effective_chat.id
+    permissions = ChatPermissions(can_send_messages=False)
+    muted, failed = await _moderate_many(
+        targets, lambda user_id: context.bot.restrict_chat_member(chat_id, user_id, permissions)
+    )
+    text = f"😶 Muted {', '.join(muted)}." if muted else ""
+    if failed:
+        text += f"\nFailed to mute: {', '.join(failed)}"
+    text += _skipped_usernames(usernames)
+    await update.message.reply_text(text.strip())
 
 async def unmute_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await is_admin(update, context):
@@ -85,3 +208,33 @@ async def delete_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.delete() # Delete command too
     except BadRequest:
         await update.message.reply_text("I can't delete that.")
+
+async def purge_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Deletes the last N messages, or everything from the replied-to message onwards."""
+    if not await is_admin(update, context):
+        return
+
+    end_id = update.message.message_id
+    reply = update.message.reply_to_message
+    if reply:
+        start_id = reply.message_id
+    elif context.args and context.args[0].isdigit():
+        start_id = end_id - int(context.args[0])
+    else:
+        await update.message.reply_text(f"Usage: /purge N (max {PURGE_MAX}), or reply to the first message to remove.")
+        return
+
+    start_id = max(start_id, end_id - PURGE_MAX, 1)
+    message_ids = list(range(start_id, end_id + 1))
+    chat_id = update.effective_chat.id
+
+    # Telegram deletes up to 100 ids per call and silently skips ones it can't find
+    chunks = [message_ids[i:i + DELETE_CHUNK] for i in range(0, len(message_ids), DELETE_CHUNK)]
+    results = await asyncio.gather(
+        *[context.bot.delete_messages(chat_id, chunk) for chunk in chunks],
+        return_exceptions=True
+    )
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        logger.warning(f"Purge in {chat_id}: {len(failures)}/{len(chunks)} batches failed: {failures[0]}")
+        await context.bot.send_message(chat_id, "🧹 Purge finished, but some messages could not be deleted.")
@@ -0,0 +1,125 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", "data/cache.sqlite3")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+
+    The first caller starts the work; everyone arriving while it runs awaits
+    the same result instead of repeating it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._calls.pop(key, None) if self._calls.get(key) is f else None)
+        # Shield so one impatient caller cannot cancel the work for the others
+        return await asyncio.shield(future)
+
+    def __contains__(self, key):
+        return key in self._calls
+
+
+class PersistentCache:
+    """
+    SQLite-backed key/value cache with an optional TTL.
+
+    Values are `str` or `bytes`. Recent entries are also kept in a small
+    in-memory LRU so hot keys never touch the disk. Several caches can share one
+    database file; each gets its own namespace.
+    """
+
+    _connections = {}
+    _connections_lock = threading.Lock()
+
+    def __init__(self, namespace: str, ttl: float | None = None, path: str = CACHE_DB_PATH, memory_items: int = 512):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._db = self._connect(path)
+
+    @classmethod
+    def _connect(cls, path):
+        with cls._connections_lock:
+            db = cls._connections.get(path)
+            if db is None:
+                if path != ":memory:":
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB, created_at REAL NOT NULL, "
+                    "PRIMARY KEY (namespace, key))"
+                )
+                cls._connections[path] = db
+            return db
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key: str):
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self._db.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row:
+                entry = (row[0], row[1])
+                self._remember(key, entry)
+        if entry is None:
+            metrics.CACHE_REQUESTS.inc(1, (self.namespace, "miss"))
+            return None
+        if self._expired(entry[1]):
+            self.delete(key)
+            metrics.CACHE_REQUESTS.inc(1, (self.namespace, "miss"))
+            return None
+        self._memory.move_to_end(key)
+        metrics.CACHE_REQUESTS.inc(1, (self.namespace, "hit"))
+        return entry[0]
+
+    def set(self, key: str, value):
+        entry = (value, time.time())
+        self._remember(key, entry)
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, value, entry[1])
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed ({self.namespace}): {e}")
+
+    def delete(self, key: str):
+        self._memory.pop(key, None)
+        self._db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def purge_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        self._memory = OrderedDict((k, v) for k, v in self._memory.items() if v[1] >= cutoff)
+        cursor = self._db.execute("DELETE FROM cache WHERE namespace = ? AND created_at < ?", (self.namespace, cutoff))
+        return cursor.rowcount
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
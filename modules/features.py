@@ -3,21 +3,32 @@ import logging
 import asyncio
 from telegram import Update, ReactionTypeEmoji
 from telegram.ext import ContextTypes
+from modules.state import StateMap
+from modules.governor import governor
 
 logger = logging.getLogger(__name__)
 
 class FeatureManager:
-    def __init__(self, api_client):
+    def __init__(self, api_client, namespace_suffix: str = ""):
         self.api_client = api_client
-        self.random_chat_enabled = True
-        self.speak_mode_enabled = {}  # Per-user/chat speak mode state
+        # Each hosted bot has its own toggles (see Persona); the primary bot's are unsuffixed
+        self.settings = StateMap(f"settings{namespace_suffix}")
+        self.speak_mode_enabled = StateMap(f"speak_mode{namespace_suffix}")  # Per-user speak mode state
+
+    @property
+    def random_chat_enabled(self) -> bool:
+        return self.settings.get("random_chat", True)
+
+    @random_chat_enabled.setter
+    def random_chat_enabled(self, enabled: bool):
+        self.settings["random_chat"] = enabled
 
     async def random_chat_job(self, context: ContextTypes.DEFAULT_TYPE):
         """Background job to send a random message."""
         chat_id = context.job.data['chat_id']
         history = context.job.data.get('history', [])
         
-        if not history or not self.random_chat_enabled:
+        if not history or not self.random_chat_enabled or not governor.allows("random_chat"):
             return
 
         # Construct a "lurker" prompt
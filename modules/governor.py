@@ -0,0 +1,143 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from telegram import Update
+from telegram.ext import ContextTypes
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("normal", "reduced", "essential")
+NORMAL, REDUCED, ESSENTIAL = range(len(LEVELS))
+
+# Share of each proactive feature's work kept at each level; mentions and commands are never shed
+SHARES = {
+    "reaction": (1.0, 0.25, 0.0),
+    "random_chat": (1.0, 0.0, 0.0),
+    "fact_extraction": (1.0, 0.5, 0.0),
+    "decision": (1.0, 1.0, 0.0),  # deciding whether to join in on messages that don't mention the bot
+}
+
+# Signal values that raise the level to REDUCED and ESSENTIAL
+LOAD_LAG = (float(os.environ.get("LOAD_LAG_REDUCED", 0.1)), float(os.environ.get("LOAD_LAG_ESSENTIAL", 0.5)))
+LOAD_LLM_IN_FLIGHT = (int(os.environ.get("LOAD_LLM_REDUCED", 8)), int(os.environ.get("LOAD_LLM_ESSENTIAL", 16)))
+LOAD_ERROR_RATE = (0.3, 0.6)
+# Stepping down a level needs every signal below EXIT_RATIO of its threshold for LOAD_COOLDOWN seconds
+EXIT_RATIO = 0.5
+LOAD_COOLDOWN = float(os.environ.get("LOAD_COOLDOWN", 30))
+ERROR_WINDOW = 30  # seconds of LLM outcomes behind the error rate
+MIN_CALLS = 5  # fewer calls than this in the window say nothing about provider health
+
+LOAD_LEVEL = metrics.Gauge("load_shedding_level", "Load governor level (0 normal, 1 reduced, 2 essential)")
+LOAD_SHED = metrics.Counter("load_shed_total", "Proactive work skipped by the load governor", ("feature",))
+
+
+class LoadGovernor:
+    """
+    Scales back proactive features (reactions, lurker comments, fact
+    extraction, join-in decisions) when the bot is overloaded, so mentions and
+    commands keep their latency. Event loop lag, in-flight LLM calls and the
+    provider error rate each map to a level; the highest wins at once. Levels
+    come back down one step at a time, and only after a calm cooldown, so
+    the bot doesn't flap between tiers.
+    """
+
+    def __init__(self, cooldown: float = LOAD_COOLDOWN):
+        self.cooldown = cooldown
+        self.level = NORMAL
+        self.signals = {"lag": 0.0, "llm_in_flight": 0, "error_rate": 0.0}
+        self._calm_since = None
+        self._outcomes = deque(maxlen=ERROR_WINDOW)  # (ok, error) LLM calls per tick
+        self._last_counts = (0, 0)
+        LOAD_LEVEL.set(self.level)
+
+    @staticmethod
+    def _level_for(lag: float, in_flight: int, error_rate: float, ratio: float = 1.0) -> int:
+        level = NORMAL
+        for value, thresholds in ((lag, LOAD_LAG), (in_flight, LOAD_LLM_IN_FLIGHT), (error_rate, LOAD_ERROR_RATE)):
+            for tier, threshold in enumerate(thresholds, start=REDUCED):
+                if value >= threshold * ratio:
+                    level = max(level, tier)
+        return level
+
+    def update(self, lag: float, in_flight: int, error_rate: float, now: float = None) -> int:
+        """Feeds one reading of the signals and returns the (possibly new) level."""
+        now = time.monotonic() if now is None else now
+        self.signals = {"lag": lag, "llm_in_flight": in_flight, "error_rate": error_rate}
+        entered = self._level_for(lag, in_flight, error_rate)
+        if entered > self.level:
+            self._set(entered)
+            self._calm_since = None
+        elif self._level_for(lag, in_flight, error_rate, EXIT_RATIO) < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self._set(self.level - 1)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _set(self, level: int):
+        logger.warning(f"Load governor: {LEVELS[self.level]} -> {LEVELS[level]} ({self.signals})")
+        self.level = level
+        LOAD_LEVEL.set(level)
+
+    def allows(self, feature: str) -> bool:
+        """Whether to run one piece of proactive work now; counts it as shed otherwise."""
+        share = SHARES[feature][self.level]
+        if share >= 1.0 or (share > 0.0 and random.random() < share):
+            return True
+        LOAD_SHED.inc(1, (feature,))
+        return False
+
+    def _error_rate(self) -> float:
+        ok = error = 0
+        for (provider, outcome), count in metrics.LLM_REQUESTS.values.items():
+            if outcome == "ok":
+                ok += count
+            else:
+                error += count
+        last_ok, last_error = self._last_counts
+        self._last_counts = (ok, error)
+        self._outcomes.append((ok - last_ok, error - last_error))
+        calls = sum(ok + error for ok, error in self._outcomes)
+        return sum(error for _, error in self._outcomes) / calls if calls >= MIN_CALLS else 0.0
+
+    def sample(self) -> int:
+        """Reads the signals from the shared metrics and updates the level."""
+        return self.update(
+            metrics.EVENT_LOOP_LAG_LAST.values.get((), 0.0),
+            metrics.LLM_IN_FLIGHT.values.get((), 0),
+            self._error_rate(),
+        )
+
+    async def run(self, interval: float = 1.0):
+        """Samples once per `interval` seconds; runs until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self.sample()
+
+    async def handle_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/loadstatus: the current degradation level and what drives it."""
+        signals = self.signals
+        paused = [feature for feature, shares in SHARES.items() if shares[self.level] == 0.0]
+        scaled = [feature for feature, shares in SHARES.items() if 0.0 < shares[self.level] < 1.0]
+        lines = [
+            f"⚙️ Load level: {LEVELS[self.level]}",
+            f"Event loop lag: {signals['lag'] * 1000:.0f} ms",
+            f"LLM calls in flight: {signals['llm_in_flight']}",
+            f"LLM error rate: {signals['error_rate']:.0%}",
+        ]
+        if paused:
+            lines.append(f"Paused: {', '.join(paused)}")
+        if scaled:
+            lines.append(f"Scaled back: {', '.join(scaled)}")
+        await update.message.reply_text("\n".join(lines))
+
+
+# Shared by master_text_handler and the proactive jobs
+governor = LoadGovernor()
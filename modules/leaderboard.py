@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import logging
+import threading
+
+from modules.question_bank import TRIVIA_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "global"
+
+
+class Leaderboard:
+    """
+    Persistent trivia scores with incrementally maintained top-k lists.
+
+    Totals live in SQLite; each scope (a chat id, or "global") keeps its top
+    `k` entries in memory, updated on every point awarded, so reading a
+    leaderboard never scans or sorts the whole table.
+
+    Scopes in `shared_scopes` are also written by other processes (shard
+    workers), so they skip the in-memory list and read the rank index instead.
+    """
+
+    def __init__(self, path=TRIVIA_DB_PATH, k=10, shared_scopes=()):
+        self.k = k
+        self.shared_scopes = set(shared_scopes)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "scope TEXT NOT NULL, user_id INTEGER NOT NULL, name TEXT NOT NULL, score INTEGER NOT NULL, "
+            "PRIMARY KEY (scope, user_id))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_scores_rank ON scores (scope, score DESC)")
+        self._top = {}  # scope -> [(score, user_id, name)] sorted best first
+        self._lock = threading.Lock()
+
+    def _query_top(self, scope):
+        rows = self.db.execute(
+            "SELECT score, user_id, name FROM scores WHERE scope = ? ORDER BY score DESC LIMIT ?", (scope, self.k)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def _load(self, scope):
+        top = self._top.get(scope)
+        if top is None:
+            top = self._top[scope] = self._query_top(scope)
+        return top
+
+    def add_points(self, scope: str, user_id: int, name: str, points: int = 1) -> int:
+        """Adds points to a user's total in a scope and returns the new total."""
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO scores (scope, user_id, name, score) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (scope, user_id) DO UPDATE SET score = score + excluded.score, name = excluded.name",
+                (scope, user_id, name, points)
+            )
+            total = self.db.execute(
+                "SELECT score FROM scores WHERE scope = ? AND user_id = ?", (scope, user_id)
+            ).fetchone()[0]
+
+            if scope in self.shared_scopes:
+                return total
+
+            top = self._load(scope)
+            top[:] = [entry for entry in top if entry[1] != user_id]
+            if len(top) < self.k or total > top[-1][0]:
+                top.append((total, user_id, name))
+                top.sort(key=lambda entry: entry[0], reverse=True)
+                del top[self.k:]
+            return total
+
+    def top(self, scope: str, limit: int | None = None) -> list[tuple[int, int, str]]:
+        """Returns [(score, user_id, name)] for the best players in a scope."""
+        with self._lock:
+            if scope in self.shared_scopes:
+                return self._query_top(scope)[:limit or self.k]
+            return list(self._load(scope)[:limit or self.k])
@@ -3,16 +3,23 @@ import logging
 import edge_tts
 import asyncio
 import tempfile
-import httpx
-from telegram import Update
+from telegram import Update, InputMediaPhoto
+from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 from bytez import Bytez
+from modules.media_jobs import MediaJobQueue, MediaJobCancelled
+from modules.cache import PersistentCache, SingleFlight
+from modules import metrics
+from modules.state import StateMap
+from modules import triggers
+from modules.sender import JobStatus
+from modules import tts
 
 logger = logging.getLogger(__name__)
 
 # --- Audio Configuration ---
-# Simple in-memory storage for user voice preferences
-user_voices = {}
+# User voice preferences (shared between shard workers, see modules/state.py)
+user_voices = StateMap("user_voices")
 
 AVAILABLE_VOICES = {
     "guy": "en-US-GuyNeural",
@@ -22,20 +29,33 @@ AVAILABLE_VOICES = {
     "sonia": "en-GB-SoniaNeural"
 }
 
-# TTS API Configuration
-TTS_API_URL = os.environ.get("TTS_API_URL")
-TTS_API_KEY = os.environ.get("TTS_API_KEY")
-
 TTS_VOICES = ["alloy", "ash", "ballad", "coral", "echo", "fable", "onyx", "nova", "sage", "shimmer", "verse"]
-user_tts_voices = {}  # Store TTS voice preference per user
+user_tts_voices = StateMap("user_tts_voices")  # Store TTS voice preference per user
 
 # --- Bytez Configuration ---
+IMAGE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
+VIDEO_MODEL = "ali-vilab/text-to-video-ms-1.7b"
+VISION_MODEL = "Salesforce/blip-image-captioning-base"
+
 def get_bytez_client():
     key = os.environ.get("BYTEZ_KEY")
     if not key:
         return None
     return Bytez(key)
 
+# One queue (and one set of cached model handles) for all Bytez work
+media_jobs = MediaJobQueue(get_bytez_client)
+metrics.Gauge("media_jobs", "Bytez media jobs by state", ("state",),
+              fn=lambda: {(state,): count for state, count in media_jobs.stats().items()})
+
+MAX_IMAGES_PER_REQUEST = int(os.environ.get("MAX_IMAGES_PER_REQUEST", 4))
+
+# Captions keyed by Telegram's file_unique_id, which is stable across forwards and chats
+CAPTION_CACHE_TTL = int(os.environ.get("CAPTION_CACHE_TTL", 30 * 24 * 3600))
+caption_cache = PersistentCache("captions", ttl=CAPTION_CACHE_TTL)
+# Shares get_file lookups only; each caller waits on the vision job itself (see describe_photo)
+file_flights = SingleFlight()
+
 # --- Core Logic Functions ---
 
 async def generate_audio_file(text: str, voice: str) -> str:
@@ -57,91 +77,40 @@ async def generate_audio_file(text: str, voice: str) -> str:
         logger.error(f"Audio generation error: {e}")
         raise e
 
-async def generate_tts_api_audio(text: str, voice: str = "ash", emotion: str = "energetic") -> bytes | None:
-    """Generates audio using the TTS API and returns the audio bytes."""
-    if not TTS_API_URL or not TTS_API_KEY:
-        logger.warning("TTS_API_URL or TTS_API_KEY not configured")
-        return None
-    
-    try:
-        headers = {
-            "Authorization": f"Bearer {TTS_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "tts-1",
-            "input": text,
-            "voice": voice,
-            "prompt": f"{emotion}, expressive, warm",
-            "voice_metadata": {
-                "emotion": emotion,
-                "intensity": 5,
-                "pacing": "normal",
-                "vocal_traits": "expressive, warm"
-            }
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(TTS_API_URL, json=payload, headers=headers, timeout=60)
-            
-            if response.status_code == 200:
-                return response.content
-            else:
-                logger.warning(f"TTS API error: {response.status_code} - {response.text}")
-                return None
-    except Exception as e:
-        logger.error(f"TTS API generation error: {e}")
-        return None
-
-async def generate_image_url(prompt: str) -> str | None:
-    """Generates an image and returns the URL."""
-    client = get_bytez_client()
-    if not client:
-        raise ValueError("BYTEZ_KEY not found.")
-
-    def run_model():
-        model = client.model("stabilityai/stable-diffusion-xl-base-1.0")
-        return model.run(prompt)
-
-    result = await asyncio.to_thread(run_model)
+async def _run_media_job(kind: str, model_id: str, payload, user_id=None, on_position=None, dedupe_key=None):
+    """Runs a Bytez model through the shared media job queue."""
+    result = await media_jobs.submit(user_id, kind, model_id, payload, on_position=on_position, dedupe_key=dedupe_key)
     if result.output:
         return result.output
-    
-    if hasattr(result, 'error'):
+    if getattr(result, 'error', None):
         raise Exception(result.error)
     return None
 
-async def generate_video_url(prompt: str) -> str | None:
-    """Generates a video and returns the URL."""
-    client = get_bytez_client()
-    if not client:
-        raise ValueError("BYTEZ_KEY not found.")
-
-    def run_model():
-        # Using the model from the original snippet
-        model = client.model("ali-vilab/text-to-video-ms-1.7b") 
-        return model.run(prompt)
+async def generate_image_url(prompt: str, user_id=None, on_position=None, variant: int = 0) -> str | None:
+    """Generates an image and returns the URL. Distinct variants of one prompt are never deduplicated."""
+    dedupe_key = f"{prompt}#{variant}" if variant else None
+    return await _run_media_job("image", IMAGE_MODEL, prompt, user_id, on_position, dedupe_key)
 
-    result = await asyncio.to_thread(run_model)
-    if result.output:
-        return result.output
-    return None
+async def generate_video_url(prompt: str, user_id=None, on_position=None) -> str | None:
+    """Generates a video and returns the URL."""
+    return await _run_media_job("video", VIDEO_MODEL, prompt, user_id, on_position)
 
-async def analyze_image_url(image_url: str) -> str | None:
+async def analyze_image_url(image_url: str, user_id=None, on_position=None, dedupe_key=None) -> str | None:
     """Analyzes an image URL and returns the caption."""
-    client = get_bytez_client()
-    if not client:
-        raise ValueError("BYTEZ_KEY not found.")
-
-    def run_model():
-        model = client.model("Salesforce/blip-image-captioning-base")
-        return model.run({"url": image_url})
-
-    result = await asyncio.to_thread(run_model)
-    if result.output:
-        return result.output
-    return None
+    return await _run_media_job("vision", VISION_MODEL, {"url": image_url}, user_id, on_position, dedupe_key)
+
+def queue_status_updater(status_msg, working_text: str):
+    """
+    Builds an on_position callback that keeps a status message in sync with
+    the queue. For jobs long enough that a visible message beats a chat
+    action (video); shorter ones use JobStatus.
+    """
+    async def on_position(position: int):
+        if position > 0:
+            await status_msg.edit_text(f"⏳ Queued (#{position})... send /cancel to give up.")
+        else:
+            await status_msg.edit_text(working_text)
+    return on_position
 
 
 # --- Handlers ---
@@ -171,46 +140,181 @@ async def handle_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     voice = user_voices.get(user_id, "en-US-GuyNeural") # Default voice
 
-    status_msg = await update.message.reply_text("🎙️ Generating audio...")
-    
     output_file = None
-    try:
-        output_file = await generate_audio_file(text, voice)
-        await update.message.reply_audio(audio=open(output_file, 'rb'), title="AI Audio", caption=f"Voice: {voice}")
-    except Exception as e:
-        logger.error(f"Audio handler error: {e}")
-        await status_msg.edit_text("❌ Failed to generate audio.")
-    finally:
-        if output_file and os.path.exists(output_file):
+    async with JobStatus(update, ChatAction.RECORD_VOICE, "🎙️ Generating audio...") as status:
+        try:
+            output_file = await generate_audio_file(text, voice)
+            with open(output_file, 'rb') as audio:
+                await update.message.reply_audio(audio=audio, title="AI Audio", caption=f"Voice: {voice}")
+        except Exception as e:
+            logger.error(f"Audio handler error: {e}")
+            await status.fail("❌ Failed to generate audio.")
+        finally:
+            if output_file and os.path.exists(output_file):
+                try:
+                    os.remove(output_file)
+                except Exception as e:
+                    logger.warning(f"Failed to remove temp file {output_file}: {e}")
+
+def parse_image_count(words: list[str]) -> tuple[int, str]:
+    """Splits an optional `-n N` flag off a prompt, e.g. ['-n', '4', 'a', 'cat'] -> (4, 'a cat')."""
+    count = 1
+    if len(words) >= 2 and words[0] == "-n" and words[1].isdigit():
+        count = max(1, min(int(words[1]), MAX_IMAGES_PER_REQUEST))
+        words = words[2:]
+    return count, " ".join(words).strip()
+
+async def reply_with_image(update: Update, prompt: str, count: int = 1):
+    """Generates one or more images for a prompt and replies with them."""
+    if count > 1:
+        await reply_with_images(update, prompt, count)
+        return
+
+    async with JobStatus(update, ChatAction.UPLOAD_PHOTO, "🎨 Painting your imagination...") as status:
+        try:
+            image_url = await generate_image_url(prompt, update.effective_user.id, status.on_position)
+            if image_url:
+                await update.message.reply_photo(photo=image_url, caption=f"🎨 {prompt}")
+                await status.done()
+            else:
+                await status.fail("❌ Image generation failed.")
+        except MediaJobCancelled:
+            await status.fail("🛑 Image request cancelled.")
+        except Exception as e:
+            logger.error(f"Image generation error: {e}")
+            await status.fail(f"❌ Error: {str(e)}")
+
+async def reply_with_images(update: Update, prompt: str, count: int):
+    """Fans a prompt out to `count` concurrent image jobs and replies with one media group."""
+    user_id = update.effective_user.id
+    async with JobStatus(update, ChatAction.UPLOAD_PHOTO, f"🎨 Painting {count} takes on your imagination...") as status:
+        # Only the first job reports its queue position, so edits don't fight each other
+        jobs = [
+            generate_image_url(prompt, user_id, status.on_position if variant == 0 else None, variant=variant)
+            for variant in range(count)
+        ]
+        image_urls = []
+        cancelled = False
+        for finished in asyncio.as_completed(jobs):
             try:
-                os.remove(output_file)
+                image_url = await finished
+            except MediaJobCancelled:
+                cancelled = True
+                continue
             except Exception as e:
-                logger.warning(f"Failed to remove temp file {output_file}: {e}")
-        
+                logger.error(f"Image generation error: {e}")
+                continue
+            if image_url:
+                image_urls.append(image_url)
+                # Progress only goes into a status message that already exists
+                if status.message is not None:
+                    try:
+                        await status.message.edit_text(f"🎨 {len(image_urls)}/{count} ready...")
+                    except Exception as e:
+                        logger.warning(f"Status update failed: {e}")
+
+        if not image_urls:
+            await status.fail("🛑 Image request cancelled." if cancelled else "❌ Image generation failed.")
+            return
+
         try:
+            if len(image_urls) == 1:
+                await update.message.reply_photo(photo=image_urls[0], caption=f"🎨 {prompt}")
+            else:
+                media = [InputMediaPhoto(url, caption=f"🎨 {prompt}" if i == 0 else None) for i, url in enumerate(image_urls)]
+                await update.message.reply_media_group(media=media)
+            await status.done()
+        except Exception as e:
+            logger.error(f"Image delivery error: {e}")
+            await status.fail(f"❌ Error: {str(e)}")
+
+async def reply_with_video(update: Update, prompt: str):
+    """Generates a video for a prompt and replies with it."""
+    status_msg = await update.message.reply_text("🎬 Directing scene (this may take a while)...")
+    on_position = queue_status_updater(status_msg, "🎬 Directing scene (this may take a while)...")
+
+    try:
+        video_url = await generate_video_url(prompt, update.effective_user.id, on_position)
+        if video_url:
+            await update.message.reply_video(video=video_url, caption=f"🎬 {prompt}")
             await status_msg.delete()
-        except:
-            pass
+        else:
+            await status_msg.edit_text("❌ Video generation failed.")
+    except MediaJobCancelled:
+        await status_msg.edit_text("🛑 Video request cancelled.")
+    except Exception as e:
+        logger.error(f"Video generation error: {e}")
+        await status_msg.edit_text(f"❌ Error: {str(e)}")
+
+async def describe_photo(photo, context: ContextTypes.DEFAULT_TYPE, user_id=None, on_position=None) -> str | None:
+    """Returns a caption for a Telegram photo, reusing earlier analyses of the same file."""
+    key = f"{VISION_MODEL}:{photo.file_unique_id}"
+    caption = caption_cache.get(key)
+    if caption:
+        return caption
+
+    # Everyone asking about this photo joins one vision job as their own waiter, so
+    # each gets their queue position and a /cancel only detaches the user who sent it
+    file = await file_flights.do(photo.file_unique_id, lambda: context.bot.get_file(photo.file_id))
+    caption = await analyze_image_url(file.file_path, user_id, on_position, dedupe_key=photo.file_unique_id)
+    if caption:
+        caption_cache.set(key, caption)
+    return caption
+
+async def reply_with_caption(update: Update, context: ContextTypes.DEFAULT_TYPE, photo):
+    """Captions a photo and replies with what the model sees."""
+    cached = caption_cache.get(f"{VISION_MODEL}:{photo.file_unique_id}")
+    if cached:
+        await update.message.reply_text(f"👀 I see: {cached}")
+        return
+
+    async with JobStatus(update, ChatAction.TYPING, "👀 Analyzing image...") as status:
+        try:
+            caption = await describe_photo(photo, context, update.effective_user.id, status.on_position)
+            if caption:
+                await update.message.reply_text(f"👀 I see: {caption}")
+                await status.done()
+            else:
+                await status.fail("❌ Could not analyze image.")
+        except MediaJobCancelled:
+            await status.fail("🛑 Analysis cancelled.")
+        except Exception as e:
+            logger.error(f"Vision error: {e}")
+            await status.fail(f"❌ Error: {str(e)}")
+
+# --- Natural-language triggers (dispatched from master_text_handler) ---
+async def image_trigger(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> bool:
+    count, prompt = parse_image_count(text.split())
+    if not prompt:
+        return False
+    await reply_with_image(update, prompt, count)
+    return True
+
+async def video_trigger(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> bool:
+    if not text:
+        return False
+    await reply_with_video(update, text)
+    return True
+
+async def vision_trigger(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> bool:
+    replied = update.message.reply_to_message
+    if not replied or not replied.photo:
+        return False
+    await reply_with_caption(update, context, replied.photo[-1])
+    return True
+
+triggers.router.register("image", ["generate image", "create image"], image_trigger)
+triggers.router.register("video", ["generate video", "create video"], video_trigger)
+triggers.router.register("vision", ["explain this", "what is this"], vision_trigger)
 
 async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Generates an image using Stable Diffusion XL."""
-    prompt = " ".join(context.args)
+    count, prompt = parse_image_count(context.args)
     if not prompt:
-        await update.message.reply_text("Usage: /image <prompt>")
+        await update.message.reply_text(f"Usage: /image [-n 1-{MAX_IMAGES_PER_REQUEST}] <prompt>")
         return
 
-    status_msg = await update.message.reply_text("🎨 Painting your imagination...")
-
-    try:
-        image_url = await generate_image_url(prompt)
-        if image_url:
-            await update.message.reply_photo(photo=image_url, caption=f"🎨 {prompt}")
-            await status_msg.delete()
-        else:
-            await status_msg.edit_text("❌ Image generation failed.")
-    except Exception as e:
-        logger.error(f"Image generation error: {e}")
-        await status_msg.edit_text(f"❌ Error: {str(e)}")
+    await reply_with_image(update, prompt, count)
 
 async def handle_askit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Captions an image replied to by the user."""
@@ -218,25 +322,8 @@ async def handle_askit(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please reply to an image with /askit.")
         return
 
-    status_msg = await update.message.reply_text("👀 Analyzing image...")
-
-    try:
-        # Get the highest resolution photo
-        photo = update.message.reply_to_message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-        image_url = file.file_path
-
-        caption = await analyze_image_url(image_url)
-
-        if caption:
-            await update.message.reply_text(f"👀 I see: {caption}")
-            await status_msg.delete()
-        else:
-             await status_msg.edit_text("❌ Could not analyze image.")
-
-    except Exception as e:
-        logger.error(f"Vision error: {e}")
-        await status_msg.edit_text(f"❌ Error: {str(e)}")
+    # Get the highest resolution photo
+    await reply_with_caption(update, context, update.message.reply_to_message.photo[-1])
 
 async def handle_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Generates a video using LTX-Video."""
@@ -245,19 +332,15 @@ async def handle_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /video <prompt>")
         return
 
-    status_msg = await update.message.reply_text("🎬 Directing scene (this may take a while)...")
+    await reply_with_video(update, prompt)
 
-    try:
-        video_url = await generate_video_url(prompt)
-        if video_url:
-            await update.message.reply_video(video=video_url, caption=f"🎬 {prompt}")
-            await status_msg.delete()
-        else:
-            await status_msg.edit_text("❌ Video generation failed.")
-
-    except Exception as e:
-        logger.error(f"Video generation error: {e}")
-        await status_msg.edit_text(f"❌ Error: {str(e)}")
+async def handle_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancels the user's queued or running media jobs."""
+    cancelled = media_jobs.cancel_user(update.effective_user.id)
+    if cancelled:
+        await update.message.reply_text(f"🛑 Cancelled {cancelled} media request(s).")
+    else:
+        await update.message.reply_text("Nothing to cancel.")
 
 async def handle_tts_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Selects a TTS voice for speak mode."""
@@ -279,20 +362,17 @@ async def send_audio_response(text: str, update: Update, context: ContextTypes.D
     user_id = update.effective_user.id
     voice = user_tts_voices.get(user_id, "ash")
     
-    status_msg = await update.message.reply_text("🎤 Generating audio response...")
-    
-    try:
-        audio_bytes = await generate_tts_api_audio(text, voice=voice)
-        if audio_bytes:
-            await update.message.reply_audio(audio=audio_bytes, title="AI Response")
-            try:
-                await status_msg.delete()
-            except:
-                pass
-        else:
-            await status_msg.edit_text("❌ Failed to generate audio. Using text instead.")
-            await update.message.reply_text(text)
-    except Exception as e:
-        logger.error(f"Audio send error: {e}")
-        await status_msg.edit_text("❌ Error generating audio.")
-        await update.message.reply_text(text)
+    voices = {"premium": voice, "edge": user_voices.get(user_id, tts.DEFAULT_EDGE_VOICE)}
+    async with JobStatus(update, ChatAction.RECORD_VOICE, "🎤 Generating audio response..."):
+        # Premium and Edge TTS are hedged against each other within TTS_DEADLINE
+        result = await tts.orchestrator.synthesize(text, voices)
+    if result:
+        engine, audio = result
+        try:
+            with audio:
+                await update.message.reply_audio(audio=audio, title="AI Response", filename="response.mp3")
+            return
+        except Exception as e:
+            logger.error(f"Audio send error ({engine}): {e}")
+    # Without audio the reply still goes out, as text
+    await update.message.reply_text(text)
@@ -0,0 +1,207 @@
+import os
+import asyncio
+import logging
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per model class. Video jobs hold a thread for minutes, so they
+# get their own small pool instead of sharing asyncio's default executor.
+DEFAULT_WORKERS = {
+    "image": int(os.environ.get("MEDIA_IMAGE_WORKERS", 2)),
+    "video": int(os.environ.get("MEDIA_VIDEO_WORKERS", 1)),
+    "vision": int(os.environ.get("MEDIA_VISION_WORKERS", 2)),
+}
+
+MAX_GLOBAL_JOBS = int(os.environ.get("MEDIA_MAX_CONCURRENT", 4))
+MAX_JOBS_PER_USER = int(os.environ.get("MEDIA_MAX_PER_USER", 2))
+
+
+class MediaJobCancelled(Exception):
+    """Raised to a waiter whose job was cancelled with /cancel."""
+
+
+class MediaJob:
+    def __init__(self, job_id, kind, model_id, payload, key, user_id):
+        self.id = job_id
+        self.kind = kind
+        self.model_id = model_id
+        self.payload = payload
+        self.key = key
+        self.user_id = user_id  # Owner whose per-user slot the job occupies
+        self.waiters = []  # [(user_id, future, on_position)]
+        self.position = None  # 1.. while queued, 0 once running
+        self.abandoned = False
+
+
+class MediaJobQueue:
+    """
+    Bounded job queue for Bytez model calls.
+
+    Jobs wait in a single FIFO queue and start when both the global and the
+    per-user limits allow it. Identical in-flight requests (same model and
+    payload) share one job, and waiters are told their queue position as it
+    changes.
+    """
+
+    def __init__(self, client_factory, workers=None, max_global=MAX_GLOBAL_JOBS, max_per_user=MAX_JOBS_PER_USER):
+        self.client_factory = client_factory
+        self.max_global = max_global
+        self.max_per_user = max_per_user
+        self.executors = {
+            kind: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"bytez-{kind}")
+            for kind, count in (workers or DEFAULT_WORKERS).items()
+        }
+        self._client = None
+        self._models = {}  # model_id -> cached Bytez model handle
+        self._ids = itertools.count(1)
+        self._waiting = deque()
+        self._running = set()
+        self._inflight = {}  # dedupe key -> MediaJob
+        self._user_running = {}  # user_id -> running job count
+        self._tasks = set()  # Running jobs and notifiers; asyncio itself only holds weak references
+
+    def _get_model(self, model_id):
+        if self._client is None:
+            self._client = self.client_factory()
+            if not self._client:
+                raise ValueError("BYTEZ_KEY not found.")
+        if model_id not in self._models:
+            self._models[model_id] = self._client.model(model_id)
+        return self._models[model_id]
+
+    async def submit(self, user_id, kind, model_id, payload, on_position=None, dedupe_key=None):
+        """
+        Queue a model run and wait for its raw Bytez result.
+
+        `on_position` is an optional coroutine function called with the job's
+        queue position (1-based) whenever it changes, and with 0 when it starts.
+        """
+        if kind not in self.executors:
+            raise ValueError(f"Unknown media job kind: {kind}")
+
+        # Resolve the handle on the loop thread so worker threads never race to create it
+        self._get_model(model_id)
+        key = (model_id, dedupe_key if dedupe_key is not None else repr(payload))
+        future = asyncio.get_running_loop().create_future()
+
+        job = self._inflight.get(key)
+        if job is None:
+            job = MediaJob(next(self._ids), kind, model_id, payload, key, user_id)
+            self._inflight[key] = job
+            self._waiting.append(job)
+            job.waiters.append((user_id, future, on_position))
+            self._pump()
+        else:
+            logger.info(f"Media job {job.id} shared by user {user_id} (single-flight)")
+            job.waiters.append((user_id, future, on_position))
+            if on_position and job.position is not None:
+                self._notify(on_position, job.position)
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                raise MediaJobCancelled()
+            raise
+
+    def cancel_user(self, user_id) -> int:
+        """Cancel every queued or running job request made by a user."""
+        cancelled = 0
+        for job in list(self._waiting) + list(self._running):
+            live = []
+            for waiter in job.waiters:
+                if waiter[0] == user_id and not waiter[1].done():
+                    waiter[1].cancel()
+                    cancelled += 1
+                else:
+                    live.append(waiter)
+            job.waiters = live
+            if not any(not f.done() for _, f, _ in job.waiters):
+                self._drop(job)
+        if cancelled:
+            self._pump()
+        return cancelled
+
+    def _drop(self, job):
+        self._inflight.pop(job.key, None)
+        if job in self._waiting:
+            self._waiting.remove(job)
+        else:
+            # The worker thread cannot be interrupted; its result is discarded
+            job.abandoned = True
+
+    def stats(self):
+        return {"waiting": len(self._waiting), "running": len(self._running)}
+
+    def _pump(self):
+        for job in list(self._waiting):
+            if len(self._running) >= self.max_global:
+                break
+            if self._user_running.get(job.user_id, 0) >= self.max_per_user:
+                continue  # Later users are not blocked by one user's backlog
+            self._waiting.remove(job)
+            self._running.add(job)
+            self._user_running[job.user_id] = self._user_running.get(job.user_id, 0) + 1
+            self._spawn(self._run(job))
+        self._update_positions()
+
+    def _update_positions(self):
+        for index, job in enumerate(self._waiting, start=1):
+            self._set_position(job, index)
+        for job in self._running:
+            self._set_position(job, 0)
+
+    def _set_position(self, job, position):
+        if job.position == position:
+            return
+        job.position = position
+        for _, future, on_position in job.waiters:
+            if on_position and not future.done():
+                self._notify(on_position, position)
+
+    def _notify(self, on_position, position):
+        async def run():
+            try:
+                await on_position(position)
+            except Exception as e:
+                logger.warning(f"Queue position update failed: {e}")
+        self._spawn(run())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        model = self._get_model(job.model_id)
+        try:
+            result = await loop.run_in_executor(self.executors[job.kind], model.run, job.payload)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            self._running.discard(job)
+            self._user_running[job.user_id] -= 1
+            if not self._user_running[job.user_id]:
+                del self._user_running[job.user_id]
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+        if job.abandoned:
+            logger.info(f"Media job {job.id} finished after cancellation; result discarded")
+        for _, future, _ in job.waiters:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        self._pump()
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,166 @@
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Prometheus-style metrics kept in plain dicts. Recording is a dict update (and a
+# bisect for histograms), so instrumenting the message hot path costs ~1µs.
+
+REGISTRY = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, labels, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, labels=()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """A settable gauge, or a callback gauge when `fn` (returning {labels: value}) is given."""
+
+    def __init__(self, name, documentation, labelnames=(), fn=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.fn = fn
+        self.values = {}
+        REGISTRY.append(self)
+
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+    def inc(self, amount=1, labels=()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        values = self.values
+        if self.fn is not None:
+            try:
+                values = self.fn()
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} callback failed: {e}")
+                values = {}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value, labels=()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def time(self, labels=()):
+        """Context manager that observes the elapsed wall time of its block."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    """Prometheus text exposition of every registered metric."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Shared metrics ---
+STAGE_LATENCY = Histogram("bot_stage_seconds", "Time spent in each master_text_handler stage", ("stage",))
+LLM_LATENCY = Histogram("llm_request_seconds", "LLM provider request latency", ("provider",))
+LLM_REQUESTS = Counter("llm_requests_total", "LLM provider requests by outcome", ("provider", "outcome"))
+LLM_IN_FLIGHT = Gauge("llm_requests_in_flight", "LLM provider requests currently waiting for a reply")
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by LLM providers", ("provider", "kind"))
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result", ("cache", "result"))
+BOT_API_REQUESTS = Counter("bot_api_requests_total", "Bot API requests by method", ("method",))
+BOT_API_CALLS_PER_UPDATE = Histogram("bot_api_calls_per_update", "Bot API requests made while handling one update",
+                                     buckets=(0, 1, 2, 3, 4, 6, 8, 12, 20))
+SEARCH_REQUESTS = Counter("web_search_requests_total", "Web searches for replies by outcome", ("outcome",))
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "Event loop scheduling delay",
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+EVENT_LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event loop scheduling delay")
+
+
+def stage(name: str):
+    """Times one pipeline stage: `with metrics.stage("decision"): ...`"""
+    return _Timer(STAGE_LATENCY, (name,))
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Measures how late the loop wakes a sleeping task; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
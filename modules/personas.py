@@ -0,0 +1,72 @@
+import os
+import re
+import logging
+from ai.decision_logic import DecisionEngine
+from ai.memory_context import ChatMemoryContext
+from modules.summaries import SummaryManager
+from modules.features import FeatureManager
+from modules.trivia import TriviaManager
+from modules.state import StateMap
+from modules import triggers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOT_NAME = "AI618"
+
+
+def bot_key(name: str) -> str:
+    """Identifier-safe form of a bot name, used to partition per-bot state."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def parse_bots(spec: str | None, default_token: str | None) -> list[tuple[str, str]]:
+    """
+    Bots hosted by this process as (name, token) pairs, from
+    `BOTS="AI618=123:abc,Sage=456:def"`. Without BOTS, BOT_TOKEN runs as
+    AI618. The first bot is the primary one.
+    """
+    if not spec:
+        return [(DEFAULT_BOT_NAME, default_token)]
+    bots = []
+    for entry in spec.split(","):
+        name, sep, token = entry.strip().partition("=")
+        if not sep or not name.strip() or not token.strip():
+            raise ValueError(f"BOTS entries look like Name=token, got {entry.strip()!r}")
+        bots.append((name.strip(), token.strip()))
+    if len({bot_key(name) for name, _ in bots}) != len(bots):
+        raise ValueError("BOTS names must be distinct")
+    return bots
+
+
+class Persona:
+    """
+    One bot hosted in this process: its token, name and persona prompt, plus
+    the state that must not mix between bots (chat histories, summaries,
+    memories, trivia games and feature toggles). Everything else (API pools,
+    caches, the memory store and its embedding model, the trivia question
+    bank and leaderboard) is shared. Each bot's Application also gets its own
+    Bot API rate limiter, since Telegram's flood limits apply per bot.
+
+    The primary bot keeps the unprefixed state namespaces and memory
+    collection, so adding bots leaves its existing data in place.
+    """
+
+    def __init__(self, name: str, token: str, api_client, memory_manager, primary: bool = False,
+                 question_bank=None, leaderboard=None):
+        self.name = name
+        self.token = token
+        self.key = bot_key(name)
+        self.primary = primary
+        # PERSONA_<KEY> describes the character, e.g. PERSONA_SAGE="a calm chemistry tutor"
+        persona = os.environ.get(f"PERSONA_{self.key.upper().replace('-', '_')}")
+        self.decision_engine = DecisionEngine(bot_name=name, persona=persona)
+        self.chat_histories = {}
+        suffix = "" if primary else f":{self.key}"
+        self.summaries = SummaryManager(api_client, summaries=StateMap(f"chat_summaries{suffix}"))
+        self.memory = memory_manager if primary else memory_manager.for_bot(self.key)
+        self.memory_context = ChatMemoryContext(self.memory)
+        self.trivia = TriviaManager(api_client, bank=question_bank, leaderboard=leaderboard)
+        self.features = FeatureManager(api_client, namespace_suffix=suffix)
+        # Saying a bot's name only summons that bot
+        self.mention_trigger = f"mention:{self.key}"
+        triggers.router.register(self.mention_trigger, [name])
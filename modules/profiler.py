@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from modules import admin
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "data/profiles")
+MAX_PROFILE_SECONDS = 300
+SAMPLE_INTERVAL = 0.005
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class AsyncProfiler:
+    """
+    Sampling profiler for the event loop.
+
+    Two views are collected while it runs:
+    - CPU: a background thread samples the loop thread's stack, so time spent
+      inside coroutines (and idle time in the selector) shows up.
+    - Await: a callback on the loop records where every pending task is
+      suspended, which is where updates spend wall-clock time waiting.
+    """
+
+    def __init__(self, loop, interval=SAMPLE_INTERVAL):
+        self.loop = loop
+        self.interval = interval
+        self.loop_thread_id = threading.get_ident()
+        self.cpu_stacks = Counter()
+        self.await_sites = Counter()
+        self.samples = 0
+        self._running = False
+
+    def _sample_cpu(self):
+        while self._running:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.cpu_stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def _sample_awaits(self):
+        if not self._running:
+            return
+        current = asyncio.current_task(self.loop)
+        for task in asyncio.all_tasks(self.loop):
+            if task is current or task.done():
+                continue
+            stack = task.get_stack()
+            if stack:
+                self.await_sites[f"{task.get_name()}: {_frame_label(stack[-1])}"] += 1
+        self.loop.call_later(self.interval * 4, self._sample_awaits)
+
+    async def run(self, seconds: float):
+        self._running = True
+        thread = threading.Thread(target=self._sample_cpu, name="profiler", daemon=True)
+        thread.start()
+        self._sample_awaits()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._running = False
+            thread.join()
+
+    def report(self, top=25) -> str:
+        own = Counter()
+        total = Counter()
+        for stack, count in self.cpu_stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        samples = max(self.samples, 1)
+
+        lines = [f"CPU samples: {self.samples} (every {self.interval * 1000:.0f}ms)", "", "Top functions by own time:"]
+        lines += [f"{count / samples:6.1%}  {label}" for label, count in own.most_common(top)]
+        lines += ["", "Top functions by total time:"]
+        lines += [f"{count / samples:6.1%}  {label}" for label, count in total.most_common(top)]
+        lines += ["", "Where tasks were waiting (samples):"]
+        lines += [f"{count:6d}  {site}" for site, count in self.await_sites.most_common(top)]
+        lines += ["", "Collapsed stacks (flamegraph.pl input):"]
+        lines += [f"{';'.join(stack)} {count}" for stack, count in self.cpu_stacks.most_common()]
+        return "\n".join(lines)
+
+
+_active = None
+
+
+async def handle_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Owner-only: /profile [seconds] samples the event loop and sends back a report."""
+    global _active
+    # Chat admin is not enough: anyone can be admin of a group they made, and the
+    # profiler samples the whole process and returns its stacks and file paths
+    if not admin.is_owner(update):
+        await update.message.reply_text("🚫 Bot owners only.")
+        return
+    if _active is not None:
+        await update.message.reply_text("A profile is already running.")
+        return
+
+    seconds = 30
+    if context.args and context.args[0].isdigit():
+        seconds = max(1, min(int(context.args[0]), MAX_PROFILE_SECONDS))
+
+    _active = AsyncProfiler(asyncio.get_running_loop())
+    await update.message.reply_text(f"🔬 Profiling for {seconds}s...")
+    # Run in the background so updates keep flowing (and get profiled)
+    context.application.create_task(_profile_and_report(_active, seconds, update))
+
+async def _profile_and_report(profiler: AsyncProfiler, seconds: int, update: Update):
+    global _active
+    try:
+        await profiler.run(seconds)
+        report = profiler.report()
+    finally:
+        _active = None
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+    with open(path, "w") as f:
+        f.write(report)
+    logger.info(f"Profile written to {path}")
+    with open(path, "rb") as f:
+        await update.message.reply_document(document=f, filename=os.path.basename(path), caption=f"🔬 {seconds}s profile")
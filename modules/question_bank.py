@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRIVIA_DB_PATH = os.environ.get("TRIVIA_DB_PATH", "data/trivia.sqlite3")
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def normalize_question(text: str) -> str:
+    """Lowercases and strips punctuation so reworded duplicates compare equal."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", text.lower())).strip()
+
+
+class QuestionBank:
+    """
+    Local store of generated trivia questions, indexed by topic and difficulty.
+
+    Questions are deduplicated per topic on their normalized text, and the
+    bank remembers which questions each chat has already seen so games can be
+    served from stock without repeats.
+    """
+
+    def __init__(self, path=TRIVIA_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct_index INTEGER NOT NULL,
+                norm TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (topic, norm)
+            );
+            CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (topic, difficulty);
+            CREATE TABLE IF NOT EXISTS seen (
+                chat_id TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                PRIMARY KEY (chat_id, question_id)
+            );
+            CREATE TABLE IF NOT EXISTS topic_plays (
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                last_played REAL NOT NULL,
+                PRIMARY KEY (topic, difficulty)
+            );
+        """)
+
+    def add_questions(self, topic: str, difficulty: str, questions: list[dict]) -> list[dict]:
+        """Stores questions and returns the ones that were new, each with its bank `id`."""
+        topic = normalize_topic(topic)
+        added = []
+        now = time.time()
+        for q in questions:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO questions (topic, difficulty, question, options, correct_index, norm, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (topic, difficulty, q["question"], json.dumps(q["options"]), q["correct_index"], normalize_question(q["question"]), now)
+            )
+            if cursor.rowcount:
+                added.append({**q, "id": cursor.lastrowid})
+        return added
+
+    def take(self, chat_id: str, topic: str, difficulty: str, count: int, exclude_norms=()) -> list[dict]:
+        """Returns up to `count` random stocked questions this chat has not seen yet."""
+        rows = self.db.execute(
+            "SELECT id, question, options, correct_index, norm FROM questions q "
+            "WHERE topic = ? AND difficulty = ? "
+            "AND NOT EXISTS (SELECT 1 FROM seen s WHERE s.chat_id = ? AND s.question_id = q.id) "
+            "ORDER BY random() LIMIT ?",
+            (normalize_topic(topic), difficulty, str(chat_id), count + len(exclude_norms))
+        ).fetchall()
+        exclude_norms = set(exclude_norms)
+        questions = []
+        for qid, question, options, correct_index, norm in rows:
+            if norm in exclude_norms:
+                continue
+            questions.append({"id": qid, "question": question, "options": json.loads(options), "correct_index": correct_index})
+        return questions[:count]
+
+    def mark_seen(self, chat_id: str, question_ids: list[int]):
+        self.db.executemany(
+            "INSERT OR IGNORE INTO seen (chat_id, question_id) VALUES (?, ?)",
+            [(str(chat_id), qid) for qid in question_ids]
+        )
+
+    def stock(self, topic: str, difficulty: str) -> int:
+        row = self.db.execute(
+            "SELECT COUNT(*) FROM questions WHERE topic = ? AND difficulty = ?", (normalize_topic(topic), difficulty)
+        ).fetchone()
+        return row[0]
+
+    def norms(self, topic: str) -> set[str]:
+        rows = self.db.execute("SELECT norm FROM questions WHERE topic = ?", (normalize_topic(topic),))
+        return {row[0] for row in rows}
+
+    def record_play(self, topic: str, difficulty: str):
+        self.db.execute(
+            "INSERT INTO topic_plays (topic, difficulty, plays, last_played) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (topic, difficulty) DO UPDATE SET plays = plays + 1, last_played = excluded.last_played",
+            (normalize_topic(topic), difficulty, time.time())
+        )
+
+    def popular_topics(self, limit: int = 5) -> list[tuple[str, str]]:
+        rows = self.db.execute(
+            "SELECT topic, difficulty FROM topic_plays ORDER BY plays DESC, last_played DESC LIMIT ?", (limit,)
+        )
+        return [(topic, difficulty) for topic, difficulty in rows]
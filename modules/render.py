@@ -0,0 +1,84 @@
+# CPU-bound renderers that run inside the render process pool.
+# Kept free of Telegram/bot imports so spawned workers start quickly.
+import os
+import math
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 2))
+
+_pool = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Returns the shared render pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+    return _pool
+
+
+def start_render_pool():
+    """
+    Starts the render workers up front.
+
+    Call this before the bot starts its own threads, so the workers are forked
+    from a quiet process instead of mid-flight.
+    """
+    pool = get_render_pool()
+    for future in [pool.submit(os.getpid) for _ in range(RENDER_WORKERS)]:
+        future.result()
+
+
+def shutdown_render_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_molecules(smiles_list: list[str], size: int = 300) -> tuple[list[str], bytes]:
+    """
+    Parses SMILES strings and draws them in one pass.
+
+    Returns the canonical SMILES of each molecule and the PNG bytes. Several
+    molecules are laid out as a grid with their canonical SMILES as legends.
+    """
+    from rdkit import Chem
+    from rdkit.Chem.Draw import rdMolDraw2D
+
+    mols = []
+    for smiles in smiles_list:
+        mol = Chem.MolFromSmiles(smiles)
+        if not mol:
+            raise ValueError(f"Invalid SMILES: {smiles}")
+        mols.append(mol)
+    canonical = [Chem.MolToSmiles(mol) for mol in mols]
+
+    if len(mols) == 1:
+        drawer = rdMolDraw2D.MolDraw2DCairo(size, size)
+        drawer.DrawMolecule(mols[0])
+    else:
+        cols = min(len(mols), 3)
+        rows = math.ceil(len(mols) / cols)
+        drawer = rdMolDraw2D.MolDraw2DCairo(cols * size, rows * size, size, size)
+        drawer.DrawMolecules(mols, legends=canonical)
+    drawer.FinishDrawing()
+    return canonical, drawer.GetDrawingText()
+
+
+def render_latex(formula: str, dpi: int = 300) -> bytes:
+    """Renders a math formula with matplotlib's mathtext (no TeX install or network needed)."""
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    fig.text(0, 0, f"${formula}$", fontsize=14)
+    buffer = io.BytesIO()
+    # Raises ValueError for syntax mathtext cannot parse
+    fig.savefig(buffer, dpi=dpi, format="png", bbox_inches="tight", pad_inches=0.15, facecolor="white")
+    return buffer.getvalue()
@@ -0,0 +1,211 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Telegram's documented flood limits: about 30 requests/second per bot,
+# 20 messages/minute into one group and about one message/second into a
+# private chat (short bursts are tolerated).
+GLOBAL_RATE = float(os.environ.get("BOT_API_GLOBAL_RATE", 30))
+GROUP_RATE_PER_MINUTE = float(os.environ.get("BOT_API_GROUP_RATE", 20))
+PRIVATE_RATE = float(os.environ.get("BOT_API_PRIVATE_RATE", 1))
+PRIVATE_BURST = 3
+MAX_RETRIES = 3
+# Concurrent connections to the Bot API (PTB's own HTTPXRequest default is 1)
+BOT_API_POOL_SIZE = int(os.environ.get("BOT_API_POOL_SIZE", 64))
+# Telegram shows a chat action for about 5 seconds
+CHAT_ACTION_INTERVAL = 4.5
+
+FLOOD_WAITS = metrics.Counter("bot_api_flood_waits_total", "RetryAfter responses waited out, by method", ("method",))
+
+
+def _posts_message(endpoint: str) -> bool:
+    """Endpoints that count against a chat's message limit."""
+    if endpoint == "sendChatAction":
+        return False
+    return endpoint.startswith(("send", "copyMessage", "forwardMessage"))
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def full(self, now: float) -> bool:
+        """Whether the bucket has refilled completely, which makes it no different from a new one."""
+        return self.updated is None or self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimitedSender(BaseRateLimiter):
+    """
+    Runs Bot API calls inside Telegram's flood limits.
+
+    Installed as the application's rate limiter, so every Bot API call goes
+    through it. Every call takes a token from the global bucket; calls that
+    post messages into a chat also take one per message from that chat's
+    bucket (group or private limits). RetryAfter errors are waited out and
+    retried, so bulk work finishes as fast as Telegram allows.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, group_rate_per_minute=GROUP_RATE_PER_MINUTE,
+                 private_rate=PRIVATE_RATE, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self.group_rate = group_rate_per_minute / 60
+        self.group_burst = group_rate_per_minute
+        self.private_rate = private_rate
+        self._global = TokenBucket(global_rate, global_rate)
+        # chat_id -> TokenBucket, least recently used first; refilled buckets are dropped
+        self._chats = OrderedDict()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id):
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            self._evict_idle()
+            if key.startswith(("-", "@")):
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, PRIVATE_BURST)
+            self._chats[key] = bucket
+        else:
+            self._chats.move_to_end(key)
+        return bucket
+
+    def _evict_idle(self):
+        """Drops the least recently used buckets that have refilled; losing them changes nothing."""
+        now = asyncio.get_running_loop().time()
+        while self._chats and next(iter(self._chats.values())).full(now):
+            self._chats.popitem(last=False)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id") if _posts_message(endpoint) else None
+        # An album posts one message per item
+        messages = len(data.get("media") or ()) or 1
+        return await self._send(callback, args, kwargs, chat_id, messages, endpoint)
+
+    async def call(self, fn, *args, chat_id=None, **kwargs):
+        """
+        Awaits `fn(*args, **kwargs)` within the limits; pass `chat_id` to also
+        apply that chat's message limit. Only for work that doesn't already go
+        through the bot's rate limiter.
+        """
+        return await self._send(fn, args, kwargs, chat_id, 1, getattr(fn, "__name__", str(fn)))
+
+    async def _send(self, fn, args, kwargs, chat_id, messages, name):
+        for attempt in range(self.max_retries + 1):
+            await self._global.acquire()
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire(messages)
+            try:
+                return await fn(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                FLOOD_WAITS.inc(1, (name,))
+                logger.warning(f"Flood control: retrying {name} in {delay}s")
+                await asyncio.sleep(delay)
+
+
+class JobStatus:
+    """
+    Progress feedback for a media request without throwaway messages.
+
+    While the job runs the chat sees a repeating chat action ("sending
+    photo..."). A status message is only posted once the job has to wait in
+    the queue, to show its position; it is then reused for the outcome and
+    deleted on success.
+
+        async with JobStatus(update, ChatAction.UPLOAD_PHOTO, "🎨 Painting...") as status:
+            url = await generate_image_url(prompt, user_id, status.on_position)
+    """
+
+    def __init__(self, update, action: str, working_text: str):
+        self.update = update
+        self.action = action
+        self.working_text = working_text
+        self.message = None
+        self._pulse = None
+        # Position callbacks run as separate tasks; one at a time, so only one status message is posted
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        self._pulse = asyncio.create_task(self._keep_action())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.stop()
+        return False
+
+    def stop(self):
+        if self._pulse:
+            self._pulse.cancel()
+            self._pulse = None
+
+    async def _keep_action(self):
+        try:
+            while True:
+                await self.update.effective_chat.send_action(self.action)
+                await asyncio.sleep(CHAT_ACTION_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Chat action failed: {e}")
+
+    async def on_position(self, position: int):
+        """Queue callback for MediaJobQueue.submit()."""
+        async with self._lock:
+            if position > 0:
+                text = f"⏳ Queued (#{position})... send /cancel to give up."
+                if self.message is None:
+                    self.message = await self.update.message.reply_text(text)
+                else:
+                    await self.message.edit_text(text)
+            elif self.message is not None:
+                await self.message.edit_text(self.working_text)
+
+    async def fail(self, text: str):
+        """Reports a failure in the status message if there is one, else as a reply."""
+        self.stop()
+        async with self._lock:
+            if self.message is not None:
+                await self.message.edit_text(text)
+            else:
+                await self.update.message.reply_text(text)
+
+    async def done(self):
+        self.stop()
+        if self.message is not None:
+            try:
+                await self.message.delete()
+            except Exception as e:
+                logger.warning(f"Status cleanup failed: {e}")
+
@@ -0,0 +1,160 @@
+import os
+import zlib
+import queue
+import shutil
+import signal
+import asyncio
+import logging
+import subprocess
+import multiprocessing
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from modules import state
+from ai.memory_manager import MEMORY_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes updates are sharded across; 1 keeps the classic
+# single-process bot.
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", 1))
+MEMORY_SERVER_PORT = int(os.environ.get("MEMORY_SERVER_PORT", 8765))
+WORKER_QUEUE_SIZE = 10_000
+STOP = None
+
+
+def shard_for(key, workers: int) -> int:
+    """Stable across processes and restarts (unlike hash())."""
+    return zlib.crc32(str(key).encode()) % workers
+
+
+def worker_share(limit: int, workers: int) -> int:
+    """
+    One worker's part of a bot-wide concurrency limit, so the workers together
+    stay within it. Never below one, or a worker could not run the work at all.
+    """
+    return max(1, limit // workers)
+
+
+def route_key(update: Update):
+    """
+    Everything that belongs to one chat must reach the same worker, since chat
+    histories, trivia sessions and admin rosters stay in worker memory.
+    """
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.poll_answer:
+        # Poll answers carry no chat; the trivia poll index knows where they belong
+        entry = state.StateMap("trivia_polls").get(update.poll_answer.poll_id)
+        return entry[0] if entry else 0
+    if update.effective_user:
+        return update.effective_user.id
+    return 0
+
+
+class ShardRouter:
+    """
+    Front-process side of the sharded run mode: owns the worker processes and
+    forwards each update to the one that owns its chat.
+    """
+
+    def __init__(self, workers: int, target):
+        self.workers = workers
+        self.target = target  # target(index, updates), run in each worker process
+        self.queues = []
+        self.processes = []
+        self.forwarded = [0] * workers
+        self._context = multiprocessing.get_context("spawn")
+
+    def start(self):
+        for index in range(self.workers):
+            updates = self._context.Queue(WORKER_QUEUE_SIZE)
+            process = self._context.Process(target=_worker_entry, args=(self.target, index, updates), name=f"shard-{index}")
+            process.start()
+            self.queues.append(updates)
+            self.processes.append(process)
+        logger.info(f"Started {self.workers} shard workers")
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        index = shard_for(route_key(update), self.workers)
+        self.forwarded[index] += 1
+        # Updates cross the process boundary as plain dicts
+        try:
+            self.queues[index].put_nowait(update.to_dict())
+        except queue.Full:
+            logger.warning(f"Shard {index} is {WORKER_QUEUE_SIZE} updates behind; dropping update {update.update_id}")
+
+    def stop(self, timeout: float = 30):
+        for updates in self.queues:
+            updates.put(STOP)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time; terminating")
+                process.terminate()
+
+
+def _worker_entry(target, index, updates):
+    # Ctrl-C reaches the whole process group; let the front coordinate shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(index, updates)
+
+
+async def serve_shard(app, updates, on_startup=None, on_shutdown=None):
+    """Worker-process side: feeds updates from the front into `app` until told to stop."""
+    loop = asyncio.get_running_loop()
+    async with app:
+        if on_startup:
+            await on_startup(app)
+        await app.start()
+        try:
+            while True:
+                data = await loop.run_in_executor(None, updates.get)
+                if data is STOP:
+                    break
+                await app.update_queue.put(Update.de_json(data, app.bot))
+        finally:
+            await app.stop()
+            if on_shutdown:
+                await on_shutdown(app)
+
+
+def prepare_shared_services():
+    """
+    Points worker processes at services every worker can share, before they
+    are spawned (they inherit os.environ):
+    - state: a LocalRedisServer over the front's backend unless STATE_BACKEND
+      already names a shared store
+    - memory: a Chroma server over MEMORY_DB_PATH, since Chroma's on-disk
+      client must not be opened by several processes
+    Returns the helpers to stop on shutdown.
+    """
+    services = []
+    if not state.get_backend().shared:
+        # Workers reach the front's own (write-behind) state through the stand-in
+        server = state.LocalRedisServer(state.get_backend()).start()
+        os.environ["STATE_BACKEND"] = server.url
+        services.append(server)
+        logger.info(f"Shared state served at {server.url}")
+
+    if not MEMORY_DB_PATH.startswith(("http://", "https://", ":memory:")):
+        chroma_cli = shutil.which("chroma")
+        if chroma_cli is None:
+            raise RuntimeError("SHARD_WORKERS > 1 needs a Chroma server: set MEMORY_DB_PATH=http://host:port")
+        chroma = subprocess.Popen(
+            [chroma_cli, "run", "--path", MEMORY_DB_PATH, "--host", "127.0.0.1", "--port", str(MEMORY_SERVER_PORT)],
+            stdout=subprocess.DEVNULL,
+        )
+        os.environ["MEMORY_DB_PATH"] = f"http://127.0.0.1:{MEMORY_SERVER_PORT}"
+        services.append(chroma)
+        logger.info(f"Memory store served at {os.environ['MEMORY_DB_PATH']}")
+    return services
+
+
+def stop_shared_services(services):
+    for service in services:
+        if isinstance(service, subprocess.Popen):
+            service.terminate()
+            service.wait(10)
+        else:
+            service.stop()
@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+try:
+    import redis
+except ImportError:  # Only needed for redis:// backends
+    redis = None
+
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Where runtime state lives:
+#   sqlite:///data/state.sqlite3  - persisted with write-behind batching (default)
+#   memory                        - this process only, lost on restart
+#   redis://host:6379/0           - Redis, or the LocalRedisServer stand-in below
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "sqlite:///data/state.sqlite3")
+# Seconds between write-behind flushes; changes are also flushed at shutdown
+STATE_FLUSH_INTERVAL = float(os.environ.get("STATE_FLUSH_INTERVAL", 5))
+# Keys the write-behind backend keeps in memory (least recently used go first; unflushed ones stay)
+STATE_CACHE_SIZE = int(os.environ.get("STATE_CACHE_SIZE", 10000))
+
+_MISSING = object()
+_UNLOADED = object()
+
+
+class StateBackend(ABC):
+    """Namespaced key/value store for runtime state. Values must be JSON-serialisable."""
+
+    shared = False  # True when other processes see the same data
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default=None): ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value): ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str): ...
+
+    @abstractmethod
+    def items(self, namespace: str) -> dict: ...
+
+
+class MemoryBackend(StateBackend):
+    def __init__(self):
+        self._data = {}
+
+    def get(self, namespace, key, default=None):
+        return self._data.get(namespace, {}).get(key, default)
+
+    def set(self, namespace, key, value):
+        self._data.setdefault(namespace, {})[key] = value
+
+    def delete(self, namespace, key):
+        self._data.get(namespace, {}).pop(key, None)
+
+    def items(self, namespace):
+        return dict(self._data.get(namespace, {}))
+
+
+class SQLiteBackend(StateBackend):
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.shared = path != ":memory:"
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)", (namespace, key, json.dumps(value))
+            )
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self.db.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace):
+        with self._lock:
+            rows = self.db.execute("SELECT key, value FROM state WHERE namespace = ?", (namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def write_batch(self, upserts, deletes):
+        """Applies [(namespace, key, value)] and [(namespace, key)] in one transaction."""
+        with self._lock:
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+                    [(namespace, key, json.dumps(value)) for namespace, key, value in upserts]
+                )
+                self.db.executemany("DELETE FROM state WHERE namespace = ? AND key = ?", deletes)
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+
+FLUSH_LATENCY = metrics.Histogram("state_flush_seconds", "Write-behind flush duration")
+FLUSHED_KEYS = metrics.Counter("state_flushed_keys_total", "Keys written by write-behind flushes")
+
+
+class WriteBehindBackend(StateBackend):
+    """
+    Serves state from memory and writes changes to `store` in batches.
+
+    Keys are loaded on first access, so startup cost doesn't grow with the
+    number of users. Writes only mark keys dirty; flush() writes them all in
+    one transaction and runs on an interval and at shutdown. A write-behind
+    store belongs to one process: shard workers reach it through the front
+    process's LocalRedisServer.
+    """
+
+    def __init__(self, store: SQLiteBackend, max_keys: int = STATE_CACHE_SIZE):
+        self.store = store
+        self.max_keys = max_keys
+        self._cache = OrderedDict()  # (namespace, key) -> value, or _MISSING if the store has none; LRU order
+        self._dirty = {}  # (namespace, key) -> value, or _MISSING to delete
+        self._loaded = set()  # namespaces read in full by items()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def dirty_count(self):
+        return len(self._dirty)
+
+    def _remember(self, cache_key, value):
+        self._cache[cache_key] = value
+        self._cache.move_to_end(cache_key)
+
+    def _evict(self):
+        """Drops least recently used keys beyond max_keys. Unflushed keys stay, since the store is behind on them."""
+        excess = len(self._cache) - self.max_keys
+        if excess <= 0:
+            return
+        for cache_key in list(self._cache):
+            if cache_key in self._dirty:
+                continue
+            del self._cache[cache_key]
+            # The namespace is no longer complete in memory; items() reloads it
+            self._loaded.discard(cache_key[0])
+            excess -= 1
+            if not excess:
+                break
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            value = self._cache.get((namespace, key), _UNLOADED)
+            if value is _UNLOADED:
+                value = self.store.get(namespace, key, _MISSING)
+                self._remember((namespace, key), value)
+                self._evict()
+            else:
+                self._cache.move_to_end((namespace, key))
+        return default if value is _MISSING else value
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._dirty[(namespace, key)] = value
+            self._remember((namespace, key), value)
+            self._evict()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._dirty[(namespace, key)] = _MISSING
+            self._remember((namespace, key), _MISSING)
+            self._evict()
+
+    def items(self, namespace):
+        with self._lock:
+            if namespace not in self._loaded:
+                for key, value in self.store.items(namespace).items():
+                    self._cache.setdefault((namespace, key), value)
+                self._loaded.add(namespace)
+            found = {
+                key: value for (space, key), value in self._cache.items()
+                if space == namespace and value is not _MISSING
+            }
+            self._evict()
+            return found
+
+    def flush(self) -> int:
+        """Writes every dirty key to the store; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._dirty = self._dirty, {}
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.store.write_batch(
+                    [(namespace, key, value) for (namespace, key), value in batch.items() if value is not _MISSING],
+                    [(namespace, key) for (namespace, key), value in batch.items() if value is _MISSING],
+                )
+            except Exception as e:
+                # Keep the changes for the next flush (anything written since wins), minus
+                # values that can never be written, so they don't block every later flush
+                for (namespace, key), value in list(batch.items()):
+                    if value is _MISSING:
+                        continue
+                    try:
+                        json.dumps(value)
+                    except (TypeError, ValueError) as bad:
+                        logger.error(f"Dropping unserialisable state {namespace}/{key}: {bad}")
+                        del batch[(namespace, key)]
+                with self._lock:
+                    self._dirty = {**batch, **self._dirty}
+                logger.error(f"State flush failed ({len(batch)} keys kept for the next flush): {e}")
+                return 0
+            FLUSH_LATENCY.observe(time.perf_counter() - start)
+            FLUSHED_KEYS.inc(len(batch))
+            return len(batch)
+
+
+class RedisBackend(StateBackend):
+    """One Redis hash per namespace."""
+
+    shared = True
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND is redis:// but the redis package is not installed")
+        self.client = redis.Redis.from_url(url, decode_responses=True, protocol=2)
+
+    def get(self, namespace, key, default=None):
+        value = self.client.hget(namespace, key)
+        return json.loads(value) if value is not None else default
+
+    def set(self, namespace, key, value):
+        self.client.hset(namespace, key, json.dumps(value))
+
+    def delete(self, namespace, key):
+        self.client.hdel(namespace, key)
+
+    def items(self, namespace):
+        return {key: json.loads(value) for key, value in self.client.hgetall(namespace).items()}
+
+
+def create_backend(url: str) -> StateBackend:
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith("sqlite://"):
+        # sqlite:///relative/path or sqlite:////absolute/path
+        return WriteBehindBackend(SQLiteBackend(urlparse(url).path[1:] or ":memory:"))
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown STATE_BACKEND: {url}")
+
+
+_backend = None
+
+
+def get_backend() -> StateBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(STATE_BACKEND)
+        logger.info(f"State backend: {type(_backend).__name__}")
+    return _backend
+
+
+def set_backend(backend: StateBackend):
+    global _backend
+    _backend = backend
+
+
+def flush():
+    """Flushes pending write-behind changes, if the backend batches writes."""
+    if isinstance(_backend, WriteBehindBackend):
+        _backend.flush()
+
+
+async def run_flusher(interval: float = STATE_FLUSH_INTERVAL):
+    """Periodically flushes write-behind changes; runs until cancelled."""
+    if not isinstance(get_backend(), WriteBehindBackend):
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush)
+        except Exception as e:
+            # One bad flush must not stop periodic flushing
+            logger.error(f"State flusher error: {e}")
+
+
+metrics.Gauge("state_dirty_keys", "State changes waiting for the next write-behind flush",
+              fn=lambda: {(): getattr(_backend, "dirty_count", 0)})
+
+
+class StateMap(MutableMapping):
+    """
+    Dict-like view of one namespace in the state backend.
+
+    Drop-in for the plain dicts modules used to keep per-user state in, so the
+    same code runs single-process or with state shared between shard workers.
+    Keys are stored as strings.
+    """
+
+    def __init__(self, namespace: str, backend: StateBackend | None = None):
+        self.namespace = namespace
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def __getitem__(self, key):
+        value = self.backend.get(self.namespace, str(key), _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self.backend.get(self.namespace, str(key), default)
+
+    def __setitem__(self, key, value):
+        self.backend.set(self.namespace, str(key), value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.backend.delete(self.namespace, str(key))
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self.backend.delete(self.namespace, str(key))
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(self.backend.items(self.namespace))
+
+    def __len__(self):
+        return len(self.backend.items(self.namespace))
+
+
+class LocalRedisServer:
+    """
+    Minimal Redis stand-in serving a StateBackend over RESP2.
+
+    Speaks the hash commands RedisBackend uses (one hash per namespace, JSON
+    values). The shard front process runs one over its own backend so workers
+    share (and persist) state without a Redis deployment; point STATE_BACKEND
+    at a real Redis to scale across hosts.
+    """
+
+    def __init__(self, backend: StateBackend | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.backend = backend or MemoryBackend()
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._server = None
+        self._clients = set()
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    def start(self):
+        """Serves from a background thread; returns once the port is bound."""
+        thread = threading.Thread(target=self._run, name="local-redis", daemon=True)
+        thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _shutdown(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        await self._server.wait_closed()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, sock=sock))
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                writer.write(self._execute(command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):  # Inline command
+            return line.decode().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2].decode())
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def _execute(self, args):
+        name = args[0].upper()
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name == "HGET":
+            value = self.backend.get(args[1], args[2], _MISSING)
+            return self._bulk(None if value is _MISSING else json.dumps(value))
+        if name == "HSET":
+            added = 0
+            for field, value in zip(args[2::2], args[3::2]):
+                added += self.backend.get(args[1], field, _MISSING) is _MISSING
+                self.backend.set(args[1], field, json.loads(value))
+            return b":%d\r\n" % added
+        if name == "HDEL":
+            removed = 0
+            for field in args[2:]:
+                if self.backend.get(args[1], field, _MISSING) is not _MISSING:
+                    self.backend.delete(args[1], field)
+                    removed += 1
+            return b":%d\r\n" % removed
+        if name == "HGETALL":
+            table = self.backend.items(args[1])
+            parts = [part for key, value in table.items() for part in (key, json.dumps(value))]
+            return b"*%d\r\n" % len(parts) + b"".join(self._bulk(part) for part in parts)
+        return b"-ERR unknown command '%s'\r\n" % args[0].encode()
@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+from modules import metrics
+from modules.state import StateMap
+
+logger = logging.getLogger(__name__)
+
+# Fold new messages into a chat's summary once this many have piled up
+SUMMARY_EVERY = int(os.environ.get("SUMMARY_EVERY", 10))
+SUMMARY_MAX_WORDS = int(os.environ.get("SUMMARY_MAX_WORDS", 150))
+# Messages kept while the LLM is failing; older ones are dropped unsummarized
+MAX_PENDING = SUMMARY_EVERY * 5
+# After a failed update a chat waits this long before the next try, doubling per failure up to the max
+RETRY_AFTER = 30
+MAX_RETRY_AFTER = 900
+
+SUMMARY_UPDATES = metrics.Counter("chat_summary_updates_total", "Rolling chat summary updates by outcome", ("outcome",))
+
+
+class SummaryManager:
+    """
+    Rolling per-chat summaries. Every SUMMARY_EVERY messages a background
+    task asks the LLM to fold the new messages into the existing summary, so
+    each update costs a summary plus a handful of lines, never a re-read of
+    the chat. Summaries go through the state backend and survive restarts.
+    """
+
+    def __init__(self, api_client, every: int = SUMMARY_EVERY, summaries=None, retry_after: float = RETRY_AFTER):
+        self.api_client = api_client
+        self.every = every
+        self.retry_after = retry_after
+        self.summaries = summaries if summaries is not None else StateMap("chat_summaries")
+        self.pending = {}  # chat_id -> lines not yet in the summary
+        self._updates = {}  # chat_id -> running update task
+        self._failures = {}  # chat_id -> (consecutive failed updates, monotonic time of the next try)
+
+    def get(self, chat_id: str) -> str:
+        return self.summaries.get(chat_id, "")
+
+    def observe(self, chat_id: str, line: str):
+        """Records a chat line and starts a background update once enough are pending."""
+        pending = self.pending.setdefault(chat_id, [])
+        pending.append(line)
+        if len(pending) > MAX_PENDING and chat_id not in self._updates:
+            del pending[:-MAX_PENDING]
+        if len(pending) >= self.every and chat_id not in self._updates:
+            # While providers are failing, don't run the fallback chain again on every message
+            failed = self._failures.get(chat_id)
+            if failed and time.monotonic() < failed[1]:
+                return
+            self._updates[chat_id] = asyncio.create_task(self._update(chat_id))
+
+    def get_update_prompt(self, summary: str, lines: list[str]) -> str:
+        return (
+            "You keep a running summary of a group chat.\n\n"
+            f"**Current Summary:**\n{summary or '(nothing yet)'}\n\n"
+            "**New Messages:**\n" + "\n".join(lines) + "\n\n"
+            f"Update the summary with the new messages in at most {SUMMARY_MAX_WORDS} words. "
+            "Keep who said or decided what, open questions and running jokes; drop small talk. "
+            "Output ONLY the updated summary."
+        )
+
+    async def _update(self, chat_id: str):
+        try:
+            # Messages arriving during the LLM call stay pending for the next round
+            lines = self.pending.get(chat_id, [])[:]
+            prompt = self.get_update_prompt(self.get(chat_id), lines)
+            summary = await self.api_client.get_text_response([{"role": "user", "content": prompt}])
+            if not summary:
+                SUMMARY_UPDATES.inc(1, ("error",))
+                self._back_off(chat_id)
+                return
+            self.summaries[chat_id] = summary.strip()
+            del self.pending[chat_id][:len(lines)]
+            self._failures.pop(chat_id, None)
+            SUMMARY_UPDATES.inc(1, ("ok",))
+        except Exception as e:
+            SUMMARY_UPDATES.inc(1, ("error",))
+            self._back_off(chat_id)
+            logger.error(f"Summary update failed for {chat_id}: {e}")
+        finally:
+            self._updates.pop(chat_id, None)
+
+    def _back_off(self, chat_id: str):
+        failures = self._failures.get(chat_id, (0, 0))[0] + 1
+        delay = min(self.retry_after * 2 ** (failures - 1), MAX_RETRY_AFTER)
+        self._failures[chat_id] = (failures, time.monotonic() + delay)
+
+    async def wait(self):
+        """Waits for running updates (tests, shutdown)."""
+        await asyncio.gather(*list(self._updates.values()), return_exceptions=True)
+
+    async def handle_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/summary: answers straight from the cached summary, no LLM call."""
+        summary = self.get(str(update.effective_chat.id))
+        if not summary:
+            await update.message.reply_text("📝 Nothing to summarize yet. Ask me again after a few more messages.")
+            return
+        await update.message.reply_text(f"📝 Chat summary:\n{summary}")
@@ -1,17 +1,61 @@
 import io
 import os
 import re
+import asyncio
 import edge_tts
-import httpx
 import logging
 import tempfile
-from rdkit import Chem
-from rdkit.Chem.Draw import rdMolDraw2D
 from telegram import Update, InputFile
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
+from modules.cache import PersistentCache
+from modules.render import get_render_pool, render_molecules, render_latex
 
 logger = logging.getLogger(__name__)
 
+# --- Molecule Rendering ---
+MOL_SIZE = 300
+MAX_MOLECULES = 12
+
+# Keyed by "<size>:<canonical SMILES>", so different spellings of a molecule share one render
+molecule_pngs = PersistentCache("molecule_png")
+# Keyed by "<bot id>:<png key>": a file_id only works for the bot that uploaded it
+molecule_file_ids = PersistentCache("molecule_file_id")
+# "<size>:<input SMILES>" -> canonical key; persisted (and LRU-bounded in memory) so a restart
+# still finds earlier renders before going to the pool
+smiles_aliases = PersistentCache("smiles_alias")
+
+# --- LaTeX Rendering ---
+LATEX_DPI = 300
+
+latex_pngs = PersistentCache("latex_png")
+latex_file_ids = PersistentCache("latex_file_id")  # "<bot id>:<png key>", like molecule_file_ids
+
+async def reply_cached_photo(message, file_ids: PersistentCache, file_key: str, load_png, caption: str):
+    """
+    Replies with a rendered image, reusing the file_id this bot got for it last
+    time. If Telegram rejects that file_id, the entry is dropped and the PNG
+    (from `load_png()`) is uploaded again, refreshing the cache.
+    """
+    file_id = file_ids.get(file_key)
+    if file_id:
+        try:
+            return await message.reply_photo(file_id, caption=caption, parse_mode='Markdown')
+        except BadRequest as e:
+            logger.warning(f"Cached file_id rejected for {file_key}, re-uploading: {e}")
+            file_ids.delete(file_key)
+
+    png = await load_png()
+    sent = await message.reply_photo(io.BytesIO(png), caption=caption, parse_mode='Markdown')
+    if sent.photo:
+        file_ids.set(file_key, sent.photo[-1].file_id)
+    return sent
+
+def normalize_latex(latex: str) -> str:
+    """Strips surrounding $ delimiters and collapses whitespace so trivial variants share a cache entry."""
+    latex = latex.strip().strip("$").strip()
+    return re.sub(r"\s+", " ", latex)
+
 async def generate_audio(text: str, voice: str) -> bytes | None:
     try:
         clean_text = re.sub(r'[*_`]', '', text)
@@ -33,25 +77,58 @@ async def generate_audio(text: str, voice: str) -> bytes | None:
 async def handle_chemistry(update: Update, context: ContextTypes.DEFAULT_TYPE):
     smiles = " ".join(context.args)
     if not smiles:
-        await update.message.reply_text("Usage: /chem <SMILES>")
+        await update.message.reply_text("Usage: /chem <SMILES> (use a.b.c to draw several)")
+        return
+
+    # Batch mode: dot-separated molecules are drawn together as one grid
+    fragments = [s for s in smiles.split(".") if s]
+    if len(fragments) > MAX_MOLECULES:
+        await update.message.reply_text(f"Too many molecules (max {MAX_MOLECULES}).")
         return
-    
+
+    alias = f"{MOL_SIZE}:{'.'.join(fragments)}"
+    key = smiles_aliases.get(alias)
+    loop = asyncio.get_running_loop()
+
+    async def load_png():
+        nonlocal key
+        png = molecule_pngs.get(key) if key else None
+        if png is None:
+            canonical, png = await loop.run_in_executor(get_render_pool(), render_molecules, fragments, MOL_SIZE)
+            key = f"{MOL_SIZE}:{'.'.join(canonical)}"
+            smiles_aliases.set(alias, key)
+            molecule_pngs.set(key, png)
+        return png
+
     try:
-        mol = Chem.MolFromSmiles(smiles)
-        if not mol: raise ValueError("Invalid SMILES")
-        drawer = rdMolDraw2D.MolDraw2DC(300, 300)
-        drawer.DrawMolecule(mol)
-        drawer.FinishDrawing()
-        png = drawer.GetDrawingText()
-        await update.message.reply_photo(io.BytesIO(png), caption=f"Structure: `{smiles}`", parse_mode='Markdown')
+        if not key:
+            await load_png()
+        await reply_cached_photo(update.message, molecule_file_ids, f"{context.bot.id}:{key}", load_png, f"Structure: `{smiles}`")
     except Exception as e:
+        logger.error(f"Chemistry render error: {e}")
         await update.message.reply_text("Could not draw molecule.")
 
 async def handle_latex(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    latex = " ".join(context.args)
+    latex = normalize_latex(" ".join(context.args))
     if not latex:
         await update.message.reply_text("Usage: /tex <formula>")
         return
-    
-    url = f"https://latex.codecogs.com/png.latex?%5Cdpi{{300}}%20{httpx.utils.quote(latex)}"
-    await update.message.reply_photo(url, caption=f"`{latex}`", parse_mode='Markdown')
+
+    key = f"{LATEX_DPI}:{latex}"
+
+    async def load_png():
+        png = latex_pngs.get(key)
+        if png is None:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(get_render_pool(), render_latex, latex, LATEX_DPI)
+            latex_pngs.set(key, png)
+        return png
+
+    try:
+        await reply_cached_photo(update.message, latex_file_ids, f"{context.bot.id}:{key}", load_png, f"`{latex}`")
+    except ValueError as e:
+        logger.warning(f"LaTeX parse error: {e}")
+        await update.message.reply_text("Could not parse that formula.")
+    except Exception as e:
+        logger.error(f"LaTeX render error: {e}")
+        await update.message.reply_text("Could not render formula.")
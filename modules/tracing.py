@@ -0,0 +1,131 @@
+import os
+import time
+import random
+import logging
+import contextvars
+from collections import deque
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fraction of updates to trace (0 disables tracing entirely) and the duration
+# above which a traced update's span tree is logged as slow.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+SLOW_UPDATE_SECONDS = float(os.environ.get("SLOW_UPDATE_SECONDS", 5))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Bot API calls made on behalf of the update being processed: a one-item list
+_api_calls = contextvars.ContextVar("api_calls", default=None)
+
+# Most recent slow traces, newest last
+slow_traces = deque(maxlen=20)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "_token")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+        self.start = self.end = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        return False
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def format(self, depth=0) -> str:
+        attrs = " ".join(f"{k}={v}" for k, v in self.attrs.items())
+        lines = [f"{'  ' * depth}{self.name} {self.duration * 1000:.1f}ms {attrs}".rstrip()]
+        for child in self.children:
+            lines.append(child.format(depth + 1))
+        return "\n".join(lines)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """Child span of the current trace; a shared no-op when this update isn't traced."""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    child = Span(name, attrs)
+    parent.children.append(child)
+    return child
+
+
+def _finish_trace(root: Span):
+    if root.duration >= SLOW_UPDATE_SECONDS:
+        slow_traces.append(root)
+        logger.warning(f"Slow update ({root.duration:.2f}s):\n{root.format()}")
+    else:
+        logger.debug(f"Trace:\n{root.format()}")
+
+
+class TracedApplication(Application):
+    """
+    Application that opens a root span around a sample of processed updates,
+    and counts the Bot API calls every update costs.
+    """
+
+    async def process_update(self, update):
+        calls = [0]
+        token = _api_calls.set(calls)
+        try:
+            return await self._process_traced(update)
+        finally:
+            _api_calls.reset(token)
+            metrics.BOT_API_CALLS_PER_UPDATE.observe(calls[0])
+
+    async def _process_traced(self, update):
+        if not TRACE_SAMPLE_RATE or random.random() >= TRACE_SAMPLE_RATE:
+            return await super().process_update(update)
+
+        attrs = {"update_id": getattr(update, "update_id", None)}
+        chat = getattr(update, "effective_chat", None)
+        if chat:
+            attrs["chat_id"] = chat.id
+        root = Span("update", attrs)
+        try:
+            with root:
+                return await super().process_update(update)
+        finally:
+            _finish_trace(root)
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest that counts every Bot API call and records it as a span of the current trace."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        metrics.BOT_API_REQUESTS.inc(1, (endpoint,))
+        calls = _api_calls.get()
+        if calls is not None:
+            calls[0] += 1
+        with span(f"bot.{endpoint}"):
+            return await super().do_request(url, method, *args, **kwargs)
@@ -0,0 +1,130 @@
+import re
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_END = object()  # Trie key marking the end of a phrase
+
+
+class TriggerMatch(NamedTuple):
+    name: str
+    start: int
+    end: int
+
+
+class TriggerRouter:
+    """
+    Routes natural-language triggers ("generate image", "explain this", ...)
+    to the module that owns them.
+
+    Every registered phrase is compiled into one regex, shaped like a trie so
+    phrases sharing a prefix share its branch, and each message is scanned
+    once in C. Only letters that start some phrase are tried, so routing cost
+    depends on the message, not on how many triggers are registered. Phrases
+    only match whole words: the "bot" trigger does not fire on "robot". The
+    same phrase may belong to several triggers; a match is reported for each.
+    """
+
+    def __init__(self):
+        self._phrases = {}  # "word word" -> trigger names, in registration order
+        self._handlers = []  # (name, handler) in registration order
+        self._pattern = None  # Compiled on the next match() after a register()
+
+    def register(self, name: str, phrases, handler=None):
+        """
+        Adds `phrases` under trigger `name`. `handler(update, context, text)`
+        gets the message with the phrases removed and returns True if it
+        handled the message; triggers without a handler are flags for match().
+        """
+        for phrase in phrases:
+            words = _WORD.findall(phrase.lower())
+            if not words:
+                continue
+            names = self._phrases.setdefault(" ".join(words), [])
+            if name not in names:
+                names.append(name)
+        if handler is not None:
+            self._handlers.append((name, handler))
+        self._pattern = None
+
+    def _compile(self):
+        trie = {}
+        for phrase in self._phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[_END] = True
+
+        def branch(node, depth=0):
+            # depth: letters of the first word consumed so far, or None once past it
+            alternatives = []
+            for char, child in node.items():
+                if char is _END:
+                    continue
+                if char == " ":
+                    alternatives.append(r"\W+" + branch(child, None))
+                else:
+                    alternatives.append(re.escape(char) + branch(child, depth + 1 if depth is not None else None))
+            body = ""
+            if alternatives:
+                body = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+                # Longer phrases are tried first; the shorter one is the fallback
+                if _END in node:
+                    body = f"(?:{body})?"
+            if depth and (_END in node or " " in node):
+                # End of the first word: it must also have started a word. Checked here rather than
+                # up front, so the cheap letter comparisons reject most candidates first.
+                body = f"(?<!\\w.{{{depth}}})" + body
+            return body
+
+        # Every phrase starts with a letter, so the regex engine skips ahead to the letters that start one
+        self._pattern = re.compile(branch(trie) + r"(?!\w)")
+        self._pattern_nocase = None
+
+    def match(self, text: str) -> list[TriggerMatch]:
+        """Leftmost-longest, non-overlapping trigger matches in `text`."""
+        if self._pattern is None:
+            if not self._phrases:
+                return []
+            self._compile()
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            found = self._pattern.finditer(lowered)
+        else:
+            # Lowercasing changed the length (rare non-ASCII case); match case-insensitively for exact spans
+            if self._pattern_nocase is None:
+                self._pattern_nocase = re.compile(self._pattern.pattern, re.IGNORECASE)
+            found = self._pattern_nocase.finditer(text)
+        return [
+            TriggerMatch(name, match.start(), match.end())
+            for match in found
+            for name in self._phrases[" ".join(_WORD.findall(match.group().lower()))]
+        ]
+
+    @staticmethod
+    def strip(text: str, matches: list[TriggerMatch], name: str) -> str:
+        """`text` without the phrases that matched trigger `name`."""
+        parts = []
+        last = 0
+        for match in matches:
+            if match.name == name:
+                parts.append(text[last:match.start])
+                last = match.end
+        parts.append(text[last:])
+        return " ".join("".join(parts).split())
+
+    async def dispatch(self, update, context, text: str, matches: list[TriggerMatch]) -> bool:
+        """Runs the handlers of matched triggers in registration order until one handles the message."""
+        if not matches:
+            return False
+        matched = {match.name for match in matches}
+        for name, handler in self._handlers:
+            if name in matched and await handler(update, context, self.strip(text, matches, name)):
+                return True
+        return False
+
+
+# Shared router for master_text_handler; modules register their triggers at import
+router = TriggerRouter()
@@ -1,16 +1,84 @@
 import logging
 import json
 import re
+import time
 import asyncio
+from collections import deque
 from telegram import Update
 from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from modules.question_bank import QuestionBank, normalize_question
+from modules.leaderboard import Leaderboard, GLOBAL_SCOPE
+from modules.state import StateMap
 
 logger = logging.getLogger(__name__)
 
+POLL_SECONDS = 30
+QUESTION_RETRIES = 3
+# Failed send_poll calls (e.g. the bot was removed from the chat) before the game is ended
+SEND_RETRIES = 3
+DEFAULT_DIFFICULTY = "hard"
+# Answers can trail the poll's close by a little; after that the index entry is dropped
+POLL_GRACE_SECONDS = 60
+
+# Background refill keeps this many questions in stock for the most played topics
+REFILL_TOPICS = 5
+REFILL_TARGET = 30
+REFILL_BATCH = 10
+
+def parse_questions(resp: str | None) -> list[dict]:
+    """
+    Extracts trivia questions from an LLM reply and keeps only the valid ones.
+
+    Accepts a JSON array, an object with a "questions" array, or a single
+    question object. Each question must have a non-empty 'question', exactly
+    four distinct 'options' and an integer 'correct_index' in 0-3, within
+    Telegram's poll length limits.
+    """
+    if not resp:
+        return []
+    match = re.search(r"[\[{].*[\]}]", resp, re.DOTALL)
+    if not match:
+        return []
+    try:
+        data = json.loads(match.group())
+    except json.JSONDecodeError:
+        return []
+    if isinstance(data, dict):
+        data = data.get("questions", [data])
+    if not isinstance(data, list):
+        return []
+
+    valid = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        question = item.get("question")
+        options = item.get("options")
+        correct = item.get("correct_index")
+        if not isinstance(question, str) or not question.strip() or len(question) > 280:
+            continue
+        if not isinstance(options, list) or len(options) != 4:
+            continue
+        if not all(isinstance(o, str) and o.strip() and len(o) <= 100 for o in options):
+            continue
+        if len({o.strip().lower() for o in options}) != 4:
+            continue
+        if isinstance(correct, bool) or not isinstance(correct, int) or not 0 <= correct <= 3:
+            continue
+        valid.append({"question": question.strip(), "options": [o.strip() for o in options], "correct_index": correct})
+    return valid
+
 class TriviaManager:
-    def __init__(self, api_client):
+    def __init__(self, api_client, bank=None, leaderboard=None, polls=None):
         self.sessions = {} # {chat_id: session_data}
         self.api_client = api_client
+        self.bank = bank or QuestionBank()
+        self.leaderboard = leaderboard or Leaderboard()
+        # {poll_id: (chat_id, correct_index, expires_at)}; shared so a shard
+        # front process can route poll answers, which carry no chat id
+        self.polls = StateMap("trivia_polls") if polls is None else polls
+        self._poll_expiry = deque()  # (expires_at, poll_id) in the order polls were sent
 
     async def start_trivia(self, update: Update, context: ContextTypes.DEFAULT_TYPE, topic: str, q_count: int):
         chat_id = str(update.effective_chat.id)
@@ -26,12 +94,17 @@ class TriviaManager:
         self.sessions[chat_id] = {
             "state": "registering",
             "topic": topic,
+            "difficulty": DEFAULT_DIFFICULTY,
             "total_questions": q_count,
             "current_question": 0,
             "players": {},
             "reg_msg_id": intro.message_id,
-            "asked": []
+            "asked": [],
+            "queue": deque()
         }
+        self.bank.record_play(topic, DEFAULT_DIFFICULTY)
+        # Fill the whole round while players register
+        self.sessions[chat_id]["prefetch"] = asyncio.create_task(self._fill_queue(chat_id))
 
     async def handle_registration(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         chat_id = str(update.effective_chat.id)
@@ -61,57 +134,185 @@ class TriviaManager:
         
         return False
 
+    async def generate_questions(self, topic: str, count: int, exclude: set[str], difficulty: str = DEFAULT_DIFFICULTY) -> list[dict]:
+        """Generates up to `count` new questions in one structured call, retrying a bounded number of times."""
+        questions = []
+        seen = set(exclude)
+        for attempt in range(QUESTION_RETRIES):
+            needed = count - len(questions)
+            if needed <= 0:
+                break
+            prompt = [
+                {"role": "system", "content": "You are a trivia host. Reply with JSON only."},
+                {"role": "user", "content": f"Generate {needed} different {difficulty} multiple choice questions about {topic}. "
+                                          f"Format: a JSON array of objects with keys 'question', 'options' (list of 4), 'correct_index' (0-3)."}
+            ]
+            resp = await self.api_client.get_text_response(prompt)
+            for question in parse_questions(resp):
+                key = normalize_question(question["question"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                questions.append(question)
+            if len(questions) < count:
+                logger.warning(f"Trivia generation attempt {attempt + 1}: got {len(questions)}/{count} valid questions")
+        return questions[:count]
+
+    async def _fill_queue(self, chat_id: str):
+        session = self.sessions.get(chat_id)
+        if not session:
+            return
+        needed = session["total_questions"] - session["current_question"] - len(session["queue"])
+        if needed <= 0:
+            return
+        exclude = {normalize_question(q) for q in session["asked"]}
+        exclude.update(normalize_question(q["question"]) for q in session["queue"])
+
+        # Serve from the bank first; only generate live when stock runs out
+        stocked = self.bank.take(chat_id, session["topic"], session["difficulty"], needed, exclude)
+        session["queue"].extend(stocked)
+        needed -= len(stocked)
+        if needed <= 0:
+            return
+        exclude.update(normalize_question(q["question"]) for q in stocked)
+        # The bank drops duplicates of what it already holds, so asking for those would waste the call
+        exclude.update(self.bank.norms(session["topic"]))
+        try:
+            fresh = await self.generate_questions(session["topic"], needed, exclude, session["difficulty"])
+            session["queue"].extend(self.bank.add_questions(session["topic"], session["difficulty"], fresh))
+        except Exception as e:
+            logger.error(f"Trivia generation error: {e}")
+
+    async def refill_popular_topics(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background job that keeps the most played topics stocked in the question bank."""
+        for topic, difficulty in self.bank.popular_topics(REFILL_TOPICS):
+            missing = REFILL_TARGET - self.bank.stock(topic, difficulty)
+            if missing <= 0:
+                continue
+            try:
+                fresh = await self.generate_questions(topic, min(missing, REFILL_BATCH), self.bank.norms(topic), difficulty)
+                added = self.bank.add_questions(topic, difficulty, fresh)
+                logger.info(f"Trivia bank: stocked {len(added)} questions for '{topic}' ({difficulty})")
+            except Exception as e:
+                logger.error(f"Trivia refill error for '{topic}': {e}")
+
+    async def _next_question(self, chat_id: str) -> dict | None:
+        session = self.sessions[chat_id]
+        if not session["queue"]:
+            prefetch = session.get("prefetch")
+            if prefetch and not prefetch.done():
+                await prefetch
+            if not session["queue"]:
+                await self._fill_queue(chat_id)
+        return session["queue"].popleft() if session["queue"] else None
+
     async def ask_question(self, context: ContextTypes.DEFAULT_TYPE, chat_id: str):
         session = self.sessions.get(chat_id)
         if not session or session["current_question"] >= session["total_questions"]:
             await self.end_game(context, chat_id)
             return
 
-        session["current_question"] += 1
-        
-        # Get question from AI
-        prompt = [
-            {"role": "system", "content": "You are a trivia host. Generate JSON."},
-            {"role": "user", "content": f"Generate 1 hard multiple choice question about {session['topic']}. "
-                                      f"Format: JSON with keys 'question', 'options' (list of 4), 'correct_index' (0-3). "
-                                      f"Avoid these previous questions: {session['asked']}"}
-        ]
-        
-        resp = await self.api_client.get_text_response(prompt)
-        # Simple parsing (in production, add robust JSON extraction)
-        try:
-            data = json.loads(re.search(r'\{.*\}', resp, re.DOTALL).group())
-            session["current_correct"] = data['correct_index']
-            session["asked"].append(data['question'])
-            
-            message = await context.bot.send_poll(
-                chat_id=int(chat_id),
-                question=f"Q{session['current_question']}: {data['question']}",
-                options=data['options'],
-                type='quiz',
-                correct_option_id=data['correct_index'],
-                open_period=30,
-                is_anonymous=False
-            )
-            session["poll_id"] = message.poll.id
-        except Exception as e:
-            logger.error(f"Trivia error: {e}")
-            await context.bot.send_message(int(chat_id), "Error generating question. Skipping...")
-            await self.ask_question(context, chat_id)
+        failures = 0
+        while True:
+            data = await self._next_question(chat_id)
+            if not data:
+                await context.bot.send_message(int(chat_id), "Couldn't come up with more questions. Ending the game!")
+                await self.end_game(context, chat_id)
+                return
+
+            session["current_question"] += 1
+            try:
+                message = await context.bot.send_poll(
+                    chat_id=int(chat_id),
+                    question=f"Q{session['current_question']}: {data['question']}",
+                    options=data['options'],
+                    type='quiz',
+                    correct_option_id=data['correct_index'],
+                    open_period=POLL_SECONDS,
+                    is_anonymous=False
+                )
+                break
+            except Exception as e:
+                logger.error(f"Trivia error: {e}")
+                session["current_question"] -= 1  # Skip the question, not the round
+                failures += 1
+                if failures >= SEND_RETRIES:
+                    logger.warning(f"Trivia: ending the game in {chat_id} after {failures} failed polls")
+                    await self.end_game(context, chat_id)
+                    return
+
+        session["current_correct"] = data['correct_index']
+        session["asked"].append(data['question'])
+        if "id" in data:
+            self.bank.mark_seen(chat_id, [data["id"]])
+        session["poll_id"] = message.poll.id
+        self.index_poll(message.poll.id, chat_id, data['correct_index'])
+
+        # Top the queue back up while this poll is open
+        if not session["queue"] and session["current_question"] < session["total_questions"]:
+            session["prefetch"] = asyncio.create_task(self._fill_queue(chat_id))
+
+        # Ask the next question as soon as this poll closes
+        if context.job_queue:
+            context.job_queue.run_once(self._next_question_job, when=POLL_SECONDS, data={'chat_id': chat_id}, name=f"trivia_{chat_id}")
+
+    async def _next_question_job(self, context: ContextTypes.DEFAULT_TYPE):
+        await self.ask_question(context, context.job.data['chat_id'])
+
+    def index_poll(self, poll_id: str, chat_id: str, correct_index: int):
+        """Routes answers for `poll_id` to its chat until shortly after the poll closes."""
+        now = time.time()
+        while self._poll_expiry and self._poll_expiry[0][0] <= now:
+            _, expired = self._poll_expiry.popleft()
+            self.polls.pop(expired, None)
+        expires_at = now + POLL_SECONDS + POLL_GRACE_SECONDS
+        self.polls[poll_id] = (chat_id, correct_index, expires_at)
+        self._poll_expiry.append((expires_at, poll_id))
 
     async def handle_poll_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        # Logic to update scores based on poll answers
-        # Note: Telegram Poll API handles correctness, we just track score
         answer = update.poll_answer
-        # Find session by poll_id implies searching all sessions (simplified here)
-        # For production, map poll_id -> chat_id
-        pass 
+        entry = self.polls.get(answer.poll_id)
+        if not entry or entry[2] <= time.time():
+            return
+        chat_id, correct_index, _ = entry
+        session = self.sessions.get(chat_id)
+        if not session or not answer.user:
+            return
+
+        player = session["players"].get(answer.user.id)
+        if not player or list(answer.option_ids) != [correct_index]:
+            return
+
+        player["score"] += 1
+        self.leaderboard.add_points(chat_id, answer.user.id, answer.user.first_name)
+        self.leaderboard.add_points(GLOBAL_SCOPE, answer.user.id, answer.user.first_name)
+
+    async def show_leaderboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = str(update.effective_chat.id)
+
+        def format_board(entries):
+            # Names go into a Markdown message; an unescaped _ or * would make Telegram reject it
+            return "\n".join(
+                f"{rank}. {escape_markdown(name)}: {score}" for rank, (score, _, name) in enumerate(entries, start=1)
+            )
+
+        chat_top = self.leaderboard.top(chat_id)
+        global_top = self.leaderboard.top(GLOBAL_SCOPE, 5)
+        text = "🏆 **LEADERBOARD** 🏆\n\n" + (format_board(chat_top) or "No scores in this chat yet.")
+        if global_top:
+            text += "\n\n🌍 **Global Top 5**\n" + format_board(global_top)
+        await update.message.reply_text(text, parse_mode='Markdown')
 
     async def end_game(self, context, chat_id):
-        session = self.sessions.get(chat_id)
+        session = self.sessions.pop(chat_id, None)
         if not session: return
+        prefetch = session.get("prefetch")
+        if prefetch and not prefetch.done():
+            prefetch.cancel()
         
         scores = sorted(session["players"].items(), key=lambda x: x[1]['score'], reverse=True)
-        text = "🏆 **FINAL SCORES** 🏆\n\n" + "\n".join([f"{p['name']}: {p['score']}" for _, p in scores])
-        await context.bot.send_message(int(chat_id), text, parse_mode='Markdown')
-        del self.sessions[chat_id]
+        text = "🏆 **FINAL SCORES** 🏆\n\n" + "\n".join([f"{escape_markdown(p['name'])}: {p['score']}" for _, p in scores])
+        try:
+            await context.bot.send_message(int(chat_id), text, parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Trivia error: {e}")
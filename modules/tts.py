@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+import httpx
+import edge_tts
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Premium TTS API (OpenAI-style /audio/speech); Edge TTS needs no key
+TTS_API_URL = os.environ.get("TTS_API_URL")
+TTS_API_KEY = os.environ.get("TTS_API_KEY")
+
+# Speak-mode audio gives up after this long (the reply then goes out as text)
+TTS_DEADLINE = float(os.environ.get("TTS_DEADLINE", 15))
+# The backup engine starts once the preferred one has run this long (or
+# 1.5x its usual latency, if that is longer) without finishing
+TTS_HEDGE_AFTER = float(os.environ.get("TTS_HEDGE_AFTER", 4))
+DEFAULT_EDGE_VOICE = "en-US-GuyNeural"
+
+SPOOL_BYTES = 1 << 20  # Audio is kept in memory up to 1 MB, then spills to disk
+EWMA_ALPHA = 0.2
+# While the preferred engine is skipped as unhealthy, every Nth request races it again
+PROBE_EVERY = 10
+
+TTS_LATENCY = metrics.Histogram("tts_seconds", "Time to synthesize speech, by engine", ("engine",))
+TTS_RESULTS = metrics.Counter("tts_requests_total", "Speech synthesis attempts by engine and outcome", ("engine", "outcome"))
+
+
+class TTSError(Exception):
+    pass
+
+
+_client = None
+
+
+def _http() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=TTS_DEADLINE)
+    return _client
+
+
+async def premium_engine(text: str, voice: str, out, emotion: str = "energetic"):
+    """Streams speech from the TTS API into `out` as it arrives."""
+    headers = {"Authorization": f"Bearer {TTS_API_KEY}", "Content-Type": "application/json"}
+    payload = {
+        "model": "tts-1",
+        "input": text,
+        "voice": voice or "ash",
+        "prompt": f"{emotion}, expressive, warm",
+        "voice_metadata": {
+            "emotion": emotion,
+            "intensity": 5,
+            "pacing": "normal",
+            "vocal_traits": "expressive, warm"
+        }
+    }
+    async with _http().stream("POST", TTS_API_URL, json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise TTSError(f"TTS API error: {response.status_code} - {body[:200]!r}")
+        async for chunk in response.aiter_bytes():
+            out.write(chunk)
+
+
+async def edge_engine(text: str, voice: str, out):
+    """Streams speech from Edge TTS into `out`."""
+    async for chunk in edge_tts.Communicate(text, voice or DEFAULT_EDGE_VOICE).stream():
+        if chunk["type"] == "audio":
+            out.write(chunk["data"])
+
+
+def default_engines() -> dict:
+    """Configured engines, most preferred first."""
+    engines = {}
+    if TTS_API_URL and TTS_API_KEY:
+        engines["premium"] = premium_engine
+    engines["edge"] = edge_engine
+    return engines
+
+
+class EngineStats:
+    """Exponentially weighted latency (successful runs) and failure rate of one engine."""
+
+    def __init__(self):
+        self.latency = 0.0  # 0 until the first measurement
+        self.failure = 0.0
+
+    def _observe(self, seconds: float):
+        self.latency = seconds if not self.latency else self.latency + EWMA_ALPHA * (seconds - self.latency)
+
+    def record(self, seconds: float, ok: bool):
+        if ok:
+            self._observe(seconds)
+        self.failure += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.failure)
+
+    def record_cancelled(self, seconds: float):
+        # A cancelled run took at least `seconds`; only that lower bound is known
+        if seconds > self.latency:
+            self._observe(seconds)
+
+
+class TTSOrchestrator:
+    """
+    Picks or races TTS engines on live latency.
+
+    The preferred engine (premium, when configured) starts first. If it has
+    not finished by its hedge delay, or fails, the next engine starts too, and
+    the first audio to finish wins; the rest are cancelled. An engine that is
+    failing or slower than the deadline is skipped, except for a periodic
+    probe that races it again so its stats can recover. Nothing is returned
+    after TTS_DEADLINE, so speak-mode replies have bounded latency.
+    """
+
+    def __init__(self, engines=None, deadline: float = TTS_DEADLINE, hedge_after: float = TTS_HEDGE_AFTER):
+        self.engines = engines if engines is not None else default_engines()
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.stats = {name: EngineStats() for name in self.engines}
+        self._skipped = 0
+
+    def plan(self) -> list[tuple[str, float]]:
+        """(engine, hedge delay) pairs for the next request."""
+        names = list(self.engines)
+        preferred = self.stats[names[0]]
+        if len(names) > 1 and (preferred.failure >= 0.5 or preferred.latency >= self.deadline):
+            self._skipped += 1
+            if self._skipped % PROBE_EVERY:
+                return [(name, 0.0) for name in names[1:]]
+            return [(name, 0.0) for name in names]
+        hedge = max(self.hedge_after, preferred.latency * 1.5)
+        return [(names[0], 0.0)] + [(name, hedge) for name in names[1:]]
+
+    async def synthesize(self, text: str, voices: dict):
+        """
+        Returns (engine, audio file positioned at 0) or None. `voices` maps
+        engine names to their voice. The caller closes the file.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        failed = asyncio.Event()  # lets a waiting backup start as soon as another engine fails
+
+        async def attempt(name, delay):
+            if delay:
+                try:
+                    await asyncio.wait_for(failed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            out = tempfile.SpooledTemporaryFile(SPOOL_BYTES)
+            start = time.perf_counter()
+            try:
+                await self.engines[name](text, voices.get(name), out)
+                if out.tell() == 0:
+                    raise TTSError("no audio returned")
+            except asyncio.CancelledError:
+                out.close()
+                self.stats[name].record_cancelled(time.perf_counter() - start)
+                TTS_RESULTS.inc(1, (name, "cancelled"))
+                raise
+            except Exception as e:
+                out.close()
+                self.stats[name].record(time.perf_counter() - start, ok=False)
+                TTS_RESULTS.inc(1, (name, "error"))
+                logger.warning(f"TTS engine {name} failed: {e}")
+                failed.set()
+                raise
+            elapsed = time.perf_counter() - start
+            self.stats[name].record(elapsed, ok=True)
+            TTS_LATENCY.observe(elapsed, (name,))
+            out.seek(0)
+            return out
+
+        tasks = {asyncio.create_task(attempt(name, delay)): name for name, delay in self.plan()}
+        winner = None
+        try:
+            pending = set(tasks)
+            while pending and winner is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if winner is None and not task.exception():
+                        winner = task
+            if winner is None:
+                logger.warning(f"TTS: no engine produced audio within {self.deadline}s")
+                return None
+            TTS_RESULTS.inc(1, (tasks[winner], "won"))
+            return tasks[winner], winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif task is not winner and not task.cancelled() and not task.exception():
+                    task.result().close()  # finished in the same instant as the winner
+
+    async def aclose(self):
+        global _client
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+
+# Shared by speak mode
+orchestrator = TTSOrchestrator()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached admin roster.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, Forbidden
+
+from modules import admin
+from modules.admin import AdminRoster, _moderate_many, collect_targets
+
+
+class FakeBot:
+    def __init__(self, admin_ids):
+        self.admin_ids = admin_ids
+        self.calls = 0
+
+    async def get_chat_administrators(self, chat_id):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return [SimpleNamespace(user=SimpleNamespace(id=i)) for i in self.admin_ids]
+
+
+def member_update(chat_id, user_id, status):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id),
+                           new_chat_member=SimpleNamespace(user=SimpleNamespace(id=user_id), status=status))
+
+
+def test_admin_checks_hit_the_api_once():
+    bot = FakeBot({1, 2})
+    roster = AdminRoster(ttl=60)
+
+    async def run():
+        checks = await asyncio.gather(*[roster.is_admin(bot, -100, uid) for uid in (1, 2, 3, 1)])
+        checks.append(await roster.is_admin(bot, -100, 2))
+        return checks
+
+    assert asyncio.run(run()) == [True, True, False, True, True]
+    assert bot.calls == 1
+
+
+def test_member_updates_patch_the_roster():
+    bot = FakeBot({1})
+    roster = AdminRoster(ttl=60)
+    asyncio.run(roster.get_admins(bot, -100))
+
+    roster.apply_member_update(member_update(-100, 5, "administrator"))
+    roster.apply_member_update(member_update(-100, 1, "member"))
+    assert asyncio.run(roster.get_admins(bot, -100)) == {5}
+    assert bot.calls == 1
+
+
+def test_one_failed_target_does_not_sink_the_others():
+    async def ban(user_id):
+        if user_id == 2:
+            raise Forbidden("bot can't restrict the chat owner")
+        if user_id == 3:
+            raise BadRequest("User not found")
+
+    done, failed = asyncio.run(_moderate_many({1: "Ana", 2: "Ben", 3: "Cy"}, ban))
+    assert done == ["Ana"]
+    assert failed == ["Ben (bot can't restrict the chat owner)", "Cy (User not found)"]
+
+
+def test_usernames_are_reported_not_silently_dropped():
+    message = SimpleNamespace(reply_to_message=None, parse_entities=lambda types: {})
+    targets, usernames = collect_targets(SimpleNamespace(message=message), SimpleNamespace(args=["42", "@spammer"]))
+    assert targets == {42: "42"}
+    assert usernames == ["@spammer"]
+
+
+def test_profiler_needs_an_owner_not_a_chat_admin(monkeypatch):
+    from modules import profiler
+    monkeypatch.setattr(admin, "BOT_OWNER_IDS", {42})
+    replies = []
+
+    async def reply_text(text):
+        replies.append(text)
+
+    def update(user_id):
+        return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=SimpleNamespace(reply_text=reply_text))
+
+    async def chat_admin(update, context):
+        return True
+
+    monkeypatch.setattr(admin, "is_admin", chat_admin)
+    asyncio.run(profiler.handle_profile(update(7), SimpleNamespace(args=[])))
+    assert replies == ["🚫 Bot owners only."]
+    assert admin.is_owner(update(42))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite-backed cache and single-flight helper.
+"""
+
+import asyncio
+import time
+
+from modules.cache import PersistentCache, SingleFlight
+
+
+def test_values_survive_a_new_cache_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    PersistentCache("captions", path=path).set("blip:AQADxyz", "a cat wearing sunglasses")
+
+    cache = PersistentCache("captions", path=path)
+    assert cache.get("blip:AQADxyz") == "a cat wearing sunglasses"
+    assert PersistentCache("other", path=path).get("blip:AQADxyz") is None
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = PersistentCache("short", ttl=0.05, path=str(tmp_path / "cache.sqlite3"))
+    cache.set("k", b"\x89PNG")
+    assert cache.get("k") == b"\x89PNG"
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_single_flight_runs_work_once():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "caption"
+
+    async def run():
+        flights = SingleFlight()
+        return await asyncio.gather(*[flights.do("photo", work) for _ in range(5)])
+
+    assert asyncio.run(run()) == ["caption"] * 5
+    assert len(calls) == 1
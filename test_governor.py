@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the load governor's tiers and hysteresis (no Telegram needed).
+"""
+
+from modules import metrics
+from modules.governor import LoadGovernor, NORMAL, REDUCED, ESSENTIAL
+
+
+def test_highest_signal_sets_the_level_at_once():
+    governor = LoadGovernor(cooldown=30)
+    assert governor.update(0.01, 2, 0.0, now=0) == NORMAL
+    assert governor.update(0.2, 2, 0.0, now=1) == REDUCED
+    assert governor.update(0.01, 20, 0.0, now=2) == ESSENTIAL
+    assert not governor.allows("decision")
+    assert not governor.allows("reaction")
+
+
+def test_level_steps_down_only_after_a_calm_cooldown():
+    governor = LoadGovernor(cooldown=30)
+    governor.update(0.8, 0, 0.0, now=0)
+    # Below the entry threshold but not below half of it: no calm yet
+    assert governor.update(0.3, 0, 0.0, now=10) == ESSENTIAL
+    assert governor.update(0.3, 0, 0.0, now=100) == ESSENTIAL
+    assert governor.update(0.01, 0, 0.0, now=101) == ESSENTIAL
+    assert governor.update(0.01, 0, 0.0, now=120) == ESSENTIAL
+    # One step per cooldown
+    assert governor.update(0.01, 0, 0.0, now=131) == REDUCED
+    assert governor.update(0.01, 0, 0.0, now=150) == REDUCED
+    assert governor.update(0.01, 0, 0.0, now=161) == NORMAL
+
+
+def test_spike_during_cooldown_restarts_it():
+    governor = LoadGovernor(cooldown=30)
+    governor.update(0.2, 0, 0.0, now=0)
+    governor.update(0.01, 0, 0.0, now=1)
+    governor.update(0.07, 0, 0.0, now=20)  # not calm
+    assert governor.update(0.01, 0, 0.0, now=35) == REDUCED
+    assert governor.update(0.01, 0, 0.0, now=66) == NORMAL
+
+
+def test_reduced_level_pauses_and_scales_features():
+    governor = LoadGovernor()
+    governor.update(0.2, 0, 0.0, now=0)
+    assert not governor.allows("random_chat")
+    assert governor.allows("decision")
+    kept = sum(governor.allows("reaction") for _ in range(2000))
+    assert 300 < kept < 700
+
+
+def test_error_rate_comes_from_recent_llm_outcomes():
+    governor = LoadGovernor()
+    governor.sample()
+    metrics.LLM_REQUESTS.inc(3, ("test", "ok"))
+    metrics.LLM_REQUESTS.inc(7, ("test", "error"))
+    assert governor.sample() == ESSENTIAL
+    assert governor.signals["error_rate"] == 0.7
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the aiohttp health/webhook server.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from keep_alive import create_web_app, WEBHOOK_PATH, SECRET_HEADER
+
+
+def run_with_client(web_app, scenario):
+    async def run():
+        async with TestClient(TestServer(web_app)) as client:
+            return await scenario(client)
+    return asyncio.run(run())
+
+
+def test_health_endpoints():
+    async def scenario(client):
+        return [(await client.get(path)).status for path in ("/", "/health")]
+
+    assert run_with_client(create_web_app(), scenario) == [200, 200]
+
+
+def test_webhook_requires_secret_and_queues_updates():
+    queue = asyncio.Queue()
+    application = SimpleNamespace(update_queue=queue, bot=None)
+    update = {"update_id": 42}
+
+    async def scenario(client):
+        rejected = await client.post(WEBHOOK_PATH, json=update, headers={SECRET_HEADER: "wrong"})
+        accepted = await client.post(WEBHOOK_PATH, json=update, headers={SECRET_HEADER: "s3cret"})
+        return rejected.status, accepted.status, queue.qsize()
+
+    rejected, accepted, queued = run_with_client(create_web_app(application, "s3cret"), scenario)
+    assert (rejected, accepted, queued) == (403, 200, 1)
+
+
+def test_each_hosted_bot_gets_its_own_webhook_path():
+    primary = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+    sage = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+
+    async def scenario(client):
+        await client.post(f"{WEBHOOK_PATH}/sage", json={"update_id": 1}, headers={SECRET_HEADER: "s3cret"})
+        return primary.update_queue.qsize(), sage.update_queue.qsize()
+
+    web_app = create_web_app(webhooks={WEBHOOK_PATH: primary, f"{WEBHOOK_PATH}/sage": sage}, secret_token="s3cret")
+    assert run_with_client(web_app, scenario) == (0, 1)
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    from modules import metrics
+    with metrics.stage("decision"):
+        pass
+
+    async def scenario(client):
+        resp = await client.get("/metrics")
+        return resp.status, await resp.text()
+
+    status, body = run_with_client(create_web_app(), scenario)
+    assert status == 200
+    assert 'bot_stage_seconds_count{stage="decision"}' in body
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the Bytez media job queue: limits, single-flight and cancellation.
+Uses a fake Bytez client, so no API key or network is needed.
+"""
+
+import asyncio
+import threading
+import time
+
+from modules.media_jobs import MediaJobQueue, MediaJobCancelled
+
+
+class FakeResult:
+    def __init__(self, output):
+        self.output = output
+        self.error = None
+
+
+class FakeModel:
+    def __init__(self, client, model_id):
+        self.client = client
+        self.model_id = model_id
+
+    def run(self, payload):
+        with self.client.lock:
+            self.client.calls.append(payload)
+            self.client.active += 1
+            self.client.peak = max(self.client.peak, self.client.active)
+        time.sleep(self.client.delay)
+        with self.client.lock:
+            self.client.active -= 1
+        return FakeResult(f"{self.model_id}:{payload}")
+
+
+class FakeClient:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.models_created = 0
+
+    def model(self, model_id):
+        self.models_created += 1
+        return FakeModel(self, model_id)
+
+
+def make_queue(client, **kwargs):
+    return MediaJobQueue(lambda: client, workers={"image": 4, "video": 1}, **kwargs)
+
+
+def test_identical_prompts_share_one_job():
+    client = FakeClient()
+    queue = make_queue(client)
+
+    async def run():
+        return await asyncio.gather(*[queue.submit(user, "image", "sdxl", "a cat") for user in (1, 2, 3)])
+
+    results = asyncio.run(run())
+    assert [r.output for r in results] == ["sdxl:a cat"] * 3
+    assert client.calls == ["a cat"]
+    assert client.models_created == 1
+
+
+def test_limits_and_queue_positions():
+    client = FakeClient()
+    queue = make_queue(client, max_global=2, max_per_user=1)
+    positions = []
+
+    async def run():
+        async def record(position):
+            positions.append(position)
+        jobs = [queue.submit(1, "image", "sdxl", "one"),
+                queue.submit(1, "image", "sdxl", "two", on_position=record),
+                queue.submit(2, "image", "sdxl", "three")]
+        return await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    assert client.peak <= 2
+    # User 1's second job waits behind their first, then starts
+    assert positions[0] >= 1 and positions[-1] == 0
+
+
+def test_cancel_queued_job():
+    client = FakeClient(delay=0.1)
+    queue = make_queue(client, max_global=1)
+
+    async def run():
+        first = asyncio.create_task(queue.submit(1, "video", "t2v", "first"))
+        second = asyncio.create_task(queue.submit(2, "video", "t2v", "second"))
+        await asyncio.sleep(0.01)
+        assert queue.cancel_user(2) == 1
+        await first
+        try:
+            await second
+        except MediaJobCancelled:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    assert client.calls == ["first"]
+
+
+def test_cancel_detaches_only_that_user_from_a_shared_job():
+    client = FakeClient(delay=0.1)
+    queue = make_queue(client)
+    positions = {1: [], 2: []}
+
+    def tracker(user):
+        async def on_position(position):
+            positions[user].append(position)
+        return on_position
+
+    async def run():
+        first = asyncio.create_task(queue.submit(1, "image", "vlm", "photo-url", tracker(1), dedupe_key="photo"))
+        second = asyncio.create_task(queue.submit(2, "image", "vlm", "photo-url", tracker(2), dedupe_key="photo"))
+        await asyncio.sleep(0.01)
+        assert queue.cancel_user(1) == 1
+        try:
+            await first
+            cancelled = False
+        except MediaJobCancelled:
+            cancelled = True
+        return cancelled, (await second).output
+
+    assert asyncio.run(run()) == (True, "vlm:photo-url")
+    assert client.calls == ["photo-url"]
+    assert positions[2] == [0]
+
+
+def test_running_jobs_and_notifiers_are_held_until_done():
+    client = FakeClient(delay=0.05)
+    queue = make_queue(client, max_global=1)
+    held = []
+
+    async def on_position(position):
+        held.append(len(queue._tasks))
+
+    async def run():
+        jobs = [asyncio.ensure_future(queue.submit(1, "image", "sdxl", p, on_position=on_position)) for p in ("a", "b")]
+        await asyncio.sleep(0.01)
+        assert queue._tasks  # the running job (and its notifiers) are referenced by the queue
+        await asyncio.gather(*jobs)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert held and queue._tasks == set()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-chat memory context cache and batched recall.
+"""
+
+from ai.memory_context import ChatMemoryContext
+from ai.memory_manager import MemoryManager
+
+
+class CountingMemory(MemoryManager):
+    def __init__(self, name):
+        super().__init__(db_path=":memory:", embeddings="hash", collection_name=f"test_memory_context_{name}")
+        self.queries = 0
+
+    def get_memories_for_users(self, user_ids, query_text, limit=3):
+        self.queries += 1
+        return super().get_memories_for_users(user_ids, query_text, limit)
+
+
+def test_one_query_fetches_every_recent_speaker():
+    memory = MemoryManager(db_path=":memory:", embeddings="hash", collection_name="test_batch_recall")
+    memory.add_memory(1, "Ana", "Lives in Pune and loves chai")
+    memory.add_memory(2, "Ben", "Supports Chennai in the cricket league")
+    memory.add_memory(3, "Cy", "Never talks in this chat")
+
+    found = memory.get_memories_for_users([1, 2], "chai in Pune")
+    assert found == {"1": ["Lives in Pune and loves chai"], "2": ["Supports Chennai in the cricket league"]}
+
+
+def test_conversation_reuses_context_and_sees_other_speakers():
+    memory = CountingMemory("conversation")
+    memory.add_memory(1, "Ana", "Lives in Pune and loves chai")
+    memory.add_memory(2, "Ben", "Supports Chennai in the cricket league")
+    context = ChatMemoryContext(memory)
+
+    context.observe("-100", 1, "Ana")
+    context.observe("-100", 2, "Ben")
+    own, others = context.get("-100", 1, "who is watching the match")
+    assert own == "- Lives in Pune and loves chai"
+    assert others == "- Ben: Supports Chennai in the cricket league"
+
+    own, others = context.get("-100", 2, "lol same")
+    assert own == "- Supports Chennai in the cricket league"
+    assert "Ana: Lives in Pune" in others
+    assert memory.queries == 1
+
+
+def test_new_facts_and_forget_invalidate_the_chat():
+    memory = CountingMemory("invalidate")
+    memory.add_memory(1, "Ana", "Lives in Pune and loves chai")
+    context = ChatMemoryContext(memory)
+    context.observe("-100", 1, "Ana")
+    context.get("-100", 1, "chai")
+
+    memory.add_memory(1, "Ana", "Started learning the guitar")
+    own, _ = context.get("-100", 1, "chai")
+    assert "guitar" in own
+    assert memory.queries == 2
+
+    memory.forget_user(1)
+    assert context.get("-100", 1, "chai") == ("", "")
+    assert memory.queries == 3
+
+
+def test_context_expires_and_keeps_only_recent_speakers():
+    memory = CountingMemory("expiry")
+    context = ChatMemoryContext(memory, ttl=0)
+    context.observe("-100", 1, "Ana")
+    context.get("-100", 1, "hi")
+    context.get("-100", 1, "hi")
+    assert memory.queries == 2
+
+    context = ChatMemoryContext(memory, max_speakers=2)
+    for user_id, name in ((1, "Ana"), (2, "Ben"), (3, "Cy")):
+        context.observe("-100", user_id, name)
+    assert list(context.speakers["-100"]) == ["2", "3"]
+
+
+def test_facts_about_other_users_keep_the_cache():
+    memory = CountingMemory("unrelated")
+    memory.add_memory(1, "Ana", "Lives in Pune and loves chai")
+    context = ChatMemoryContext(memory)
+    context.observe("-100", 1, "Ana")
+    context.get("-100", 1, "chai")
+
+    memory.add_memory(9, "Zed", "Talks only in another chat")
+    context.get("-100", 1, "chai")
+    assert memory.queries == 1
+
+
+def test_fetch_racing_an_invalidation_is_not_stored():
+    memory = CountingMemory("race")
+    context = ChatMemoryContext(memory)
+    fetch = memory.get_memories_for_users
+
+    def racing_fetch(user_ids, query_text, limit=3):
+        found = fetch(user_ids, query_text, limit)
+        memory.add_memory(1, "Ana", "Just moved to Goa")  # lands while the fetch is in flight
+        return found
+
+    memory.get_memories_for_users = racing_fetch
+    context.observe("-100", 1, "Ana")
+    context.get("-100", 1, "where")
+    memory.get_memories_for_users = fetch
+    assert "Goa" in context.get("-100", 1, "where")[0]
+    assert context._inflight == {}
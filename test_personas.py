@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for hosting several bots in one process (no Telegram needed).
+"""
+
+import pytest
+
+from ai.memory_manager import MemoryManager
+from modules import state
+from modules.leaderboard import Leaderboard
+from modules.question_bank import QuestionBank
+from modules.personas import Persona, parse_bots
+from modules.triggers import router
+
+
+def test_parse_bots():
+    assert parse_bots(None, "1:a") == [("AI618", "1:a")]
+    assert parse_bots("AI618=1:a, Sage Bot=2:b", None) == [("AI618", "1:a"), ("Sage Bot", "2:b")]
+    with pytest.raises(ValueError):
+        parse_bots("AI618=1:a,ai618=2:b", None)
+    with pytest.raises(ValueError):
+        parse_bots("AI618", None)
+
+
+def test_bots_keep_their_own_mentions_summaries_and_memories():
+    state.set_backend(state.MemoryBackend())
+    try:
+        memory = MemoryManager(db_path=":memory:", embeddings="hash", collection_name="test_personas")
+        ai618 = Persona("AI618", "1:a", None, memory, primary=True)
+        sage = Persona("Sage", "2:b", None, memory)
+
+        names = {match.name for match in router.match("hey sage, what do you think")}
+        assert sage.mention_trigger in names and ai618.mention_trigger not in names
+
+        sage.summaries.summaries["-100"] = "Sage's view of the chat"
+        assert ai618.summaries.get("-100") == ""
+
+        ai618.memory.add_memory(7, "Ana", "Lives in Pune and loves chai")
+        sage.memory.add_memory(7, "Ana", "Studies organic chemistry")
+        assert "Pune" in ai618.memory.get_relevant_memories(7, "where does Ana live")
+        assert "Pune" not in sage.memory.get_relevant_memories(7, "where does Ana live")
+        assert sage.memory.client is memory.client and sage.memory.embedding_fn is memory.embedding_fn
+    finally:
+        state.set_backend(None)
+
+
+def test_bots_keep_their_own_trivia_games_and_toggles():
+    state.set_backend(state.MemoryBackend())
+    try:
+        memory = MemoryManager(db_path=":memory:", embeddings="hash", collection_name="test_personas_games")
+        shared = dict(question_bank=QuestionBank(":memory:"), leaderboard=Leaderboard(":memory:"))
+        ai618 = Persona("AI618", "1:a", None, memory, primary=True, **shared)
+        sage = Persona("Sage", "2:b", None, memory, **shared)
+
+        ai618.trivia.sessions["-100"] = {"state": "asking"}
+        assert "-100" not in sage.trivia.sessions
+        sage.features.random_chat_enabled = False
+        assert ai618.features.random_chat_enabled
+        assert ai618.trivia.bank is sage.trivia.bank
+    finally:
+        state.set_backend(None)
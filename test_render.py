@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for the render pool workers (called in-process here).
+"""
+
+import pytest
+
+from modules.render import render_molecules, render_latex
+
+
+def test_single_molecule_is_canonicalized():
+    canonical, png = render_molecules(["OCC"])
+    assert canonical == ["CCO"]
+    assert png.startswith(b"\x89PNG")
+
+
+def test_batch_renders_one_grid_image():
+    canonical, png = render_molecules(["CCO", "c1ccccc1", "CC(=O)O"], size=200)
+    assert canonical == ["CCO", "c1ccccc1", "CC(=O)O"]
+    assert png.startswith(b"\x89PNG")
+
+
+def test_invalid_smiles_raises():
+    with pytest.raises(ValueError):
+        render_molecules(["not-a-molecule("])
+
+
+def test_latex_renders_png_offline():
+    png = render_latex(r"\frac{a}{b} + \sqrt{x^2}", dpi=100)
+    assert png.startswith(b"\x89PNG")
+
+
+def test_invalid_latex_raises_value_error():
+    with pytest.raises(ValueError):
+        render_latex(r"\frac{a}{", dpi=100)
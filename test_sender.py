@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the rate-aware Bot API sender.
+"""
+
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from modules.sender import RateLimitedSender, JobStatus
+
+
+def test_global_rate_is_respected():
+    sender = RateLimitedSender(global_rate=50)
+
+    async def noop():
+        return True
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*[sender.call(noop) for _ in range(75)])
+        return time.monotonic() - start
+
+    # 50 go out as a burst, the remaining 25 need ~0.5s of refill
+    assert 0.4 < asyncio.run(run()) < 1.5
+
+
+def test_retry_after_is_waited_out():
+    sender = RateLimitedSender()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RetryAfter(0)
+        return "ok"
+
+    assert asyncio.run(sender.call(flaky, chat_id=-100)) == "ok"
+    assert len(attempts) == 2
+
+
+def test_only_posted_messages_count_against_the_chat_limit():
+    sender = RateLimitedSender(group_rate_per_minute=20)
+
+    async def ok(*args, **kwargs):
+        return True
+
+    async def run():
+        await sender.process_request(ok, (), {}, "sendChatAction", {"chat_id": -100, "action": "typing"}, None)
+        assert "-100" not in sender._chats
+        await sender.process_request(ok, (), {}, "sendMediaGroup", {"chat_id": -100, "media": [1, 2, 3]}, None)
+        await sender.process_request(ok, (), {}, "sendMessage", {"chat_id": -100, "text": "hi"}, None)
+
+    asyncio.run(run())
+    assert round(sender._chats["-100"].tokens) == 16
+
+
+class FakeMessage:
+    def __init__(self, log, text=None):
+        self.log = log
+        self.text = text
+
+    async def reply_text(self, text):
+        self.log.append(("reply", text))
+        return FakeMessage(self.log, text)
+
+    async def edit_text(self, text):
+        self.log.append(("edit", text))
+
+    async def delete(self):
+        self.log.append(("delete", self.text))
+
+
+class FakeChat:
+    def __init__(self, log):
+        self.log = log
+
+    async def send_action(self, action):
+        self.log.append(("action", action))
+
+
+class FakeUpdate:
+    def __init__(self):
+        self.log = []
+        self.message = FakeMessage(self.log)
+        self.effective_chat = FakeChat(self.log)
+
+
+def test_job_status_uses_chat_actions_until_the_job_is_queued():
+    async def run(queued):
+        update = FakeUpdate()
+        async with JobStatus(update, "upload_photo", "Painting...") as status:
+            await asyncio.sleep(0)
+            if queued:
+                await status.on_position(2)
+                await status.on_position(0)
+            await status.done()
+        return update.log
+
+    assert asyncio.run(run(False)) == [("action", "upload_photo")]
+    assert asyncio.run(run(True)) == [
+        ("action", "upload_photo"),
+        ("reply", "⏳ Queued (#2)... send /cancel to give up."),
+        ("edit", "Painting..."),
+        ("delete", "⏳ Queued (#2)... send /cancel to give up."),
+    ]
+
+
+def test_concurrent_position_updates_post_one_status_message():
+    class SlowMessage(FakeMessage):
+        async def reply_text(self, text):
+            await asyncio.sleep(0.01)
+            return await super().reply_text(text)
+
+    async def run():
+        update = FakeUpdate()
+        update.message = SlowMessage(update.log)
+        status = JobStatus(update, "upload_photo", "Painting...")
+        await asyncio.gather(status.on_position(3), status.on_position(2))
+        return [entry for entry in update.log if entry[0] == "reply"]
+
+    assert asyncio.run(run()) == [("reply", "⏳ Queued (#3)... send /cancel to give up.")]
+
+
+def test_refilled_chat_buckets_are_dropped():
+    sender = RateLimitedSender(private_rate=100)
+
+    async def ok(*args, **kwargs):
+        return True
+
+    async def run():
+        for chat_id in range(50):
+            await sender.call(ok, chat_id=chat_id)
+        # Private buckets refill in 30ms at this rate; the next new chat sweeps them out
+        await asyncio.sleep(0.05)
+        await sender.call(ok, chat_id=-100)
+
+    asyncio.run(run())
+    assert list(sender._chats) == ["-100"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for sharding updates across worker processes (no Telegram needed).
+"""
+
+import os
+import time
+import asyncio
+from collections import Counter
+
+from telegram import Update
+
+from modules import state
+from modules.leaderboard import Leaderboard, GLOBAL_SCOPE
+from modules.sharding import ShardRouter, route_key, shard_for, worker_share
+
+
+def message_update(update_id, chat_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "hi",
+            "chat": {"id": chat_id, "type": "group"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Ana"},
+        },
+    }, None)
+
+
+def test_shard_for_is_stable_and_spreads_chats():
+    assert shard_for(-1001937965792, 4) == shard_for("-1001937965792", 4)
+    counts = Counter(shard_for(-1000000000000 - i, 4) for i in range(1000))
+    assert len(counts) == 4 and min(counts.values()) > 150
+
+
+def test_bot_wide_limits_are_split_between_workers():
+    assert worker_share(4, 1) == 4
+    assert worker_share(4, 2) == 2
+    # Every worker can still run one job
+    assert worker_share(2, 4) == 1
+
+
+def test_poll_answers_route_to_the_poll_chat():
+    backend = state.MemoryBackend()
+    state.set_backend(backend)
+    try:
+        state.StateMap("trivia_polls")["poll-1"] = ["-100123", 2, time.time() + 60]
+        answer = Update.de_json({
+            "update_id": 1,
+            "poll_answer": {
+                "poll_id": "poll-1", "user": {"id": 7, "is_bot": False, "first_name": "Ana"},
+                "option_ids": [2], "option_persistent_ids": ["2"],
+            },
+        }, None)
+        assert route_key(answer) == "-100123"
+        assert shard_for(route_key(answer), 3) == shard_for(route_key(message_update(2, -100123)), 3)
+    finally:
+        state.set_backend(None)
+
+
+def record_updates(index, updates):
+    """Shard worker used by the router test: logs the update ids it receives."""
+    with open(os.path.join(os.environ["SHARD_TEST_DIR"], f"shard-{index}.txt"), "w") as f:
+        while (data := updates.get()) is not None:
+            f.write(f"{data['update_id']} {data['message']['chat']['id']}\n")
+
+
+def test_router_delivers_each_chat_to_one_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARD_TEST_DIR", str(tmp_path))
+    router = ShardRouter(2, record_updates)
+    router.start()
+    try:
+        async def send_all():
+            for i in range(40):
+                await router.dispatch(message_update(i + 1, -100 - i % 5), None)
+        asyncio.run(send_all())
+    finally:
+        router.stop()
+
+    seen = {}
+    for index in range(2):
+        for line in (tmp_path / f"shard-{index}.txt").read_text().splitlines():
+            update_id, chat_id = line.split()
+            assert seen.setdefault(chat_id, index) == index
+            assert shard_for(chat_id, 2) == index
+    assert len(seen) == 5
+    assert sum(router.forwarded) == 40
+
+
+def test_shared_leaderboard_scope_reads_other_writers(tmp_path):
+    path = str(tmp_path / "trivia.sqlite3")
+    worker_a = Leaderboard(path, shared_scopes=[GLOBAL_SCOPE])
+    worker_b = Leaderboard(path, shared_scopes=[GLOBAL_SCOPE])
+    assert worker_a.top(GLOBAL_SCOPE) == []
+    worker_b.add_points(GLOBAL_SCOPE, 1, "Ana", 3)
+    worker_b.add_points("-100", 1, "Ana", 3)
+    assert worker_a.top(GLOBAL_SCOPE) == [(3, 1, "Ana")]
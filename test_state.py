@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the runtime state backends and write-behind persistence.
+"""
+
+import pytest
+
+from modules import state
+
+
+def sqlite_url(tmp_path):
+    return f"sqlite:///{tmp_path}/state.sqlite3"
+
+
+def test_state_map_round_trips_on_every_backend(tmp_path):
+    server = state.LocalRedisServer().start()
+    try:
+        backends = [
+            state.MemoryBackend(),
+            state.create_backend(sqlite_url(tmp_path)),
+            state.create_backend(server.url),
+        ]
+        for backend in backends:
+            voices = state.StateMap("user_voices", backend)
+            voices[42] = "ash"
+            voices[43] = {"engine": "edge"}
+            assert voices.get(42) == "ash" and voices["43"] == {"engine": "edge"}
+            assert 42 in voices and 44 not in voices
+            assert voices.get(44, "default") == "default"
+            del voices[42]
+            assert dict(voices) == {"43": {"engine": "edge"}}
+    finally:
+        server.stop()
+
+
+def test_write_behind_batches_changes_until_flush(tmp_path):
+    backend = state.create_backend(sqlite_url(tmp_path))
+    assert isinstance(backend, state.WriteBehindBackend)
+    speak = state.StateMap("speak_mode", backend)
+    speak[1] = True
+    speak[2] = True
+    speak[2] = False
+    del speak[1]
+
+    # Nothing reaches SQLite before the flush
+    assert backend.store.items("speak_mode") == {}
+    assert backend.dirty_count == 2
+    assert backend.flush() == 2
+    assert backend.flush() == 0
+
+    reopened = state.StateMap("speak_mode", state.create_backend(sqlite_url(tmp_path)))
+    assert dict(reopened) == {"2": False}
+
+
+def test_write_behind_loads_keys_lazily(tmp_path):
+    first = state.create_backend(sqlite_url(tmp_path))
+    for user_id in range(100):
+        first.set("user_tts_voices", str(user_id), "ash")
+    first.flush()
+
+    backend = state.create_backend(sqlite_url(tmp_path))
+    assert backend._cache == {}
+    assert state.StateMap("user_tts_voices", backend).get(7) == "ash"
+    assert state.StateMap("user_tts_voices", backend).get(1000) is None
+    assert len(backend._cache) == 2
+
+
+def test_write_behind_state_is_served_to_workers(tmp_path):
+    front = state.create_backend(sqlite_url(tmp_path))
+    server = state.LocalRedisServer(front).start()
+    try:
+        worker = state.StateMap("settings", state.create_backend(server.url))
+        worker["random_chat"] = False
+        assert state.StateMap("settings", front).get("random_chat") is False
+    finally:
+        server.stop()
+    front.flush()
+    assert state.create_backend(sqlite_url(tmp_path)).get("settings", "random_chat") is False
+
+
+def test_failed_flush_keeps_changes_and_drops_unserialisable_values(tmp_path):
+    backend = state.create_backend(sqlite_url(tmp_path))
+    backend.set("settings", "random_chat", False)
+    backend.set("settings", "broken", object())
+
+    assert backend.flush() == 0
+    assert backend.dirty_count == 1
+    assert backend.flush() == 1
+    assert backend.store.items("settings") == {"random_chat": False}
+
+
+def test_write_behind_cache_is_bounded_but_keeps_unflushed_keys(tmp_path):
+    backend = state.WriteBehindBackend(state.SQLiteBackend(f"{tmp_path}/state.sqlite3"), max_keys=10)
+    backend.set("user_voices", "dirty", "ash")
+    for user_id in range(50):
+        backend.get("user_voices", str(user_id))
+    assert len(backend._cache) == 10
+    assert ("user_voices", "dirty") in backend._cache
+
+    backend.flush()
+    assert dict(state.StateMap("user_voices", backend)) == {"dirty": "ash"}
+
+
+def test_backend_missing_a_method_fails_when_created():
+    class NoItems(state.StateBackend):
+        def get(self, namespace, key, default=None): ...
+        def set(self, namespace, key, value): ...
+        def delete(self, namespace, key): ...
+
+    with pytest.raises(TypeError):
+        NoItems()
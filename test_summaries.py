@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for rolling chat summaries (no Telegram needed).
+"""
+
+import asyncio
+
+from modules.summaries import SummaryManager
+
+
+class FakeLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def get_text_response(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        await asyncio.sleep(0.01)
+        return self.replies.pop(0)
+
+
+def test_summary_folds_only_new_messages_into_the_old_summary():
+    llm = FakeLLM(["Ana and Ben plan a trip.", "Ana and Ben plan a trip to Goa in May."])
+    manager = SummaryManager(llm, every=3, summaries={})
+
+    async def run():
+        for i in range(6):
+            manager.observe("-100", f"[Ana]: message {i}")
+            await manager.wait()
+
+    asyncio.run(run())
+    assert manager.get("-100") == "Ana and Ben plan a trip to Goa in May."
+    assert "Ana and Ben plan a trip." in llm.prompts[1]
+    assert "message 2" not in llm.prompts[1] and "message 5" in llm.prompts[1]
+    assert manager.pending["-100"] == []
+
+
+def test_failed_update_keeps_messages_for_the_next_round():
+    llm = FakeLLM([None, "Recovered summary."])
+    manager = SummaryManager(llm, every=2, summaries={}, retry_after=0)
+
+    async def run():
+        manager.observe("-100", "[Ana]: one")
+        manager.observe("-100", "[Ana]: two")
+        await manager.wait()
+        manager.observe("-100", "[Ana]: three")
+        await manager.wait()
+
+    asyncio.run(run())
+    assert manager.get("-100") == "Recovered summary."
+    assert "[Ana]: one" in llm.prompts[1] and "[Ana]: three" in llm.prompts[1]
+    assert len(llm.prompts) == 2
+
+
+def test_failed_update_backs_off_instead_of_retrying_every_message():
+    llm = FakeLLM([None, None])
+    manager = SummaryManager(llm, every=2, summaries={}, retry_after=60)
+
+    async def run():
+        for i in range(10):
+            manager.observe("-100", f"[Ana]: message {i}")
+            await manager.wait()
+
+    asyncio.run(run())
+    assert len(llm.prompts) == 1
+    assert len(manager.pending["-100"]) == 10
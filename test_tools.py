@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached photo replies behind /chem and /tex (fake messages, no Telegram).
+"""
+
+import asyncio
+
+from telegram.error import BadRequest
+
+from modules.cache import PersistentCache
+from modules.tools import reply_cached_photo
+
+
+class FakePhoto:
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+
+class FakeMessage:
+    def __init__(self, known_file_ids):
+        self.known_file_ids = known_file_ids
+        self.sent = []
+
+    async def reply_photo(self, photo, caption=None, parse_mode=None):
+        if isinstance(photo, str):
+            if photo not in self.known_file_ids:
+                raise BadRequest("Wrong file identifier/http url specified")
+            self.sent.append(photo)
+            return type("Sent", (), {"photo": [FakePhoto(photo)]})()
+        self.sent.append(photo.read())
+        return type("Sent", (), {"photo": [FakePhoto(f"uploaded-{len(self.sent)}")]})()
+
+
+def test_file_ids_are_kept_per_bot_and_stale_ones_are_replaced():
+    file_ids = PersistentCache("test_file_id", path=":memory:")
+
+    async def load_png():
+        return b"png"
+
+    async def run():
+        # Bot A uploads and remembers its own file_id
+        bot_a = FakeMessage(known_file_ids=set())
+        await reply_cached_photo(bot_a, file_ids, "1:CCO", load_png, "CCO")
+        assert bot_a.sent == [b"png"]
+        bot_a.known_file_ids.add(file_ids.get("1:CCO"))
+        await reply_cached_photo(bot_a, file_ids, "1:CCO", load_png, "CCO")
+        assert bot_a.sent[-1] == "uploaded-1"
+
+        # Bot B never sees bot A's file_id
+        bot_b = FakeMessage(known_file_ids=set())
+        await reply_cached_photo(bot_b, file_ids, "2:CCO", load_png, "CCO")
+        assert bot_b.sent == [b"png"]
+
+        # A file_id Telegram rejects is dropped and the PNG is uploaded again
+        file_ids.set("2:CCO", "expired")
+        await reply_cached_photo(bot_b, file_ids, "2:CCO", load_png, "CCO")
+        assert bot_b.sent[-1] == b"png"
+        assert file_ids.get("2:CCO") == "uploaded-2"
+
+    asyncio.run(run())
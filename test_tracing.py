@@ -0,0 +1,51 @@
+import time
+import asyncio
+
+from modules import tracing
+from modules.profiler import AsyncProfiler
+
+
+def test_span_is_noop_outside_a_trace():
+    assert tracing.span("memory.query") is tracing.NOOP_SPAN
+
+
+def test_spans_nest_under_the_current_trace():
+    def query_memory():
+        with tracing.span("memory.query"):
+            pass
+
+    async def handler():
+        with tracing.span("decision"):
+            await asyncio.sleep(0)
+        with tracing.span("response"):
+            await asyncio.to_thread(query_memory)
+
+    async def main():
+        root = tracing.Span("update", {"update_id": 1})
+        with root:
+            await handler()
+        return root
+
+    root = asyncio.run(main())
+    assert [child.name for child in root.children] == ["decision", "response"]
+    assert [child.name for child in root.children[1].children] == ["memory.query"]
+    assert "update_id=1" in root.format()
+
+
+def test_profiler_reports_busy_function():
+    def busy_loop():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    async def main():
+        profiler = AsyncProfiler(asyncio.get_running_loop(), interval=0.002)
+        task = asyncio.ensure_future(profiler.run(0.3))
+        await asyncio.sleep(0.01)
+        busy_loop()
+        await task
+        return profiler.report()
+
+    report = asyncio.run(main())
+    assert "busy_loop" in report
+    assert "Collapsed stacks" in report
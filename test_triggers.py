@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for natural-language trigger routing (no Telegram needed).
+"""
+
+import asyncio
+
+from modules.triggers import TriggerRouter
+
+
+def make_router():
+    router = TriggerRouter()
+    router.register("image", ["generate image", "create image"])
+    router.register("image_hd", ["generate image hd"])
+    router.register("mention", ["ai618", "bot"])
+    return router
+
+
+def test_phrases_match_whole_words_only():
+    router = make_router()
+    assert router.match("my robot and bots") == []
+    assert [m.name for m in router.match("hey Bot, you there?")] == ["mention"]
+    assert [m.name for m in router.match("AI618!!")] == ["mention"]
+
+
+def test_longest_phrase_wins_and_strip_removes_it():
+    router = make_router()
+    text = "pls Generate  Image HD of a cat, bot"
+    matches = router.match(text)
+    assert [m.name for m in matches] == ["image_hd", "mention"]
+    assert text[matches[0].start:matches[0].end] == "Generate  Image HD"
+    assert router.strip(text, matches, "image_hd") == "pls of a cat, bot"
+
+
+def test_a_phrase_can_belong_to_several_triggers():
+    router = make_router()
+    router.register("mention:bot", ["Bot"])  # a persona named "Bot"
+    assert [m.name for m in router.match("hi bot")] == ["mention", "mention:bot"]
+    # Registering later triggers rebuilds the matcher
+    router.register("vision", ["explain this"])
+    assert [m.name for m in router.match("explain this, bot")] == ["vision", "mention", "mention:bot"]
+
+
+def test_prefixes_only_match_as_whole_words():
+    router = TriggerRouter()
+    router.register("short", ["ai"])
+    router.register("long", ["ai618"])
+    assert [(m.name, m.start) for m in router.match("ai618 ai aim xai ai618x")] == [("long", 0), ("short", 6)]
+
+
+def test_dispatch_falls_through_in_registration_order():
+    router = TriggerRouter()
+    calls = []
+
+    async def decline(update, context, text):
+        calls.append(("video", text))
+        return False
+
+    async def accept(update, context, text):
+        calls.append(("vision", text))
+        return True
+
+    router.register("video", ["create video"], decline)
+    router.register("vision", ["explain this"], accept)
+    router.register("mention", ["bot"])
+
+    matches = router.match("explain this and create video bot")
+    assert asyncio.run(router.dispatch(None, None, "explain this and create video bot", matches)) is True
+    assert calls == [("video", "explain this and bot"), ("vision", "and create video bot")]
+    assert asyncio.run(router.dispatch(None, None, "bot", router.match("bot"))) is False
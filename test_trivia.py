@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for trivia question parsing and batch generation (no LLM needed).
+"""
+
+import asyncio
+import json
+from collections import deque
+
+from types import SimpleNamespace
+
+from modules.leaderboard import Leaderboard
+from modules.question_bank import QuestionBank
+from modules.trivia import TriviaManager, parse_questions, normalize_question
+
+
+def make_question(text, correct=0):
+    return {"question": text, "options": ["A", "B", "C", "D"], "correct_index": correct}
+
+
+class FakeAPIClient:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    async def get_text_response(self, messages):
+        self.calls += 1
+        return self.replies.pop(0) if self.replies else None
+
+
+def test_parse_questions_drops_invalid_entries():
+    reply = "Sure! " + json.dumps([
+        make_question("What is H2O?"),
+        {"question": "Too few options", "options": ["A", "B"], "correct_index": 0},
+        make_question("Bad index", correct=7),
+        {"question": "Duplicate options", "options": ["A", "A", "B", "C"], "correct_index": 1},
+    ])
+    assert [q["question"] for q in parse_questions(reply)] == ["What is H2O?"]
+    assert parse_questions("not json at all") == []
+    assert parse_questions(None) == []
+
+
+def test_generate_questions_batches_dedupes_and_retries():
+    first = json.dumps([make_question("What is H2O?"), make_question("what is h2o")])
+    second = json.dumps({"questions": [make_question("Who wrote Hamlet?"), make_question("What is NaCl?")]})
+    api = FakeAPIClient([first, "garbage", second])
+    manager = TriviaManager(api, QuestionBank(":memory:"), Leaderboard(":memory:"))
+
+    questions = asyncio.run(manager.generate_questions("Science", 3, exclude={normalize_question("What is NaCl?")}))
+    assert [q["question"] for q in questions] == ["What is H2O?", "Who wrote Hamlet?"]
+    assert api.calls == 3  # Bounded: gives up after QUESTION_RETRIES attempts
+
+
+def test_bank_dedupes_and_skips_questions_a_chat_has_seen():
+    bank = QuestionBank(":memory:")
+    added = bank.add_questions("Science", "hard", [make_question("What is H2O?"), make_question("Who found gravity?")])
+    assert len(added) == 2
+    assert bank.add_questions(" science ", "hard", [make_question("what is H2O")]) == []
+    assert bank.stock("SCIENCE", "hard") == 2
+
+    bank.mark_seen("-100", [added[0]["id"]])
+    assert [q["question"] for q in bank.take("-100", "science", "hard", 5)] == ["Who found gravity?"]
+    assert len(bank.take("-200", "science", "hard", 5)) == 2
+
+
+def test_fill_queue_serves_from_bank_before_generating():
+    bank = QuestionBank(":memory:")
+    bank.add_questions("space", "hard", [make_question("Largest planet?")])
+    api = FakeAPIClient([json.dumps([make_question("Closest star?")])])
+    manager = TriviaManager(api, bank, Leaderboard(":memory:"))
+    manager.sessions["1"] = {"topic": "space", "difficulty": "hard", "total_questions": 2,
+                             "current_question": 0, "asked": [], "queue": deque()}
+
+    asyncio.run(manager._fill_queue("1"))
+    assert [q["question"] for q in manager.sessions["1"]["queue"]] == ["Largest planet?", "Closest star?"]
+    assert api.calls == 1
+    assert bank.stock("space", "hard") == 2
+
+
+def test_fill_queue_does_not_regenerate_questions_already_in_the_bank():
+    bank = QuestionBank(":memory:")
+    seen = bank.add_questions("space", "hard", [make_question("Largest planet?")])
+    bank.mark_seen("1", [seen[0]["id"]])
+    # The model repeats the banked question first; it must not count towards the batch
+    api = FakeAPIClient([json.dumps([make_question("Largest planet?"), make_question("Closest star?")])])
+    manager = TriviaManager(api, bank, Leaderboard(":memory:"))
+    manager.sessions["1"] = {"topic": "space", "difficulty": "hard", "total_questions": 1,
+                             "current_question": 0, "asked": [], "queue": deque()}
+
+    asyncio.run(manager._fill_queue("1"))
+    assert [q["question"] for q in manager.sessions["1"]["queue"]] == ["Closest star?"]
+    assert api.calls == 1
+
+
+def test_leaderboard_keeps_top_k_incrementally():
+    board = Leaderboard(":memory:", k=2)
+    board.add_points("-1", 1, "Asha", 3)
+    board.add_points("-1", 2, "Ben", 1)
+    board.add_points("-1", 3, "Chen", 2)
+    assert [name for _, _, name in board.top("-1")] == ["Asha", "Chen"]
+    board.add_points("-1", 2, "Ben", 5)
+    assert board.top("-1") == [(6, 2, "Ben"), (3, 1, "Asha")]
+
+
+def test_poll_answers_are_routed_and_scored():
+    manager = TriviaManager(FakeAPIClient([]), QuestionBank(":memory:"), Leaderboard(":memory:"))
+    manager.sessions["-5"] = {"players": {7: {"name": "Asha", "score": 0}, 8: {"name": "Ben", "score": 0}}}
+    manager.index_poll("poll-1", "-5", correct_index=2)
+
+    def answer(user_id, name, option):
+        user = SimpleNamespace(id=user_id, first_name=name)
+        update = SimpleNamespace(poll_answer=SimpleNamespace(poll_id="poll-1", user=user, option_ids=(option,)))
+        asyncio.run(manager.handle_poll_answer(update, None))
+
+    answer(7, "Asha", 2)
+    answer(8, "Ben", 1)
+    answer(9, "Stranger", 2)
+    assert manager.sessions["-5"]["players"][7]["score"] == 1
+    assert manager.sessions["-5"]["players"][8]["score"] == 0
+    assert manager.leaderboard.top("-5") == [(1, 7, "Asha")]
+    assert manager.leaderboard.top("global") == [(1, 7, "Asha")]
+
+
+def test_failing_polls_end_the_game_after_a_few_tries():
+    manager = TriviaManager(FakeAPIClient([]), QuestionBank(":memory:"), Leaderboard(":memory:"))
+    manager.sessions["-5"] = {"topic": "space", "difficulty": "hard", "total_questions": 5, "current_question": 0,
+                              "asked": [], "players": {}, "queue": deque(make_question(f"Q{i}?") for i in range(10))}
+    polls = []
+
+    class FakeBot:
+        async def send_poll(self, **kwargs):
+            polls.append(kwargs)
+            raise RuntimeError("Forbidden: bot was kicked from the group chat")
+
+        async def send_message(self, *args, **kwargs):
+            raise RuntimeError("Forbidden: bot was kicked from the group chat")
+
+    asyncio.run(manager.ask_question(SimpleNamespace(bot=FakeBot(), job_queue=None), "-5"))
+    assert len(polls) == 3
+    assert "-5" not in manager.sessions
+
+
+def test_leaderboard_escapes_markdown_in_names():
+    board = Leaderboard(":memory:")
+    board.add_points("-1", 1, "snake_case*fan", 2)
+    manager = TriviaManager(FakeAPIClient([]), QuestionBank(":memory:"), board)
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append((text, kwargs))
+
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=-1), message=SimpleNamespace(reply_text=reply_text))
+    asyncio.run(manager.show_leaderboard(update, None))
+    text, kwargs = replies[0]
+    assert "1. snake\\_case\\*fan: 2" in text and kwargs["parse_mode"] == "Markdown"
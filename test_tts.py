@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged speak-mode TTS (fake engines, no network).
+"""
+
+import time
+import asyncio
+
+from modules import tts
+from modules.tts import TTSOrchestrator
+
+
+def fake_engine(name, seconds, started, fail=False):
+    async def engine(text, voice, out):
+        started.append(name)
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError(f"{name} down")
+        out.write(f"{name}:{voice}:{text}".encode())
+    return engine
+
+
+def synthesize(orchestrator, text="hello"):
+    async def run():
+        result = await orchestrator.synthesize(text, {"premium": "ash", "edge": "guy"})
+        if result is None:
+            return None
+        engine, audio = result
+        with audio:
+            return engine, audio.read()
+    return asyncio.run(run())
+
+
+def test_fast_preferred_engine_wins_without_starting_the_backup():
+    started = []
+    orchestrator = TTSOrchestrator({
+        "premium": fake_engine("premium", 0.01, started),
+        "edge": fake_engine("edge", 0.01, started),
+    }, deadline=1, hedge_after=0.2)
+    assert synthesize(orchestrator) == ("premium", b"premium:ash:hello")
+    assert started == ["premium"]
+
+
+def test_slow_preferred_engine_is_hedged_by_the_backup():
+    started = []
+    orchestrator = TTSOrchestrator({
+        "premium": fake_engine("premium", 0.5, started),
+        "edge": fake_engine("edge", 0.01, started),
+    }, deadline=1, hedge_after=0.05)
+    assert synthesize(orchestrator) == ("edge", b"edge:guy:hello")
+    assert started == ["premium", "edge"]
+    # The cancelled premium run still pushes its latency estimate up
+    assert orchestrator.stats["premium"].latency > 0.05
+
+
+def test_failure_starts_the_backup_immediately():
+    started = []
+    orchestrator = TTSOrchestrator({
+        "premium": fake_engine("premium", 0.01, started, fail=True),
+        "edge": fake_engine("edge", 0.01, started),
+    }, deadline=1, hedge_after=5)
+    start = time.monotonic()
+    assert synthesize(orchestrator) == ("edge", b"edge:guy:hello")
+    assert time.monotonic() - start < 1
+    assert orchestrator.stats["premium"].failure > 0
+
+
+def test_nothing_is_returned_after_the_deadline():
+    started = []
+    orchestrator = TTSOrchestrator({
+        "premium": fake_engine("premium", 5, started),
+        "edge": fake_engine("edge", 5, started),
+    }, deadline=0.1, hedge_after=0.02)
+    assert synthesize(orchestrator) is None
+    assert started == ["premium", "edge"]
+
+
+def test_failing_engine_is_skipped_except_for_probes():
+    started = []
+    orchestrator = TTSOrchestrator({
+        "premium": fake_engine("premium", 0.01, started, fail=True),
+        "edge": fake_engine("edge", 0.01, started),
+    }, deadline=1, hedge_after=5)
+    for _ in range(tts.PROBE_EVERY * 2):
+        assert synthesize(orchestrator)[0] == "edge"
+    # Skipped once unhealthy, raced again on every PROBE_EVERY-th request
+    assert started.count("premium") < 10
+    assert started.count("premium") >= 2
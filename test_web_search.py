@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for search-augmented replies (no network needed).
+"""
+
+import asyncio
+
+from ai.web_search import WebSearch, compress, count_tokens, needs_search, normalize_query
+from modules.cache import PersistentCache
+
+
+def test_needs_search_separates_facts_from_chat():
+    assert needs_search("who won the IPL final yesterday?")
+    assert needs_search("hey bot what is Rust")
+    assert needs_search("when did the 2011 world cup happen")
+    assert not needs_search("how are you doing?")
+    assert not needs_search("hey Rahul what's up")
+    assert not needs_search("lol same")
+    assert not needs_search("what is AI618 up to", ignore={"ai618"})
+
+
+def test_normalize_query_drops_filler():
+    assert normalize_query("Hey bot, can you tell me: who WON the final?") == "who won the final"
+    assert normalize_query("AI618 what is Rust", ignore={"ai618"}) == "what is rust"
+
+
+def test_compress_strips_markup_dedupes_and_fits_budget():
+    results = [
+        {"title": "Rust <b>language</b>", "description": "Rust is a systems language. It was made at Mozilla. Fans love it."},
+        {"title": "Mirror", "description": "Rust is a systems language."},
+        {"title": "Long", "description": " ".join(["filler words"] * 200) + "."},
+    ]
+    text = compress(results, "what is rust language", budget=40)
+    assert text.splitlines()[0] == "- Rust language: Rust is a systems language. It was made at Mozilla."
+    assert "Mirror" not in text and "Long" not in text
+    assert count_tokens(text) <= 40
+
+
+class FakeSearchClient:
+    brave_key = "test"
+
+    def __init__(self):
+        self.queries = []
+
+    async def web_search(self, query, count=5):
+        self.queries.append(query)
+        await asyncio.sleep(0.05)
+        return [{"title": "Final", "description": "India won the final."}]
+
+
+def test_identical_queries_share_one_search_and_are_cached(tmp_path):
+    client = FakeSearchClient()
+    search = WebSearch(client, cache=PersistentCache("web_search", ttl=60, path=str(tmp_path / "cache.sqlite3")))
+
+    async def run():
+        first = await asyncio.gather(*[search.context_for("who won the final yesterday?") for _ in range(5)])
+        again = await search.context_for("Who won the FINAL yesterday")
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == ["- Final: India won the final."] * 5
+    assert again == first[0]
+    assert client.queries == ["who won the final yesterday"]
+    assert asyncio.run(search.context_for("how are you?")) == ""